@@ -0,0 +1,370 @@
+# 장비 WebSocket 연결 수신 제한 (동시 세션 수 / 같은 키의 중복 세션 / 연결별 패킷 속도 / 이벤트 루프 지연)
+# 장비 하나가 잘못 동작해서 연결을 계속 열거나 패킷을 쏟아내도, 같은 노드의 다른 환자 세션 지연이 늘어나지 않도록 하기 위함.
+import asyncio
+# - asyncio: 이벤트 루프 지연을 재는 백그라운드 태스크를 위함.
+
+import time
+# - time: 토큰 버킷이 마지막으로 채워진 뒤 지난 시간을 재기 위함 (monotonic).
+
+import uuid
+# - uuid: 워커 사이의 세션 소유권({key}:owner)에 넣을 세션별 토큰을 만들기 위함.
+
+# 사용자 정의 로깅 설정 가져오기
+from logger import get_logger
+
+# 지표
+from metrics import ADMISSION_REJECTED
+
+# 세션 큐 소유자 키 접미사와 토큰 비교 삭제 스크립트 (redis_queue.QueueWriter.delete 와 같은 키 / 같은 방식으로 소유권을 확인함)
+from redis_queue import (
+    OWNER_KEY_SUFFIX, COUNT_KEY_SUFFIX, SEQ_KEY_SUFFIX, RELEASE_LOCK_SCRIPT, DELETE_IF_OWNER_SCRIPT,
+)
+
+# 설정 값 가져오기
+from config import (
+    ADMISSION_MAX_SESSIONS, ADMISSION_MAX_SESSIONS_PER_KEY, ADMISSION_DUPLICATE_POLICY,
+    ADMISSION_PACKET_RATE, ADMISSION_PACKET_BURST, ADMISSION_MAX_LOOP_LAG, ADMISSION_LAG_INTERVAL,
+    ADMISSION_OWNER_TTL, REDIS_KEY_PREFIX,
+)
+
+
+logger = get_logger("admission")
+
+# WebSocket 종료 코드
+# - 1013 (Try Again Later): 서버가 과부하 상태이므로 잠시 뒤 다시 연결 (동시 세션 한도 / 이벤트 루프 지연)
+# - 4409: 같은 사용자:센서의 다른 세션과 겹침 (HTTP 409 Conflict 에 맞춘 애플리케이션 코드)
+CLOSE_TRY_AGAIN_LATER = 1013
+CLOSE_DUPLICATE_SESSION = 4409
+
+DUPLICATE_POLICIES = ("replace", "reject")
+
+# 소유권 갱신 Lua 스크립트: 아직 이 세션의 토큰일 때만 만료 시간을 늘림 (키를 새로 만들지는 않음).
+# 1: 갱신함 / 0: 키가 없음 (Redis 재시작 / 만료, _refresh_owners 가 _claim 으로 다시 잡음) / -1: 다른 세션이 가져감
+# 키가 없을 때 여기서 SET 하면, 세션 정리가 큐와 소유자 키를 지운 직후에 갱신이 끼어들어 주인 없는 토큰이 남을 수 있음.
+REFRESH_OWNER_SCRIPT = """
+local owner = redis.call("get", KEYS[1])
+if owner == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+if not owner then
+    return 0
+end
+return -1
+"""
+
+
+class TokenBucket:
+    """
+    연결 하나의 패킷 속도 제한. 초당 rate 개씩 토큰이 차고 최대 burst 개까지 쌓임.
+    연결마다 하나씩 만들어지므로 __slots__ 로 메모리를 줄임.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst):
+        """
+        :param rate: 초당 채워지는 토큰(패킷) 수
+        :param burst: 최대로 쌓이는 토큰 수 (처음에는 가득 찬 상태)
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, count):
+        """
+        토큰을 count 개까지 꺼냄.
+
+        :param count: 필요한 토큰 수 (메시지 하나에 담긴 패킷 수)
+        :return: 실제로 꺼낸 토큰 수 (이만큼의 패킷만 처리)
+        """
+        now = time.monotonic()
+        tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        taken = min(count, int(tokens))
+        self.tokens = tokens - taken
+        return taken
+
+
+class AdmissionTicket:
+    """수신 제한을 통과한 장비 세션 하나 (세션이 끝날 때 AdmissionController.release 로 돌려줌)"""
+
+    __slots__ = ("key", "sensor_type", "websocket", "replaced", "owner")
+
+    def __init__(self, key, sensor_type, websocket):
+        self.key = key
+        self.sensor_type = sensor_type
+        self.websocket = websocket
+        # 같은 키의 새 세션에 밀려서 닫힌 세션이면 True (큐는 새 세션이 이어서 쓰므로 지우지 않아야 함)
+        self.replaced = False
+        # {key}:owner 에 넣은 소유자 토큰 (워커 사이의 소유권을 쓰지 않으면 None, 큐를 지울 때 QueueWriter.delete 에 넘김)
+        self.owner = None
+
+
+class AdmissionController:
+    """
+    워커 프로세스 하나의 장비 세션 수신 제한. main.py 에서 app.state.admission 으로 하나만 만듦.
+    - 동시 세션 수: 전체 / 사용자:센서(큐 키)별
+    - 같은 큐 키의 세션이 한도를 넘으면 기존 세션을 닫거나(replace) 새 세션을 거절(reject)
+    - 연결별 토큰 버킷 (rate_limiter)
+    - 이벤트 루프 지연이 임계값을 넘는 동안 새 세션 거절 (start 로 지연 측정 태스크 시작)
+    세션 수는 프로세스 안에서만 셈. 여러 워커에 같은 키의 세션이 나뉘어 붙는 경우(redis 큐 백엔드, 키당 세션 1개)는
+    {key}:owner 에 세션 토큰을 SET NX PX 로 넣어 소유권을 정하고, 세션이 살아 있는 동안 owner_ttl / 3 마다 갱신함.
+    다른 워커의 새 세션이 소유권을 가져가면(replace) 다음 갱신 때 이 워커의 기존 세션을 닫고, 큐는 소유자일 때만 지움.
+    """
+
+    def __init__(self, max_sessions=ADMISSION_MAX_SESSIONS, max_sessions_per_key=ADMISSION_MAX_SESSIONS_PER_KEY,
+                 duplicate_policy=ADMISSION_DUPLICATE_POLICY, packet_rate=ADMISSION_PACKET_RATE,
+                 packet_burst=ADMISSION_PACKET_BURST, max_loop_lag=ADMISSION_MAX_LOOP_LAG,
+                 lag_interval=ADMISSION_LAG_INTERVAL, redis=None, key_prefix=REDIS_KEY_PREFIX,
+                 owner_ttl=ADMISSION_OWNER_TTL):
+        """
+        :param max_sessions: 동시 장비 세션 수 한도 (0이면 제한 없음)
+        :param max_sessions_per_key: 같은 큐 키(사용자:센서)의 동시 세션 수 한도 (0이면 제한 없음)
+        :param duplicate_policy: replace / reject
+        :param packet_rate: 연결별 초당 패킷 수 한도 (0이면 제한 없음)
+        :param packet_burst: 연결별로 한 번에 몰려도 받는 패킷 수
+        :param max_loop_lag: 새 세션을 거절하기 시작하는 이벤트 루프 지연(초, 0이면 사용 안 함)
+        :param lag_interval: 이벤트 루프 지연을 재는 주기(초)
+        :param redis: 워커 사이의 세션 소유권을 기록할 Redis 연결 (redis 큐 백엔드일 때만, None 이면 프로세스 안에서만 확인)
+        :param key_prefix: 큐 키 접두사 (redis 큐 백엔드와 같은 값이어야 QueueWriter 와 같은 소유자 키를 씀)
+        :param owner_ttl: 소유권이 갱신되지 않으면 풀리는 시간(초)
+        """
+        if duplicate_policy not in DUPLICATE_POLICIES:
+            raise ValueError(f"지원하지 않는 ADMISSION_DUPLICATE_POLICY 입니다: {duplicate_policy} "
+                             f"({' / '.join(DUPLICATE_POLICIES)})")
+        self.max_sessions = max_sessions
+        self.max_sessions_per_key = max_sessions_per_key
+        self.duplicate_policy = duplicate_policy
+        self.packet_rate = packet_rate
+        self.packet_burst = max(1, packet_burst)
+        self.max_loop_lag = max_loop_lag
+        self.lag_interval = lag_interval
+        # 소유권은 한 세션만 가질 수 있으므로 키당 세션 1개일 때만 씀 (여러 개를 허용하면 기존처럼 프로세스 안에서만 셈)
+        self.redis = redis if max_sessions_per_key == 1 else None
+        self.key_prefix = key_prefix
+        self.owner_ttl = owner_ttl
+
+        self.sessions = {}  # 큐 키 → 연결된 순서대로의 AdmissionTicket 리스트
+        self.active = 0
+        self.loop_lag = 0.0
+        self.rejected = {}  # 사유 → 닫은 세션 수
+        self._task = None
+        self._owner_task = None
+
+    def start(self):
+        if self.max_loop_lag > 0 and self._task is None:
+            self._task = asyncio.create_task(self._watch_loop_lag())
+        if self.redis is not None and self._owner_task is None:
+            self._owner_task = asyncio.create_task(self._refresh_owners())
+        logger.info("장비 세션 수신 제한 (0이면 제한 없음): 전체 %s개, 키별 %s개(%s), 연결별 초당 패킷 %s개(버스트 %s), "
+                    "루프 지연 %.2f초", self.max_sessions, self.max_sessions_per_key, self.duplicate_policy,
+                    self.packet_rate, self.packet_burst, self.max_loop_lag)
+
+    async def stop(self):
+        for task in (self._task, self._owner_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._task = self._owner_task = None
+
+    async def _watch_loop_lag(self):
+        """
+        lag_interval 마다 잠들었다 깨어난 시각이 예정보다 얼마나 늦었는지로 이벤트 루프 지연을 잼.
+        한 번 크게 멈춘 뒤 바로 다음 측정에서 0으로 돌아가지 않도록, 이전 값은 측정마다 절반씩 줄어들게 둠.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            lag = loop.time() - started - self.lag_interval
+            self.loop_lag = max(lag, self.loop_lag / 2, 0.0)
+
+    @property
+    def overloaded(self):
+        """이벤트 루프 지연이 임계값을 넘었는지"""
+        return 0 < self.max_loop_lag < self.loop_lag
+
+    async def admit(self, key, sensor_type, websocket):
+        """
+        새 장비 세션을 받을지 정함 (큐를 열기 전에 호출).
+
+        :param key: 큐 키 (사용자:센서)
+        :param sensor_type: 센서 종류 (지표 라벨)
+        :param websocket: 새 세션의 WebSocket (replace 정책에서 나중에 이 세션을 닫을 때 씀)
+        :return: (AdmissionTicket, None) 또는 거절이면 (None, (종료 코드, 종료 사유))
+        """
+        if self.overloaded:
+            return None, self._reject(sensor_type, "overloaded", CLOSE_TRY_AGAIN_LATER, "Server overloaded")
+
+        limit = self.max_sessions_per_key
+        while limit and len(self.sessions.get(key, ())) >= limit:
+            if self.duplicate_policy == "reject":
+                return None, self._reject(sensor_type, "duplicate", CLOSE_DUPLICATE_SESSION, "Duplicate session")
+            # 가장 오래된 세션을 닫음 (닫는 동안 같은 키의 다른 세션이 끼어들 수 있으므로 다시 확인)
+            await self._replace(self.sessions[key][0])
+
+        if self.max_sessions and self.active >= self.max_sessions:
+            return None, self._reject(sensor_type, "max_sessions", CLOSE_TRY_AGAIN_LATER, "Too many sessions")
+
+        ticket = AdmissionTicket(key, sensor_type, websocket)
+        self.sessions.setdefault(key, []).append(ticket)
+        self.active += 1
+        if self.redis is not None:
+            # 자리를 먼저 잡아두고 Redis 를 기다림 (그 사이에 같은 키로 들어온 세션은 위의 프로세스 안 확인에 걸림)
+            rejection = await self._claim(ticket)
+            if rejection is not None:
+                self.release(ticket)
+                return None, rejection
+        return ticket, None
+
+    def owner_key(self, key):
+        """큐 키의 소유자 키 (redis_queue.QueueWriter.owner_key 와 같음)"""
+        return self.key_prefix + key + OWNER_KEY_SUFFIX
+
+    async def _claim(self, ticket, reclaim=False):
+        """
+        {key}:owner 에 이 세션의 토큰을 넣음. 다른 워커의 세션이 이미 갖고 있으면 reject 정책은 거절하고,
+        replace 정책은 덮어씀 (그 워커는 다음 갱신 때 기존 세션을 닫음, _refresh_owners).
+
+        :param reclaim: 갱신 중에 소유자 키가 없어진 세션이 같은 토큰으로 다시 잡을 때 True.
+                        다른 세션의 소유권은 덮어쓰지 않고, Redis 오류는 호출한 쪽(_refresh_owners)으로 넘김
+        :return: 거절이면 (종료 코드, 종료 사유), 아니면 None
+        """
+        token = ticket.owner if reclaim else uuid.uuid4().hex
+        owner_key = self.owner_key(ticket.key)
+        ttl = int(self.owner_ttl * 1000)
+        try:
+            if not await self.redis.set(owner_key, token, nx=True, px=ttl):
+                if reclaim:
+                    # 키가 없어진 사이에 다른 세션이 가져감 (닫는 것은 호출한 쪽에서 replaced 로 셈)
+                    return CLOSE_DUPLICATE_SESSION, "Duplicate session"
+                if self.duplicate_policy == "reject":
+                    return self._reject(ticket.sensor_type, "duplicate", CLOSE_DUPLICATE_SESSION, "Duplicate session")
+                # 이 워커에서 방금 밀려난 세션이거나, 다른 워커에 연결된 세션
+                logger.info("[%s] 같은 사용자의 이전 세션에서 큐 소유권을 가져옵니다 (%s).", ticket.sensor_type, ticket.key)
+                await self.redis.set(owner_key, token, px=ttl)
+        except Exception as e:
+            if reclaim:
+                raise
+            # 소유권을 모르는 채로 받으면 세션이 끝날 때 다른 세션의 큐를 지울 수 있으므로 받지 않음
+            logger.error("[%s] 세션 소유권 기록 실패 (%s): %s", ticket.sensor_type, ticket.key, e)
+            return self._reject(ticket.sensor_type, "unavailable", CLOSE_TRY_AGAIN_LATER, "Server unavailable")
+        ticket.owner = token
+        return None
+
+    async def _refresh_owners(self):
+        """
+        owner_ttl / 3 마다 이 워커의 세션들의 소유권을 파이프라인 한 번으로 갱신 (REFRESH_OWNER_SCRIPT).
+        다른 워커의 새 세션이 가져간 키의 세션은 replace 와 같이 닫음 (큐는 새 세션이 이어서 쓰므로 지우지 않음).
+        소유자 키가 없어진 세션은 _claim 으로 같은 토큰을 다시 넣음.
+        세션 정리는 큐를 지우기 전에 release 로 목록에서 빼므로, 목록에 남아 있는 세션은 아직 큐를 지우지 않은 세션임.
+        """
+        ttl = int(self.owner_ttl * 1000)
+        while True:
+            await asyncio.sleep(self.owner_ttl / 3)
+            tickets = [ticket for tickets in self.sessions.values() for ticket in tickets if ticket.owner is not None]
+            if not tickets:
+                continue
+            pipe = self.redis.pipeline(transaction=False)
+            for ticket in tickets:
+                pipe.eval(REFRESH_OWNER_SCRIPT, 1, self.owner_key(ticket.key), ticket.owner, ttl)
+            try:
+                results = await pipe.execute()
+            except Exception as e:
+                # 다음 갱신에서 다시 시도 (그 전에 만료되면 다음 갱신에서 _claim 으로 다시 잡음)
+                logger.error("세션 소유권 갱신 실패 (%s개): %s", len(tickets), e)
+                continue
+            for ticket, state in zip(tickets, results):
+                # 기다리는 동안 끝났거나 이미 밀려난 세션은 건너뜀
+                if state == 1 or ticket not in self.sessions.get(ticket.key, ()):
+                    continue
+                if state < 0:
+                    await self._replace(ticket)
+                else:
+                    await self._reclaim(ticket)
+
+    async def _reclaim(self, ticket):
+        """소유자 키가 없어진(Redis 재시작 / 만료) 세션의 소유권을 같은 토큰으로 다시 잡음"""
+        logger.warning("[%s] 세션 소유권이 없어져서 다시 잡습니다 (%s).", ticket.sensor_type, ticket.key)
+        try:
+            lost = await self._claim(ticket, reclaim=True)
+            if ticket not in self.sessions.get(ticket.key, ()):
+                # 다시 잡는 동안 세션이 끝났으면 세션 정리가 소유자 키 없이 지나갔을 수 있으므로 그 정리를 대신 마침
+                # (밀려난 세션은 소유자 키만, 아니면 큐도 함께 / 토큰이 같을 때만)
+                owner_key = self.owner_key(ticket.key)
+                if ticket.replaced:
+                    await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, owner_key, ticket.owner)
+                else:
+                    key = self.key_prefix + ticket.key
+                    await self.redis.eval(DELETE_IF_OWNER_SCRIPT, 4, owner_key, key, key + COUNT_KEY_SUFFIX,
+                                          key + SEQ_KEY_SUFFIX, ticket.owner)
+                return
+        except Exception as e:
+            logger.error("[%s] 세션 소유권 다시 잡기 실패 (%s): %s", ticket.sensor_type, ticket.key, e)
+            return
+        if lost is not None:
+            await self._replace(ticket)
+
+    async def _replace(self, ticket):
+        """
+        같은 키의 새 세션에 밀린 기존 세션을 닫음.
+        닫힌 세션의 수신 루프가 끝날 때까지 기다리지 않고 바로 목록에서 빼며 (끊긴 줄 모르고 남은 연결은
+        종료 핸드셰이크가 끝날 때까지 오래 걸림), 대신 replaced 표시로 그 세션이 새 세션의 큐를 지우지 않게 함.
+        """
+        self.release(ticket)
+        ticket.replaced = True
+        self._count(ticket.sensor_type, "replaced")
+        logger.warning("[%s] 같은 사용자의 새 세션이 연결되어 기존 세션을 닫습니다 (%s).", ticket.sensor_type, ticket.key)
+        try:
+            await ticket.websocket.close(code=CLOSE_DUPLICATE_SESSION, reason="Replaced by a newer session")
+        except Exception as e:
+            # 이미 닫히는 중인 연결
+            logger.debug("[%s] 기존 세션 종료 실패 (%s): %s", ticket.sensor_type, ticket.key, e)
+
+    def release(self, ticket):
+        """세션이 끝났을 때 (이미 빠진 티켓이면 아무것도 하지 않음)"""
+        tickets = self.sessions.get(ticket.key)
+        if tickets is None or ticket not in tickets:
+            return
+        tickets.remove(ticket)
+        if not tickets:
+            del self.sessions[ticket.key]
+        self.active -= 1
+
+    def _reject(self, sensor_type, reason, code, message):
+        self._count(sensor_type, reason)
+        return code, message
+
+    def _count(self, sensor_type, reason):
+        ADMISSION_REJECTED.labels(sensor_type, reason).inc()
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+    def rate_limiter(self):
+        """연결 하나에 쓸 토큰 버킷 (제한이 없으면 None)"""
+        if self.packet_rate <= 0:
+            return None
+        return TokenBucket(self.packet_rate, self.packet_burst)
+
+    def limits(self):
+        """설정된 한도 (지표 출력용)"""
+        return {
+            ("max_sessions",): self.max_sessions,
+            ("max_sessions_per_key",): self.max_sessions_per_key,
+            ("packet_rate",): self.packet_rate,
+            ("packet_burst",): self.packet_burst,
+            ("max_loop_lag_seconds",): self.max_loop_lag,
+        }
+
+    def stats(self):
+        """수신 제한 상태를 dict로 반환"""
+        return {
+            "active_sessions": self.active,
+            "keys": len(self.sessions),
+            "shared_ownership": self.redis is not None,
+            "loop_lag": round(self.loop_lag, 4),
+            "overloaded": self.overloaded,
+            "rejected": dict(self.rejected),
+            "limits": {name: value for (name,), value in self.limits().items()},
+        }
+
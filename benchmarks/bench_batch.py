@@ -0,0 +1,111 @@
+"""
+배치 전송 벤치마크: 큐가 금방 차는 센서(NIBP 등)의 레코드를 레코드마다 요청 하나로 보내는 기존 방식과
+UploadCoalescer 로 여러 사용자를 묶어 보내는 방식을 로컬 스텁 백엔드에 대해 비교함.
+
+--rate 레코드/초 속도로 서로 다른 사용자의 레코드가 --duration 초 동안 생기고, 업로드 워커처럼 --workers 개까지만 동시에 처리함.
+백엔드 요청 수, 초당 처리 레코드 수, 레코드가 생긴 뒤 백엔드에 도착하기까지의 지연을 출력함.
+
+실행: python benchmarks/bench_batch.py [--rate 2000] [--duration 5] [--sensor nibp] [--max-records 100] [--max-latency 0.2]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_backend import StubBackend, percentile, now  # noqa: E402
+
+
+class ArrivalLog:
+    """스텁 백엔드에 도착한 레코드의 지연 기록 (userid 로 레코드가 생긴 시각을 찾음)"""
+
+    def __init__(self):
+        self.produced = {}
+        self.latencies = []
+
+    def on_request(self, path, headers, body):
+        arrived = now()
+        payload = json.loads(body)
+        for record in payload.get("records", (payload,)):
+            produced = self.produced.pop(record["userid"], None)
+            if produced is not None:
+                self.latencies.append(arrived - produced)
+        return 200
+
+
+async def produce(handle, args, log):
+    """rate 속도로 레코드를 만들고 workers 개까지 동시에 handle 로 넘김 (업로드 워커 흉내)"""
+    workers = asyncio.Semaphore(args.workers)
+    data = [120, 80] if args.sensor == "nibp" else [97, 98]
+    tasks = []
+
+    async def one(i):
+        async with workers:
+            await handle(f"device-{i}", f"user-{i}", args.sensor, data)
+
+    started = now()
+    total = int(args.rate * args.duration)
+    for i in range(total):
+        # 정해진 시각까지 기다렸다가 레코드 생성
+        delay = started + i / args.rate - now()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        log.produced[f"user-{i}"] = now()
+        tasks.append(asyncio.create_task(one(i)))
+    await asyncio.gather(*tasks)
+    return total
+
+
+def report(label, backend, requests_before, log, records, elapsed):
+    print(
+        f"{label:<6} 요청 {backend.requests - requests_before:>7,}번 | {records / elapsed:9,.0f} 레코드/초 | "
+        f"지연 p50 {percentile(log.latencies, 50) * 1000:7.2f}ms | p99 {percentile(log.latencies, 99) * 1000:7.2f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=2000.0, help="초당 생기는 레코드 수 (사용자 전체)")
+    parser.add_argument("--duration", type=float, default=5.0, help="측정 시간(초)")
+    parser.add_argument("--sensor", default="nibp", help="측정할 센서 (nibp / spo2 / temp)")
+    parser.add_argument("--workers", type=int, default=4, help="동시에 처리할 업로드 수 (UPLOAD_WORKERS)")
+    parser.add_argument("--max-records", type=int, default=100, help="배치 하나의 최대 레코드 수")
+    parser.add_argument("--max-latency", type=float, default=0.2, help="배치를 모으는 최대 시간(초)")
+    args = parser.parse_args()
+
+    log = ArrivalLog()
+    backend = await StubBackend(on_request=log.on_request).start()
+    os.environ["DATA_BACKEND_URL"] = backend.base_url
+    os.environ["PAYLOAD_FORMAT"] = "orjson"
+
+    import send_to_data_back
+    from upload_coalescer import UploadCoalescer
+    logging.getLogger("back_data_sender").setLevel(logging.WARNING)
+
+    client = send_to_data_back.create_http_client()
+    try:
+        async def single(device_id, username, sensor_type, data):
+            await send_to_data_back.send_to_data_backend(device_id, username, sensor_type, data, client=client)
+
+        before = backend.requests
+        started = now()
+        records = await produce(single, args, log)
+        report("요청별", backend, before, log, records, now() - started)
+
+        log.latencies.clear()
+        coalescer = UploadCoalescer(client, max_records=args.max_records, max_latency=args.max_latency)
+        before = backend.requests
+        started = now()
+        records = await produce(coalescer.add, args, log)
+        await coalescer.stop()
+        report("배치", backend, before, log, records, now() - started)
+    finally:
+        await client.aclose()
+        await backend.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,294 @@
+"""
+WebSocket 수신 경로 엔드투엔드 부하 벤치마크.
+
+main.py 의 FastAPI 앱을 같은 프로세스 안에서 uvicorn 으로 띄우고, 센서마다 --clients 개의 WebSocket 클라이언트가
+실제 장비와 같은 형식의 패킷을 샘플레이트에 맞춰 보냄. 업로드는 로컬 스텁 백엔드(DATA_BACKEND_URL)가 받음.
+Redis 는 fakeredis 가 설치되어 있으면 fakeredis, 없으면 memory_redis.MemoryRedis 로 대신함
+(--queue-backend memory 이면 Redis 없이 프로세스 내 링 버퍼를 씀).
+
+측정 항목
+- 초당 패킷 수: 서버가 파싱에 성공한 패킷 수(iot_packets_parsed_total) / 측정 시간
+- 수신→업로드 지연 p50 / p99: 업로드에 포함된 마지막 패킷을 클라이언트가 보낸 시각부터 스텁 백엔드에 도착한 시각까지
+  (파형 패킷은 샘플 값에 패킷 번호를 넣어 어느 패킷인지 찾고, 단일값 센서는 세션의 마지막 패킷 기준)
+- 연결당 CPU / 메모리: 프로세스 CPU 시간과 RSS 증가분을 동시 연결 수로 나눈 값
+  (클라이언트도 같은 프로세스에서 돌기 때문에 서버 단독보다 크게 나옴, 변경 전후 비교용)
+
+--packets-per-message N 이면 패킷 N개를 모았다가 WebSocket 메시지 하나로 이어 붙여 보냄 (전송 간격도 N배).
+
+실행: python benchmarks/bench_e2e.py [--clients 4] [--duration 20] [--speedup 10] [--mode batch|stream] [--window 500]
+      [--queue-backend redis|memory] [--packets-per-message 1]
+"""
+import argparse
+import asyncio
+import base64
+import gzip
+import json
+import os
+import resource
+import socket
+import struct
+import sys
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_backend import StubBackend, percentile, now  # noqa: E402
+
+# 패킷 구성 값 (sensor_codec.py 와 같은 형식)
+SOP = 0xF7
+EOP = 0xFA
+_WAVEFORM_PACKET = struct.Struct(">BBB" + "BBH" * 20 + "BBB")
+_AIRFLOW_PACKET = struct.Struct(">BBB" + "HH" * 20 + "BBB")
+# 단일값 센서의 전송 주기(Hz), --speedup 배로 빨라짐
+SCALAR_RATE = 1.0
+
+
+def make_packet(codec, seq):
+    """
+    센서 하나의 패킷을 만듦. 파형 센서는 20개 샘플 값이 모두 seq(패킷 번호)가 되도록 채워서,
+    백엔드에 도착한 업로드의 마지막 값으로 어느 패킷까지 포함됐는지 알 수 있게 함.
+    """
+    if codec.sensor_type == "airflow":
+        # 0xFFFF 는 무효값이므로 피함
+        return _AIRFLOW_PACKET.pack(SOP, codec.cmd, codec.data_size, *([seq % 0xFFFF, 0] * 20), 0, 0, EOP)
+    if codec.packet_length == _WAVEFORM_PACKET.size:
+        return _WAVEFORM_PACKET.pack(SOP, codec.cmd, codec.data_size, *([0, 0, seq % 0x10000] * 20), 0, 0, EOP)
+    if codec.sensor_type == "nibp":
+        body = bytes([0, 80, 120, 0])
+    elif codec.sensor_type == "spo2":
+        body = bytes([0, 0, 95 + seq % 5, 0])
+    else:
+        # TEMP: (3150 + 0) / 100 + 5 = 36.5
+        body = (3150).to_bytes(2, "big") + (0).to_bytes(2, "big")
+    return bytes([SOP, codec.cmd, codec.data_size]) + body + bytes([0, 0, EOP])
+
+
+def decode_upload_values(headers, body, sensor_type):
+    """스텁 백엔드가 받은 본문을 풀어서 (userid, 값 리스트) 반환 (payload_encoder 의 모든 형식 처리, 리스트가 아니면 None)"""
+    encoding = headers.get("content-encoding")
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    elif encoding == "zstd":
+        import zstandard
+        body = zstandard.ZstdDecompressor().decompress(body)
+    if headers.get("content-type") == "application/octet-stream":
+        from payload_encoder import decode_binary
+        decoded = decode_binary(body)
+        return decoded["userid"], list(decoded["data"])
+    payload = json.loads(body)
+    values = payload.get(f"{sensor_type}data")
+    if isinstance(values, str):
+        samples = array("i" if payload.get("encoding") == "int32le" else "d")
+        samples.frombytes(base64.b64decode(values))
+        if sys.byteorder == "big":
+            samples.byteswap()
+        values = samples.tolist()
+    return payload["userid"], values if isinstance(values, list) else None
+
+
+def decode_upload(headers, body, sensor_type):
+    """스텁 백엔드가 받은 본문을 풀어서 (userid, 마지막 값) 반환"""
+    userid, values = decode_upload_values(headers, body, sensor_type)
+    return userid, values[-1] if values else None
+
+
+class Session:
+    """WebSocket 연결 하나에서 보낸 패킷들의 전송 시각"""
+
+    __slots__ = ("sensor_type", "sent_at")
+
+    def __init__(self, sensor_type):
+        self.sensor_type = sensor_type
+        self.sent_at = []
+
+
+class LoadRun:
+    """클라이언트 실행, 업로드 도착 기록, 결과 집계"""
+
+    def __init__(self, args, codecs, url_paths):
+        self.args = args
+        self.codecs = codecs
+        self.url_paths = url_paths
+        self.sessions = {}
+        self.latencies = {sensor_type: [] for sensor_type in codecs}
+        self.unmatched = 0
+        self.sent = 0
+        self.stopping = False
+
+    def on_request(self, path, headers, body):
+        arrived = now()
+        sensor_type = self.url_paths.get(path)
+        try:
+            userid, last_value = decode_upload(headers, body, sensor_type)
+        except Exception:
+            self.unmatched += 1
+            return 400
+        session = self.sessions.get(userid)
+        if session is None or not session.sent_at:
+            self.unmatched += 1
+            return 200
+        sent_at = session.sent_at
+        if isinstance(last_value, int) and self.codecs[sensor_type].packet_length == _WAVEFORM_PACKET.size:
+            # 샘플 값 = 패킷 번호 (65536개마다 반복되므로 가장 최근 것을 찾음)
+            modulus = 0xFFFF if sensor_type == "airflow" else 0x10000
+            index = last_value + (len(sent_at) - 1 - last_value) // modulus * modulus
+            sent = sent_at[index] if 0 <= index < len(sent_at) else sent_at[-1]
+        else:
+            sent = sent_at[-1]
+        self.latencies[sensor_type].append(arrived - sent)
+        return 200
+
+    async def client(self, ws_base, sensor_type, client_index):
+        """연결이 끊기면(배치 모드에서 큐가 가득 차면) 새 사용자 이름으로 다시 연결하면서 측정 시간 동안 전송"""
+        import websockets
+
+        codec = self.codecs[sensor_type]
+        rate = (codec.sample_rate / 20 if codec.sample_rate else SCALAR_RATE) * self.args.speedup
+        per_message = max(1, self.args.packets_per_message)
+        interval = per_message / rate
+        query = ""
+        if self.args.mode == "stream":
+            window = min(self.args.window, codec.queue_size)
+            query = f"?mode=stream&window={window}&overlap=0"
+        connection_index = 0
+        while not self.stopping:
+            username = f"bench-{sensor_type}-{client_index}-{connection_index}"
+            connection_index += 1
+            session = self.sessions[username] = Session(sensor_type)
+            try:
+                async with websockets.connect(f"{ws_base}/ws/{username}/{sensor_type}{query}") as ws:
+                    await ws.send(f"device-{client_index}")
+                    await ws.send(username)
+                    next_send = now()
+                    seq = 0
+                    while not self.stopping:
+                        await ws.send(b"".join(make_packet(codec, seq + i) for i in range(per_message)))
+                        sent = now()
+                        session.sent_at.extend([sent] * per_message)
+                        self.sent += per_message
+                        seq += per_message
+                        next_send += interval
+                        delay = next_send - now()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+            except websockets.ConnectionClosed:
+                pass
+
+
+def rss_bytes():
+    """현재 RSS (리눅스는 /proc, 그 외에는 최대 RSS로 대신함)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def parsed_packets(counter):
+    return sum(child.value for child in counter._children.values())
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=4, help="센서별 동시 WebSocket 클라이언트 수")
+    parser.add_argument("--duration", type=float, default=20.0, help="측정 시간(초)")
+    parser.add_argument("--speedup", type=float, default=10.0, help="실제 샘플레이트 대비 전송 속도 배율")
+    parser.add_argument("--mode", choices=("batch", "stream"), default="batch", help="전송 방식")
+    parser.add_argument("--window", type=int, default=500, help="스트리밍 모드의 윈도우 크기(샘플)")
+    parser.add_argument("--queue-backend", choices=("redis", "memory"), default="redis", help="세션 큐 백엔드")
+    parser.add_argument("--packets-per-message", type=int, default=1, help="WebSocket 메시지 하나에 담을 패킷 수")
+    parser.add_argument("--sensors", default="", help="측정할 센서 (쉼표 구분, 기본: 업로드 URL이 있는 전부)")
+    args = parser.parse_args()
+
+    backend = StubBackend()
+    await backend.start()
+    # 설정은 import 시점에 읽으므로 앱을 불러오기 전에 환경 변수를 지정
+    os.environ["DATA_BACKEND_URL"] = backend.base_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["QUEUE_BACKEND"] = args.queue_backend
+    # --speedup 으로 실제 장비보다 빠르게 보내므로 연결별 패킷 속도 제한 / 루프 지연에 따른 거절은 끔
+    os.environ.setdefault("ADMISSION_PACKET_RATE", "0")
+    os.environ.setdefault("ADMISSION_MAX_LOOP_LAG", "0")
+
+    import uvicorn
+    import main as app_main
+    from sensor_codec import SENSOR_CODECS
+    from send_to_data_back import SENSOR_URL_MAPPING
+    from metrics import PACKETS_PARSED
+
+    try:
+        from fakeredis import aioredis as fake_aioredis
+        redis = fake_aioredis.FakeRedis()
+        redis_name = "fakeredis"
+    except ImportError:
+        from memory_redis import MemoryRedis
+        redis = MemoryRedis()
+        redis_name = "MemoryRedis"
+
+    async def from_url(url, **kwargs):
+        return redis
+    app_main.aioredis.from_url = from_url
+
+    sensors = [s for s in args.sensors.split(",") if s] or [s for s in SENSOR_CODECS if s in SENSOR_URL_MAPPING]
+    codecs = {sensor_type: SENSOR_CODECS[sensor_type] for sensor_type in sensors}
+    url_paths = {SENSOR_URL_MAPPING[s]["url"].replace(backend.base_url, "", 1): s for s in sensors}
+    run = LoadRun(args, codecs, url_paths)
+    backend.on_request = run.on_request
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app_main.app, log_level="warning", lifespan="on"))
+    server_task = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    if args.queue_backend == "memory":
+        redis_name = "사용 안 함 (memory 큐 백엔드)"
+    print(f"Redis 대역: {redis_name}, 센서: {', '.join(sensors)}, 센서별 클라이언트 {args.clients}개, "
+          f"{args.mode} 모드, 속도 x{args.speedup:g}, 메시지당 패킷 {args.packets_per_message}개")
+    connections = len(sensors) * args.clients
+    rss_before = rss_bytes()
+    rss_peak = rss_before
+    cpu_before = cpu_seconds()
+    parsed_before = parsed_packets(PACKETS_PARSED)
+    started = now()
+    clients = [asyncio.create_task(run.client(f"ws://127.0.0.1:{port}", sensor_type, i))
+               for sensor_type in sensors for i in range(args.clients)]
+    while now() - started < args.duration:
+        await asyncio.sleep(0.5)
+        rss_peak = max(rss_peak, rss_bytes())
+    elapsed = now() - started
+    cpu_used = cpu_seconds() - cpu_before
+    parsed = parsed_packets(PACKETS_PARSED) - parsed_before
+
+    run.stopping = True
+    await asyncio.gather(*clients, return_exceptions=True)
+    # 업로드 워커에 남은 작업을 마저 처리
+    flusher = app_main.app.state.upload_flusher
+    while flusher.queue.qsize():
+        await asyncio.sleep(0.1)
+    server.should_exit = True
+    await server_task
+    await backend.stop()
+
+    print(f"전송 {run.sent:,}패킷, 파싱 {parsed:,}패킷 → {parsed / elapsed:,.0f} 패킷/초")
+    print(f"CPU {cpu_used / elapsed:.1%} (연결당 {cpu_used / elapsed / connections:.2%}), "
+          f"RSS 증가 {(rss_peak - rss_before) / 1024:,.0f}KB (연결당 {(rss_peak - rss_before) / 1024 / connections:,.1f}KB)")
+    for sensor_type, latencies in run.latencies.items():
+        if latencies:
+            print(f"{sensor_type:>8} | 업로드 {len(latencies):>5} | p50 {percentile(latencies, 50) * 1000:8.2f}ms | "
+                  f"p99 {percentile(latencies, 99) * 1000:8.2f}ms")
+        else:
+            print(f"{sensor_type:>8} | 업로드 없음 (측정 시간 안에 큐가 차지 않음)")
+    print(f"백엔드 요청 {backend.requests:,}건, 상태 코드 {backend.status_codes}, 매칭 실패 {run.unmatched}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,178 @@
+"""
+장비 세션 메모리 벤치마크: 동시 WebSocket 세션 --sessions 개를 열어 두고 패킷을 돌아가며 넣으면서
+연결당 메모리(RSS, tracemalloc)와 패킷 하나를 처리할 때 생기는 임시 할당을 측정함.
+
+서버 쪽 비용만 보기 위해 실제 소켓 대신 메시지를 큐로 넘겨주는 가짜 WebSocket 으로 handle_websocket 을 직접 실행함
+(uvicorn / websockets 의 연결당 비용은 포함되지 않음). Redis 는 benchmarks/memory_redis.MemoryRedis 로 대신하고,
+Redis 대역이 들고 있는 값은 tracemalloc 집계에서 뺌.
+
+측정 항목
+- 연결당 RSS: 세션을 열고 --warmup 개 패킷을 넣은 뒤의 RSS 증가분 / 세션 수
+- 연결당 유지 메모리: tracemalloc 으로 본 세션 하나가 들고 있는 파이썬 메모리 (파일:줄 별 상위 항목 포함)
+- 임시 할당: 세션 하나가 메시지 하나를 처리하는 동안 tracemalloc 최댓값이 늘어난 양 (여러 번 중 최대)
+- 패킷당 처리 시간 (tracemalloc 없이)
+
+실행: python benchmarks/bench_memory.py [--sessions 1000] [--sensor ecg] [--queue-backend memory|redis]
+      [--warmup 50] [--packets-per-message 1]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_e2e import make_packet, rss_bytes  # noqa: E402
+
+
+class FakeWebSocket:
+    """handle_websocket 이 쓰는 메서드만 가진 WebSocket 대역 (inbox 에 넣은 메시지를 차례로 돌려줌)"""
+
+    def __init__(self, app, query_params):
+        self.app = app
+        self.query_params = query_params
+        self.inbox = asyncio.Queue()
+        self.closed = None
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000, reason=None):
+        self.closed = (code, reason)
+
+    async def receive_text(self):
+        return await self.inbox.get()
+
+    async def receive_bytes(self):
+        from fastapi import WebSocketDisconnect
+
+        message = await self.inbox.get()
+        if message is None:
+            raise WebSocketDisconnect(1000)
+        return message
+
+
+async def settle(sockets):
+    """모든 세션이 받은 메시지를 다 처리할 때까지 이벤트 루프를 돌림"""
+    while any(not ws.inbox.empty() for ws in sockets):
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+
+async def feed_round(sockets, message):
+    for ws in sockets:
+        ws.inbox.put_nowait(message)
+    await settle(sockets)
+
+
+def excluding_bench(snapshot):
+    """Redis 대역 / 벤치마크 자체가 잡은 메모리는 빼고 서버 코드 기준으로 집계"""
+    # asyncio 의 queues.py / locks.py 는 가짜 WebSocket 의 수신 큐(asyncio.Queue)가 잡은 것 (실제 연결에서는 uvicorn 쪽 비용)
+    return snapshot.filter_traces((tracemalloc.Filter(False, "*memory_redis.py"), tracemalloc.Filter(False, __file__),
+                                   tracemalloc.Filter(False, "*asyncio/queues.py"),
+                                   tracemalloc.Filter(False, "*asyncio/locks.py"),
+                                   tracemalloc.Filter(False, tracemalloc.__file__)))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1000, help="동시 세션 수")
+    parser.add_argument("--sensor", default="ecg", help="센서 종류")
+    parser.add_argument("--queue-backend", choices=("redis", "memory"), default="memory", help="세션 큐 백엔드")
+    parser.add_argument("--warmup", type=int, default=50, help="측정 전에 세션마다 넣을 패킷 수")
+    parser.add_argument("--packets-per-message", type=int, default=1, help="WebSocket 메시지 하나에 담을 패킷 수")
+    parser.add_argument("--top", type=int, default=8, help="연결당 유지 메모리 상위 항목 수")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import logging
+    from queue_backend import create_queue_backend
+    from memory_redis import MemoryRedis
+    from receive_and_parsing import handle_websocket
+    from sensor_codec import SENSOR_CODECS
+    logging.getLogger("sensor_logger").setLevel(logging.ERROR)
+
+    codec = SENSOR_CODECS[args.sensor]
+    per_message = max(1, args.packets_per_message)
+    state = SimpleNamespace(queue_backend=create_queue_backend(args.queue_backend, MemoryRedis()),
+                            upload_flusher=None, pubsub_hub=None, http_client=None)
+    app = SimpleNamespace(state=state)
+    # 샘플 값이 256 이상이어야 파이썬의 작은 정수 캐시를 타지 않아 실제 ECG 값(2000 전후)과 같은 할당이 생김
+    seq = 2000
+
+    def next_message():
+        nonlocal seq
+        message = b"".join(make_packet(codec, seq + i) for i in range(per_message))
+        seq += per_message
+        return message
+
+    async def open_sessions(count, prefix):
+        sockets = [FakeWebSocket(app, {}) for _ in range(count)]
+        tasks = [asyncio.create_task(handle_websocket(args.sensor, f"{prefix}-{i}", ws)) for i, ws in enumerate(sockets)]
+        for i, ws in enumerate(sockets):
+            ws.inbox.put_nowait(f"device-{i}")
+            ws.inbox.put_nowait(f"{prefix}-{i}")
+        await settle(sockets)
+        return sockets, tasks
+
+    async def close_sessions(sockets, tasks):
+        for ws in sockets:
+            ws.inbox.put_nowait(None)
+        await asyncio.gather(*tasks)
+
+    print(f"센서 {args.sensor}, 세션 {args.sessions:,}개, {args.queue_backend} 큐 백엔드, 메시지당 패킷 {per_message}개")
+
+    # 1) 연결당 RSS, 패킷당 처리 시간 (tracemalloc 없이)
+    rss_before = rss_bytes()
+    sockets, tasks = await open_sessions(args.sessions, "user")
+    for _ in range(max(1, args.warmup // per_message)):
+        await feed_round(sockets, next_message())
+    rss_after = rss_bytes()
+    rounds = 20
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await feed_round(sockets, next_message())
+    elapsed = time.perf_counter() - started
+    packets = rounds * per_message * len(sockets)
+    print(f"연결당 RSS {(rss_after - rss_before) / len(sockets) / 1024:8.1f}KB | "
+          f"패킷당 처리 {elapsed / packets * 1e6:6.2f}µs (이벤트 루프 전환 포함)")
+
+    # 2) 임시 할당 (tracemalloc 을 켠 뒤 몇 번 돌려서 시작 직후의 할당은 뺌)
+    tracemalloc.start()
+    for _ in range(3):
+        await feed_round(sockets, next_message())
+    # 세션 하나에만 메시지를 넣어서 그 메시지를 처리하는 동안의 최대 임시 메모리를 봄
+    # (모든 세션에 한꺼번에 넣으면 깨어나는 태스크 수만큼 이벤트 루프의 대기열이 커져서 그 값이 섞임)
+    transient = 0
+    for ws in sockets[:20]:
+        message = next_message()
+        current_before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await feed_round([ws], message)
+        transient = max(transient, tracemalloc.get_traced_memory()[1] - current_before)
+    print(f"메시지 하나 처리 중 임시 메모리 최대 {transient:,}B (패킷 {per_message}개)")
+
+    # 3) 연결당 유지 메모리 (세션을 100개 더 열어서 차이를 봄)
+    extra = min(100, args.sessions)
+    before = excluding_bench(tracemalloc.take_snapshot())
+    extra_sockets, extra_tasks = await open_sessions(extra, "extra")
+    for _ in range(max(1, args.warmup // per_message)):
+        await feed_round(extra_sockets, next_message())
+    after = excluding_bench(tracemalloc.take_snapshot())
+    stats = after.compare_to(before, "lineno")
+    total = sum(stat.size_diff for stat in stats)
+    print(f"연결당 유지 메모리 {total / extra / 1024:8.1f}KB (tracemalloc, Redis 대역 제외)")
+    for stat in sorted(stats, key=lambda s: s.size_diff, reverse=True)[:args.top]:
+        frame = stat.traceback[0]
+        print(f"  {stat.size_diff / extra:9,.0f}B  {os.path.basename(frame.filename)}:{frame.lineno}")
+    tracemalloc.stop()
+
+    await close_sessions(extra_sockets, extra_tasks)
+    await close_sessions(sockets, tasks)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
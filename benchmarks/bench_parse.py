@@ -0,0 +1,121 @@
+"""
+86바이트 파형 패킷 디코더 마이크로 벤치마크.
+
+기존 parse_sensor_data 의 hex 문자열 + 4바이트 파이썬 루프 방식(legacy_parse)과
+sensor_codec 의 Struct 기반 디코더를 같은 패킷으로 비교하고, 결과가 완전히 같은지 확인함.
+
+실행: python benchmarks/bench_parse.py [--packets 2000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sensor_codec import (  # noqa: E402
+    SOP, EOP, WAVEFORM_SAMPLES_PER_PACKET, decode_waveform, decode_airflow, decode_waveform_batch,
+)
+
+# 벤치마크 대상 센서의 cmd
+WAVEFORM_SENSORS = {"ecg": 0x12, "emg": 0x22, "eog": 0x32, "gsr": 0x82, "airflow": 0x62}
+
+# 경계값을 일부러 넣어 만든 ECG / AIRFLOW 합성 패킷 (16진수 문자열, 실제 장비에서 캡처한 것이 아님)
+# - 모든 바이트가 같은 값인 패킷 / 샘플마다 값이 바뀌는 패킷
+# - AIRFLOW 무효값(0xFFFF)이 중간 / 맨 앞에 있는 패킷
+SYNTHETIC_PACKETS = [
+    "f71250" + "01020200" * 20 + "0000fa",
+    "f71250" + "".join(f"{i:02x}{i + 1:02x}{i * 31:04x}" for i in range(20)) + "0000fa",
+    "f76250" + "00ff0000" * 5 + "00ffff00" + "7fff8000" * 14 + "0000fa",
+    "f76250" + "ffff0000" + "00010002" * 19 + "0000fa",
+]
+
+
+def legacy_parse(raw_data_hex):
+    """기존 parse_sensor_data 의 86바이트 분기를 그대로 옮긴 비교 기준."""
+    raw_data_bytes = bytes.fromhex(raw_data_hex)
+    received_cmd = raw_data_bytes[1]
+    data = raw_data_bytes[3:-1]
+    data_values = []
+    if received_cmd == 0x62:
+        for i in range(0, len(data), 4):
+            if i + 4 > len(data):
+                break
+            byte1 = int.from_bytes(data[i:i + 2], byteorder="big")
+            byte2 = int.from_bytes(data[i + 2:i + 4], byteorder="big")
+            real_value = byte1 + byte2
+            if real_value == 65535:
+                data_values.append(-1)
+                return data_values
+            data_values.append(real_value)
+        return data_values
+    for i in range(0, len(data), 4):
+        if i + 4 > len(data):
+            break
+        byte1 = data[i]
+        byte2 = data[i + 1]
+        fixed_value = int.from_bytes(data[i + 2:i + 4], byteorder="big")
+        real_value = byte1 + byte2 + fixed_value
+        data_values.append(real_value)
+    return data_values
+
+
+def new_parse(packet):
+    """sensor_codec 디코더 (bytes 그대로 사용)."""
+    if packet[1] == 0x62:
+        return decode_airflow(packet)
+    return decode_waveform(packet)
+
+
+def make_packet(rng, cmd):
+    """임의의 값을 가진 86바이트 패킷 생성."""
+    body = bytes(rng.getrandbits(8) for _ in range(WAVEFORM_SAMPLES_PER_PACKET * 4))
+    return bytes([SOP, cmd, 0x50]) + body + b"\x00\x00" + bytes([EOP])
+
+
+def check_identical(packets):
+    """합성 패킷과 무작위 생성 패킷 모두 기존 함수와 결과가 같은지 확인."""
+    for packet in packets:
+        expected = legacy_parse(packet.hex())
+        actual = new_parse(packet)
+        if expected != actual:
+            raise AssertionError(f"디코딩 결과 불일치: {packet.hex()}\n{expected}\n{actual}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--packets", type=int, default=2000, help="센서별 생성 패킷 수")
+    parser.add_argument("--repeat", type=int, default=5, help="측정 반복 횟수(최솟값 사용)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    synthetic = [bytes.fromhex(h) for h in SYNTHETIC_PACKETS]
+    check_identical(synthetic)
+    print(f"경계값 합성 패킷 {len(synthetic)}개: 기존 함수와 결과 일치")
+
+    for sensor_type, cmd in WAVEFORM_SENSORS.items():
+        packets = [make_packet(rng, cmd) for _ in range(args.packets)]
+        check_identical(packets)
+        hex_packets = [p.hex() for p in packets]
+        joined = b"".join(packets)
+        airflow = cmd == 0x62
+
+        legacy = min(timeit.repeat(lambda: [legacy_parse(h) for h in hex_packets], number=1, repeat=args.repeat))
+        single = min(timeit.repeat(lambda: [new_parse(p) for p in packets], number=1, repeat=args.repeat))
+        batch = min(timeit.repeat(lambda: decode_waveform_batch(joined, cmd, airflow), number=1, repeat=args.repeat))
+
+        expected = [v for h in hex_packets for v in legacy_parse(h)]
+        if decode_waveform_batch(joined, cmd, airflow) != expected:
+            raise AssertionError(f"[{sensor_type}] 배치 디코딩 결과 불일치")
+
+        per_packet = 1e6 / args.packets
+        print(
+            f"[{sensor_type:>7}] 기존 {legacy * per_packet:6.2f}us/패킷 | "
+            f"단건 {single * per_packet:6.2f}us/패킷 (x{legacy / single:4.1f}) | "
+            f"배치 {batch * per_packet:6.2f}us/패킷 (x{legacy / batch:4.1f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
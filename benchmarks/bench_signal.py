@@ -0,0 +1,75 @@
+"""
+신호 처리 단계 벤치마크: 설정별로 패킷(20샘플) 하나를 처리하는 시간과 저장 / 업로드 크기 감소를 측정함.
+
+500Hz ECG 와 비슷한 신호(60Hz 전원 잡음, 기저선 변동 포함)를 패킷 단위로 나눠 처리하고,
+전체를 한 번에 처리한 결과와 같은지(세션 상태가 패킷 경계를 제대로 잇는지) 확인함.
+
+실행: python benchmarks/bench_signal.py [--seconds 30] [--repeat 5]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from signal_processing import ProcessingSpec  # noqa: E402
+from payload_encoder import encode_binary  # noqa: E402
+
+# (이름, 데시메이션 비율, 노치 주파수, 기저선 차단 주파수)
+CASES = (
+    ("250Hz", 2, 0, 0),
+    ("125Hz", 4, 0, 0),
+    ("notch+baseline", 1, 60, 0.5),
+    ("250Hz+notch+baseline", 2, 60, 0.5),
+)
+
+
+def make_ecg(samples, rng):
+    """500Hz ECG 와 비슷한 정수 샘플 (피크 + 호흡 기저선 변동 + 60Hz 전원 잡음 + 잡음)"""
+    values = []
+    for i in range(samples):
+        t = i / 500
+        beat = 600 * math.exp(-((t % 0.8) - 0.2) ** 2 / 0.0005)
+        values.append(int(2048 + 150 * math.sin(2 * math.pi * 0.3 * t) + 40 * math.sin(2 * math.pi * 60 * t)
+                          + beat + rng.gauss(0, 6)))
+    return values
+
+
+def run_packets(spec, packets):
+    processor = spec.new_session()
+    out = []
+    for packet in packets:
+        out += processor.process(packet)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30.0, help="신호 길이(초)")
+    parser.add_argument("--repeat", type=int, default=5, help="측정 반복 횟수")
+    args = parser.parse_args()
+
+    values = make_ecg(int(args.seconds * 500), random.Random(0))
+    packets = [values[i:i + 20] for i in range(0, len(values), 20)]
+    raw_size = len(encode_binary("d", "u", "ecg", values, 500))
+    print(f"입력 {len(values):,}샘플 ({len(packets):,}패킷), binary {raw_size:,} bytes")
+
+    for name, factor, notch, baseline in CASES:
+        spec = ProcessingSpec(500, factor, notch=notch, baseline=baseline)
+        out = run_packets(spec, packets)
+        if out != spec.new_session().process(values):
+            raise AssertionError(f"{name}: 패킷 단위 처리 결과가 한 번에 처리한 결과와 다릅니다.")
+        elapsed = min(timeit.repeat(lambda: run_packets(spec, packets), number=1, repeat=args.repeat))
+        binary = len(encode_binary("d", "u", "ecg", out, spec.output_rate))
+        varint = len(encode_binary("d", "u", "ecg", out, spec.output_rate, varint=True))
+        print(
+            f"{name:>22} | 패킷당 {elapsed / len(packets) * 1e6:6.1f}µs | 샘플 {len(out):>7,} | "
+            f"binary {binary:>7,} bytes ({binary / raw_size:5.1%}) | varint {varint:>7,} bytes ({varint / raw_size:5.1%})"
+        )
+
+
+if __name__ == "__main__":
+    main()
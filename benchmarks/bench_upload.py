@@ -0,0 +1,73 @@
+"""
+백엔드 업로드 벤치마크: 업로드마다 새 httpx.AsyncClient 를 만드는 기존 방식과
+create_http_client() 로 만든 공유 keep-alive 클라이언트를 로컬 스텁 백엔드에 대해 비교함.
+
+실행: python benchmarks/bench_upload.py [--uploads 200] [--concurrency 10] [--handshake-ms 20]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_backend import StubBackend, percentile, now  # noqa: E402
+
+
+async def run_uploads(send, client, uploads, concurrency, samples):
+    """같은 크기의 ECG 배치를 concurrency 개씩 동시에 업로드하고 업로드별 지연을 기록"""
+    data = list(range(samples))
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            started = now()
+            await send(f"device-{i % concurrency}", f"user-{i % concurrency}", "ecg", data, client=client)
+            latencies.append(now() - started)
+
+    started = now()
+    await asyncio.gather(*(one(i) for i in range(uploads)))
+    return latencies, now() - started
+
+
+def report(label, latencies, elapsed, backend, connections_before):
+    print(
+        f"{label:<10} p50 {percentile(latencies, 50) * 1000:7.2f}ms | p99 {percentile(latencies, 99) * 1000:7.2f}ms | "
+        f"{len(latencies) / elapsed:7.1f} 업로드/초 | 새 연결 {backend.connections - connections_before}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=200, help="업로드 횟수")
+    parser.add_argument("--concurrency", type=int, default=10, help="동시 업로드 수")
+    parser.add_argument("--samples", type=int, default=15000, help="업로드 한 번의 샘플 수")
+    parser.add_argument("--handshake-ms", type=float, default=20.0, help="새 연결마다 흉내낼 핸드셰이크 지연(ms)")
+    args = parser.parse_args()
+
+    backend = await StubBackend(handshake_delay=args.handshake_ms / 1000).start()
+    os.environ["DATA_BACKEND_URL"] = backend.base_url
+
+    import send_to_data_back
+    logging.getLogger("back_data_sender").setLevel(logging.WARNING)
+
+    before = backend.connections
+    latencies, elapsed = await run_uploads(send_to_data_back.send_to_data_backend, None,
+                                           args.uploads, args.concurrency, args.samples)
+    report("요청별", latencies, elapsed, backend, before)
+
+    client = send_to_data_back.create_http_client()
+    try:
+        before = backend.connections
+        latencies, elapsed = await run_uploads(send_to_data_back.send_to_data_backend, client,
+                                               args.uploads, args.concurrency, args.samples)
+        report("공유 풀", latencies, elapsed, backend, before)
+    finally:
+        await client.aclose()
+        await backend.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
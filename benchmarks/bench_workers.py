@@ -0,0 +1,182 @@
+"""
+워커 프로세스 수에 따른 수신 처리량 벤치마크.
+
+serve.py 로 서버를 --workers 개 워커로 실제 프로세스로 띄우고(QUEUE_BACKEND=redis), 여러 클라이언트 프로세스가
+스트리밍 모드 WebSocket 연결로 패킷을 쉬지 않고 보냄. 워커 수마다 다음을 측정함.
+
+- 전송 패킷/초: 클라이언트가 보낸 패킷 수 / 측정 시간 (서버가 따라가지 못하면 나머지는 소켓 버퍼에 쌓이므로 참고용)
+- 업로드 샘플/초: 측정 시간 동안 스텁 백엔드(DATA_BACKEND_URL)에 도착한 샘플 수 / 측정 시간
+  (모든 워커의 수신 → 파싱 → Redis → 업로드를 거친 값이므로 워커 수에 따른 확장성을 그대로 보여줌)
+
+Redis 는 --redis-url 로 실제 서버를 지정하는 것을 권장함. 지정하지 않으면 fakeredis 의 TCP 서버를 이 프로세스 안에서 띄우는데,
+이 경우 Redis 대역과 스텁 백엔드, 측정 코드가 한 프로세스(GIL)를 나눠 쓰므로 워커를 늘려도 그쪽에서 먼저 막힘(동작 확인용).
+CPU 코어 수보다 워커를 많이 띄우면 늘어나지 않는 것이 정상.
+
+실행: python benchmarks/bench_workers.py [--workers 1,2,4] [--connections 32] [--client-procs 2] [--duration 15]
+      [--sensor ecg] [--window 500] [--redis-url redis://localhost:6379/15]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stub_backend import StubBackend, now  # noqa: E402
+from bench_e2e import make_packet, decode_upload_values  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_redis():
+    """fakeredis TCP 서버를 백그라운드 스레드로 띄우고 주소를 반환"""
+    from fakeredis import TcpFakeServer
+
+    port = free_port()
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"redis://127.0.0.1:{port}"
+
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def run_clients(ws_base, sensor_type, window, connections, duration, proc_index):
+    """클라이언트 프로세스 하나: connections 개의 연결에서 duration 초 동안 쉬지 않고 전송, 보낸 패킷 수를 반환"""
+    from sensor_codec import SENSOR_CODECS
+
+    codec = SENSOR_CODECS[sensor_type]
+    packets = [make_packet(codec, seq) for seq in range(1000)]
+
+    async def client(index, stop_at):
+        import websockets
+
+        username = f"bench-w-{proc_index}-{index}"
+        sent = 0
+        try:
+            async with websockets.connect(f"{ws_base}/ws/{username}/{sensor_type}?mode=stream&window={window}") as ws:
+                await ws.send(f"device-{proc_index}-{index}")
+                await ws.send(username)
+                while time.monotonic() < stop_at:
+                    await ws.send(packets[sent % 1000])
+                    sent += 1
+                    # 한 연결이 이벤트 루프를 독차지하지 않도록 주기적으로 양보
+                    if sent % 50 == 0:
+                        await asyncio.sleep(0)
+        except Exception:
+            pass
+        return sent
+
+    async def main():
+        stop_at = time.monotonic() + duration
+        return sum(await asyncio.gather(*(client(i, stop_at) for i in range(connections))))
+
+    return asyncio.run(main())
+
+
+class UploadCounter:
+    """스텁 백엔드에 도착한 샘플 수 (측정 구간만 셈)"""
+
+    def __init__(self, sensor_type):
+        self.sensor_type = sensor_type
+        self.samples = 0
+        self.counting = False
+
+    def on_request(self, path, headers, body):
+        if self.counting:
+            _, values = decode_upload_values(headers, body, self.sensor_type)
+            self.samples += len(values or ())
+        return 200
+
+
+async def measure(args, workers, redis_url, backend, counter, pool):
+    port = free_port()
+    env = dict(os.environ, QUEUE_BACKEND="redis", PUBSUB_BACKEND="memory", REDIS_URL=redis_url,
+               REDIS_KEY_PREFIX=f"bench:{workers}:", DATA_BACKEND_URL=backend.base_url)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    # 클라이언트가 쉬지 않고 보내서 처리량 한계를 재므로 연결별 패킷 속도 제한 / 루프 지연에 따른 거절은 끔
+    env.setdefault("ADMISSION_PACKET_RATE", "0")
+    env.setdefault("ADMISSION_MAX_LOOP_LAG", "0")
+    server = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.join(ROOT, "serve.py"), "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), cwd=ROOT, env=env, start_new_session=True)
+    try:
+        if not await asyncio.get_running_loop().run_in_executor(None, wait_for_port, port):
+            raise RuntimeError("서버가 시작되지 않았습니다.")
+        # 첫 워커가 accept 를 시작해도 나머지 워커의 startup 이 끝날 때까지 잠시 기다림
+        await asyncio.sleep(1.0 + 0.2 * workers)
+
+        loop = asyncio.get_running_loop()
+        per_proc = max(1, args.connections // args.client_procs)
+        counter.samples = 0
+        counter.counting = True
+        started = now()
+        sent = await asyncio.gather(*(
+            loop.run_in_executor(pool, run_clients, f"ws://127.0.0.1:{port}", args.sensor, args.window,
+                                 per_proc, args.duration, i)
+            for i in range(args.client_procs)))
+        elapsed = now() - started
+        counter.counting = False
+        return sum(sent) / elapsed, counter.samples / elapsed
+    finally:
+        # 종료 중에도 업로드 워커가 남은 작업을 스텁 백엔드로 보내므로, 이벤트 루프를 막지 않고 기다림.
+        # 처리량을 넘겨서 보낸 패킷은 소켓 버퍼에 남아 있을 수 있으므로 오래 기다리지 않음 (측정은 이미 끝남)
+        # 정상 종료는 uvicorn 부모 프로세스가 워커들을 정리하고, 시간 안에 끝나지 않으면 워커까지 프로세스 그룹째 종료
+        server.send_signal(signal.SIGINT)
+        try:
+            await asyncio.wait_for(server.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            os.killpg(server.pid, signal.SIGKILL)
+            await server.wait()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="측정할 워커 수 (쉼표 구분)")
+    parser.add_argument("--connections", type=int, default=32, help="전체 동시 WebSocket 연결 수")
+    parser.add_argument("--client-procs", type=int, default=2, help="클라이언트 프로세스 수")
+    parser.add_argument("--duration", type=float, default=15.0, help="워커 수마다 측정 시간(초)")
+    parser.add_argument("--sensor", default="ecg", help="측정할 센서 (파형 센서)")
+    parser.add_argument("--window", type=int, default=500, help="스트리밍 모드의 윈도우 크기(샘플)")
+    parser.add_argument("--redis-url", default="", help="사용할 Redis (기본: 이 프로세스 안의 fakeredis TCP 서버)")
+    args = parser.parse_args()
+
+    redis_url = args.redis_url or start_fake_redis()
+    counter = UploadCounter(args.sensor)
+    backend = StubBackend(on_request=counter.on_request)
+    await backend.start()
+
+    print(f"Redis: {redis_url}{'' if args.redis_url else ' (fakeredis)'}, CPU {os.cpu_count()}개, "
+          f"연결 {args.connections}개 / 클라이언트 프로세스 {args.client_procs}개, 센서 {args.sensor}")
+    results = []
+    with ProcessPoolExecutor(args.client_procs, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for workers in [int(w) for w in args.workers.split(",") if w]:
+            sent_rate, sample_rate = await measure(args, workers, redis_url, backend, counter, pool)
+            results.append((workers, sent_rate, sample_rate))
+            base = results[0][2] or 1
+            print(f"워커 {workers:>2} | 전송 {sent_rate:>10,.0f} 패킷/초 | 업로드 {sample_rate:>12,.0f} 샘플/초 "
+                  f"| x{sample_rate / base:.2f}")
+    await backend.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""
+벤치마크용 인메모리 Redis 대역.
+
+fakeredis 가 없을 때 쓰기 위한 것으로, 이 프로젝트가 쓰는 리스트/문자열 명령과 파이프라인만 흉내냄.
+단일 이벤트 루프 안에서만 쓰므로 파이프라인 execute() 는 명령들을 순서대로 실행하는 것으로 원자성을 대신함.
+"""
+
+
+class MemoryRedis:
+    """aioredis.Redis 의 일부 명령을 dict 기반으로 구현"""
+
+    def __init__(self):
+        self.data = {}
+
+    # 리스트 명령
+    async def rpush(self, key, *values):
+        items = self.data.setdefault(key, [])
+        items.extend(v if isinstance(v, bytes) else str(v).encode() for v in values)
+        return len(items)
+
+    async def llen(self, key):
+        return len(self.data.get(key, ()))
+
+    async def lrange(self, key, start, end):
+        items = self.data.get(key, [])
+        end = len(items) if end == -1 else end + 1 if end >= 0 else len(items) + end + 1
+        return items[start if start >= 0 else max(0, len(items) + start):end]
+
+    async def ltrim(self, key, start, end):
+        items = await self.lrange(key, start, end)
+        if items:
+            self.data[key] = list(items)
+        else:
+            self.data.pop(key, None)
+        return True
+
+    # 키 / 문자열 명령
+    async def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    async def rename(self, key, new_key):
+        if key not in self.data:
+            raise KeyError("ERR no such key")
+        self.data[new_key] = self.data.pop(key)
+        return True
+
+    async def expire(self, key, seconds):
+        return key in self.data
+
+    async def incrby(self, key, amount):
+        value = int(self.data.get(key, b"0")) + amount
+        self.data[key] = str(value).encode()
+        return value
+
+    async def set(self, key, value, **kwargs):
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    def pipeline(self, transaction=True):
+        return MemoryPipeline(self)
+
+    async def close(self):
+        pass
+
+
+class MemoryPipeline:
+    """명령을 모아두었다가 execute() 때 순서대로 실행"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self.redis, name)
+
+        def queue(*args, **kwargs):
+            self.commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        results = [await method(*args, **kwargs) for method, args, kwargs in self.commands]
+        self.commands.clear()
+        return results
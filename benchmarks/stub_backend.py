@@ -0,0 +1,87 @@
+"""
+벤치마크용 로컬 스텁 백엔드.
+
+외부 의존성 없이 asyncio 스트림만으로 HTTP/1.1 keep-alive 요청을 받아 200 응답을 돌려줌.
+새 연결마다 --handshake-ms 만큼 지연을 주어 ngrok 너머의 TCP/TLS 핸드셰이크 비용을 흉내낼 수 있음.
+"""
+import asyncio
+import time
+
+
+class StubBackend:
+    """요청 수, 받은 바이트 수, 새 연결 수, 요청 도착 시각을 기록하는 스텁 서버"""
+
+    def __init__(self, host="127.0.0.1", port=0, handshake_delay=0.0, on_request=None):
+        """
+        :param host: 바인딩 주소
+        :param port: 포트 (0이면 임의의 빈 포트)
+        :param handshake_delay: 새 연결마다 주는 지연(초)
+        :param on_request: 요청마다 (path, headers, body) 로 호출되는 콜백 (선택)
+        """
+        self.host = host
+        self.port = port
+        self.handshake_delay = handshake_delay
+        self.on_request = on_request
+        self.requests = 0
+        self.connections = 0
+        self.bytes_received = 0
+        self.status_codes = {}
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        if self.handshake_delay:
+            await asyncio.sleep(self.handshake_delay)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests += 1
+                self.bytes_received += len(body)
+                status = 200
+                if self.on_request is not None:
+                    status = self.on_request(request_line.split()[1].decode(), headers, body) or 200
+                self.status_codes[status] = self.status_codes.get(status, 0) + 1
+                writer.write(
+                    f"HTTP/1.1 {status} OK\r\ncontent-type: text/plain\r\ncontent-length: 2\r\n\r\nok".encode()
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+def percentile(values, pct):
+    """정렬된 값 리스트의 백분위수 (values 는 비어 있지 않아야 함)"""
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def now():
+    return time.perf_counter()
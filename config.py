@@ -0,0 +1,184 @@
+# 환경 변수 읽기
+import os
+# - os: 실행 환경의 환경 변수를 읽기 위함.
+#   목적: 배포 환경마다 코드를 고치지 않고 튜닝 값만 바꿀 수 있도록 하기 위함.
+
+
+def _env_int(name, default):
+    """정수 환경 변수 읽기 (없거나 비어 있으면 기본값)"""
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    """실수 환경 변수 읽기 (없거나 비어 있으면 기본값)"""
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_str(name, default):
+    """문자열 환경 변수 읽기 (없거나 비어 있으면 기본값)"""
+    return os.getenv(name) or default
+
+
+# Redis 연결 설정
+# - REDIS_URL: Redis 주소 (예: redis://redis:6379/0, 비밀번호가 있으면 redis://:password@host:6379/0)
+# - REDIS_MAX_CONNECTIONS: 워커 프로세스 하나가 쓰는 Redis 커넥션 풀 크기 (워커 수 × 이 값이 Redis maxclients 안에 들어와야 함)
+# - REDIS_KEY_PREFIX: 세션 큐 키 접두사 (같은 Redis를 여러 배포가 같이 쓸 때 키가 겹치지 않도록, 예: "iot:prod:")
+# - FLUSH_LOCK_TTL: 큐 가득 참 전송(detach) 시 잡는 키별 잠금의 만료 시간(초), 잠근 워커가 죽어도 이 시간 뒤에 풀림
+REDIS_URL = _env_str("REDIS_URL", "redis://localhost:6379")
+REDIS_MAX_CONNECTIONS = _env_int("REDIS_MAX_CONNECTIONS", 50)
+REDIS_KEY_PREFIX = _env_str("REDIS_KEY_PREFIX", "")
+FLUSH_LOCK_TTL = _env_float("FLUSH_LOCK_TTL", 10.0)
+
+# Redis 쓰기 설정
+# - REDIS_FLUSH_PACKETS: 몇 개의 메시지(보통 패킷 하나)를 모아서 파이프라인 한 번으로 보낼지 (1이면 메시지마다 전송)
+# - REDIS_FLUSH_INTERVAL: 모아둔 패킷을 최대 몇 초까지 들고 있을지 (다음 패킷이 오지 않아도 세션마다 타이머로 전송)
+# - REDIS_STORAGE_FORMAT: text(샘플 하나당 리스트 원소 하나, 10진 문자열) / packed(패킷 하나당 바이너리 배열 하나)
+REDIS_FLUSH_PACKETS = _env_int("REDIS_FLUSH_PACKETS", 10)
+REDIS_FLUSH_INTERVAL = _env_float("REDIS_FLUSH_INTERVAL", 0.05)
+REDIS_STORAGE_FORMAT = _env_str("REDIS_STORAGE_FORMAT", "text")
+# - QUEUE_BACKEND: 세션 큐를 어디에 쌓을지 (queue_backend.py 참고)
+#   redis(기존 방식) / memory(프로세스 내 링 버퍼, 단일 프로세스 배포 전용, Redis 연결을 만들지 않음)
+QUEUE_BACKEND = _env_str("QUEUE_BACKEND", "redis")
+
+# 백엔드 전송 설정
+# - DATA_BACKEND_URL: 센서 데이터를 받는 백엔드 주소 (ngrok 주소 등)
+# - HTTP_MAX_CONNECTIONS / HTTP_MAX_KEEPALIVE: 공유 httpx 클라이언트의 커넥션 풀 크기 / 유지할 keep-alive 연결 수
+# - HTTP_KEEPALIVE_EXPIRY: 쉬고 있는 keep-alive 연결을 몇 초 뒤에 닫을지
+# - HTTP_TIMEOUT / HTTP_CONNECT_TIMEOUT: 요청 전체 / 연결 수립 타임아웃(초)
+# - HTTP2: 1이면 HTTP/2 사용 (h2 패키지 필요, 없으면 HTTP/1.1로 동작)
+DATA_BACKEND_URL = _env_str("DATA_BACKEND_URL", "http://localhost:8080")
+HTTP_MAX_CONNECTIONS = _env_int("HTTP_MAX_CONNECTIONS", 100)
+HTTP_MAX_KEEPALIVE = _env_int("HTTP_MAX_KEEPALIVE", 20)
+HTTP_KEEPALIVE_EXPIRY = _env_float("HTTP_KEEPALIVE_EXPIRY", 30.0)
+HTTP_TIMEOUT = _env_float("HTTP_TIMEOUT", 10.0)
+HTTP_CONNECT_TIMEOUT = _env_float("HTTP_CONNECT_TIMEOUT", 5.0)
+HTTP2 = _env_int("HTTP2", 0) == 1
+# - PAYLOAD_FORMAT: 센서별로 따로 지정하지 않았을 때의 페이로드 형식 (send_to_data_back.SENSOR_URL_MAPPING 참고)
+# - PAYLOAD_FORMAT_<SENSOR>: 센서별 페이로드 형식 (예: PAYLOAD_FORMAT_ECG=binary, PAYLOAD_FORMAT_SPO2=orjson)
+PAYLOAD_FORMAT = _env_str("PAYLOAD_FORMAT", "json")
+
+
+def payload_format_for(sensor_type):
+    """센서 하나의 페이로드 형식 (PAYLOAD_FORMAT_<SENSOR>, 없으면 PAYLOAD_FORMAT)"""
+    return _env_str(f"PAYLOAD_FORMAT_{sensor_type.upper()}", PAYLOAD_FORMAT)
+
+
+# 백그라운드 업로드 설정
+# - UPLOAD_WORKERS: 업로드를 동시에 처리하는 워커 수
+# - UPLOAD_QUEUE_SIZE: 아직 처리되지 않은 "큐 가득 참" 이벤트를 몇 개까지 쌓아둘지 (넘으면 수신 쪽이 대기)
+# - UPLOAD_LAG_WARNING: 이벤트가 처리되기까지 이 시간(초)을 넘기면 경고 로그
+# - UPLOAD_SNAPSHOT_TTL: 업로드 대기 중인 스냅샷 키의 만료 시간(초), 프로세스가 죽어도 Redis에 남지 않도록
+UPLOAD_WORKERS = _env_int("UPLOAD_WORKERS", 4)
+UPLOAD_QUEUE_SIZE = _env_int("UPLOAD_QUEUE_SIZE", 1000)
+UPLOAD_LAG_WARNING = _env_float("UPLOAD_LAG_WARNING", 5.0)
+UPLOAD_SNAPSHOT_TTL = _env_int("UPLOAD_SNAPSHOT_TTL", 3600)
+
+# 여러 사용자 배치를 묶어 보내는 설정 (upload_coalescer.py)
+# - UPLOAD_BATCH_SENSORS: 묶어서 보낼 센서 목록 (쉼표 구분, 예: "nibp,spo2,temp"), 백엔드가 {"records": [...]} 형식을 받을 수 있어야 함
+# - UPLOAD_BATCH_MAX_RECORDS: 요청 하나에 담을 최대 레코드 수 (차면 바로 전송)
+# - UPLOAD_BATCH_MAX_LATENCY: 첫 레코드가 들어온 뒤 최대 몇 초까지 모을지
+UPLOAD_BATCH_SENSORS = frozenset(name.strip() for name in _env_str("UPLOAD_BATCH_SENSORS", "").split(",") if name.strip())
+UPLOAD_BATCH_MAX_RECORDS = _env_int("UPLOAD_BATCH_MAX_RECORDS", 100)
+UPLOAD_BATCH_MAX_LATENCY = _env_float("UPLOAD_BATCH_MAX_LATENCY", 1.0)
+
+# 업로드 실패 스풀 / 재전송 설정 (upload_spool.py)
+# - UPLOAD_SPOOL_PATH: 업로드에 실패한 배치를 보관할 SQLite 파일 경로. 환자 데이터가 파일로 남으므로 지정했을 때만 켜짐
+#   (기본: 빈 값 = 스풀 없이 기존처럼 로그만 남김, 파일이 들어갈 디렉터리는 미리 있어야 하며 없으면 시작할 때 오류)
+# - UPLOAD_RETRY_CONCURRENCY: 스풀에서 동시에 재전송할 최대 배치 수
+# - UPLOAD_RETRY_BASE_DELAY / UPLOAD_RETRY_MAX_DELAY: 재시도 간격(초)의 시작값(실패마다 두 배) / 상한, 지터 포함
+# - UPLOAD_RETRY_INTERVAL: 스풀에서 재시도할 배치를 확인하는 주기(초)
+# - BREAKER_FAILURES: 백엔드 호스트별로 몇 번 연속 실패하면 회로 차단기를 열지 (열려 있는 동안은 전송하지 않고 바로 스풀로)
+# - BREAKER_RESET_TIMEOUT: 회로 차단기가 열린 뒤 다시 한 번 시험 전송하기까지의 시간(초)
+UPLOAD_SPOOL_PATH = _env_str("UPLOAD_SPOOL_PATH", "")
+UPLOAD_RETRY_CONCURRENCY = _env_int("UPLOAD_RETRY_CONCURRENCY", 4)
+UPLOAD_RETRY_BASE_DELAY = _env_float("UPLOAD_RETRY_BASE_DELAY", 1.0)
+UPLOAD_RETRY_MAX_DELAY = _env_float("UPLOAD_RETRY_MAX_DELAY", 300.0)
+UPLOAD_RETRY_INTERVAL = _env_float("UPLOAD_RETRY_INTERVAL", 5.0)
+BREAKER_FAILURES = _env_int("BREAKER_FAILURES", 5)
+BREAKER_RESET_TIMEOUT = _env_float("BREAKER_RESET_TIMEOUT", 30.0)
+
+# 스트리밍 모드 설정
+# - STREAM_MODE: batch(큐가 가득 차면 전송 후 연결 종료, 기존 방식) / stream(연결을 유지하며 윈도우 단위로 계속 전송)
+#   WebSocket 주소의 ?mode=stream 으로 연결마다 선택할 수도 있음.
+# - STREAM_OVERLAP: 스트리밍 모드에서 이웃한 윈도우끼리 겹칠 샘플 수 (?overlap= 으로 연결마다 지정 가능)
+STREAM_MODE = _env_str("STREAM_MODE", "batch")
+STREAM_OVERLAP = _env_int("STREAM_OVERLAP", 0)
+# - STREAM_MAX_WINDOW: 연결이 ?window= 로 고를 수 있는 최대 윈도우 크기(샘플), 넘으면 1008 로 닫음
+#   윈도우가 세션 큐(링 버퍼 / Redis 리스트)의 최대 크기가 되므로 연결 하나가 메모리를 끝없이 잡지 않도록 함 (0이면 센서의 큐 크기)
+STREAM_MAX_WINDOW = _env_int("STREAM_MAX_WINDOW", 0)
+
+# 센서 샘플레이트 설정 (sensor_codec.SENSOR_CONFIGS 의 "sample_rate", 업로드 헤더 / 신호 처리 필터 계수에 쓰임)
+# - WAVEFORM_SAMPLE_RATE: 파형 센서(ECG / EMG / EOG / GSR / AIRFLOW)의 샘플레이트(Hz)
+#   기본값 500은 장비 사양에서 확인한 값이 아니라 큐 크기(15000개)를 약 30초 분량으로 본 추정치이므로, 장비 펌웨어 설정에 맞출 것
+# - SAMPLE_RATE_<SENSOR>: 센서별 샘플레이트 (예: SAMPLE_RATE_EMG=1000), 없으면 SENSOR_CONFIGS 의 값
+WAVEFORM_SAMPLE_RATE = _env_int("WAVEFORM_SAMPLE_RATE", 500)
+
+
+def sample_rate_for(sensor_type, default):
+    """센서 하나의 샘플레이트 (SAMPLE_RATE_<SENSOR>, 없으면 default)"""
+    return _env_int(f"SAMPLE_RATE_{sensor_type.upper()}", default)
+
+
+# 신호 처리 설정 (signal_processing.py, 파싱과 큐 저장 사이에서 세션마다 적용, sensor_codec.SENSOR_CONFIGS 의 "processing")
+# - SIGNAL_TARGET_RATE: 파형 센서(ECG / EMG / EOG / GSR)를 이 샘플레이트(Hz)로 줄여서 저장 (0이면 원래 샘플레이트 유지, 예: 250)
+#   안티에일리어싱 FIR 필터를 거친 뒤 데시메이션하며, 큐 크기도 같은 비율로 줄여 한 번에 보내는 시간 길이는 그대로 둠
+# - SIGNAL_FIR_TAPS: 안티에일리어싱 FIR 탭 수 (클수록 차단 특성이 좋아지고 계산과 지연이 늘어남)
+# - ECG_NOTCH_HZ / ECG_NOTCH_Q: ECG 전원 잡음 제거 노치 필터 주파수(50 또는 60, 0이면 사용 안 함) / Q 값
+# - ECG_BASELINE_HZ: ECG 기저선 변동 제거 고역통과 차단 주파수(Hz, 보통 0.5, 0이면 사용 안 함), 켜면 값이 0 근처를 중심으로 저장됨
+SIGNAL_TARGET_RATE = _env_int("SIGNAL_TARGET_RATE", 0)
+SIGNAL_FIR_TAPS = _env_int("SIGNAL_FIR_TAPS", 31)
+ECG_NOTCH_HZ = _env_float("ECG_NOTCH_HZ", 0)
+ECG_NOTCH_Q = _env_float("ECG_NOTCH_Q", 30.0)
+ECG_BASELINE_HZ = _env_float("ECG_BASELINE_HZ", 0)
+
+# 조회 API 설정
+# - READ_CHUNK_SAMPLES: GET /{username}/{sensor_type} 응답이 이 샘플 수를 넘으면 JSON을 이만큼씩 나눠 인코딩하여
+#   StreamingResponse 로 보냄 (큰 윈도우를 한 번에 문자열로 만들지 않음)
+READ_CHUNK_SAMPLES = _env_int("READ_CHUNK_SAMPLES", 4096)
+
+# 실시간 구독 설정 (/ws/subscribe/{username}/{sensor_type})
+# - PUBSUB_BACKEND: memory(같은 프로세스의 구독자에게만 전달) / redis(Redis pub/sub으로 다른 워커의 구독자에게도 전달)
+# - PUBSUB_BUFFER: 구독자별로 쌓아둘 최대 메시지 수 (가득 차면 가장 오래된 메시지부터 버림)
+# - PUBSUB_CHANNEL_PREFIX: redis 허브가 쓰는 채널 이름 접두사 (채널 = 접두사 + username:sensor_type)
+PUBSUB_BACKEND = _env_str("PUBSUB_BACKEND", "memory")
+PUBSUB_BUFFER = _env_int("PUBSUB_BUFFER", 256)
+PUBSUB_CHANNEL_PREFIX = _env_str("PUBSUB_CHANNEL_PREFIX", "iot:live:")
+
+# 장비 연결 수신 제한 (admission.py, /ws/{username}/{sensor_type})
+# 워커 프로세스마다 따로 적용됨 (여러 워커로 실행하면 전체 한도는 워커 수만큼 곱해짐)
+# - ADMISSION_MAX_SESSIONS: 워커 하나가 동시에 받을 최대 장비 세션 수 (0이면 제한 없음, 넘으면 1013 으로 닫음)
+# - ADMISSION_MAX_SESSIONS_PER_KEY: 같은 사용자:센서(같은 큐 키)로 동시에 열 수 있는 세션 수 (0이면 제한 없음)
+# - ADMISSION_DUPLICATE_POLICY: 같은 키의 세션이 한도를 넘었을 때
+#   replace(기존 세션을 4409 로 닫고 새 세션을 받음, 끊긴 줄 모르고 남아 있는 연결 뒤에 장비가 다시 붙는 경우) /
+#   reject(새 세션을 4409 로 닫음)
+# - ADMISSION_PACKET_RATE / ADMISSION_PACKET_BURST: 연결마다 초당 받을 패킷 수 / 한 번에 몰려도 받는 패킷 수 (토큰 버킷)
+#   넘는 패킷은 파싱하지 않고 버림 (0이면 제한 없음, ECG 장비는 초당 25개 정도 보냄)
+# - ADMISSION_MAX_LOOP_LAG: 이벤트 루프 지연(초)이 이 값을 넘는 동안 새 장비 세션을 1013 으로 거절 (0이면 사용 안 함)
+# - ADMISSION_LAG_INTERVAL: 이벤트 루프 지연을 재는 주기(초)
+# - ADMISSION_OWNER_TTL: redis 큐 백엔드에서 키당 세션 1개일 때, 워커 사이의 세션 소유권({key}:owner)이 갱신되지 않으면
+#   풀리는 시간(초). 세션이 살아 있는 동안 이 시간의 1/3 마다 갱신하고, 워커가 죽으면 이 시간 뒤에 다른 세션이 가져갈 수 있음
+ADMISSION_MAX_SESSIONS = _env_int("ADMISSION_MAX_SESSIONS", 0)
+ADMISSION_MAX_SESSIONS_PER_KEY = _env_int("ADMISSION_MAX_SESSIONS_PER_KEY", 1)
+ADMISSION_DUPLICATE_POLICY = _env_str("ADMISSION_DUPLICATE_POLICY", "replace")
+ADMISSION_PACKET_RATE = _env_float("ADMISSION_PACKET_RATE", 200.0)
+ADMISSION_PACKET_BURST = _env_int("ADMISSION_PACKET_BURST", 400)
+ADMISSION_MAX_LOOP_LAG = _env_float("ADMISSION_MAX_LOOP_LAG", 0.5)
+ADMISSION_LAG_INTERVAL = _env_float("ADMISSION_LAG_INTERVAL", 0.1)
+ADMISSION_OWNER_TTL = _env_float("ADMISSION_OWNER_TTL", 15.0)
+
+# 서버 실행 설정 (serve.py)
+# - SERVER_HOST / SERVER_PORT: 바인딩 주소 / 포트
+# - WEB_CONCURRENCY: 워커 프로세스 수 (uvicorn / gunicorn 과 같은 변수 이름)
+SERVER_HOST = _env_str("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = _env_int("SERVER_PORT", 8000)
+WEB_CONCURRENCY = _env_int("WEB_CONCURRENCY", 1)
+
+# 로깅 설정
+# - LOG_LEVEL: 전체 로그 레벨 (DEBUG / INFO / WARNING / ERROR)
+# - LOG_LEVELS: 로거별 레벨 (예: "sensor_logger=WARNING,back_data_sender=DEBUG")
+# - LOG_SUMMARY_EVERY: 세션마다 패킷 몇 개에 한 번씩 수신 요약 로그를 남길지 (0이면 세션 종료 시에만)
+LOG_LEVEL = _env_str("LOG_LEVEL", "INFO")
+LOG_LEVELS = _env_str("LOG_LEVELS", "")
+LOG_SUMMARY_EVERY = _env_int("LOG_SUMMARY_EVERY", 1000)
@@ -1,13 +1,44 @@
 import logging
+import logging.handlers
+import atexit
+import queue
+
+# 설정 값 가져오기
+from config import LOG_LEVEL, LOG_LEVELS
+
+# 모든 로거가 함께 쓰는 큐와 리스너
+# - 로거에는 QueueHandler 만 붙여서, 이벤트 루프 쪽에서는 큐에 넣기만 하고 바로 돌아옴.
+# - 실제 콘솔 출력(StreamHandler)은 QueueListener 의 별도 스레드에서 처리하므로 로그 I/O가 이벤트 루프를 막지 않음.
+_log_queue = queue.SimpleQueue()
+_listener = None
+
+
+def _parse_level(name, default=logging.INFO):
+    """'DEBUG', 'info', '20' 같은 문자열을 로그 레벨 값으로 변환"""
+    if name is None:
+        return default
+    name = str(name).strip()
+    if name.isdigit():
+        return int(name)
+    level = logging.getLevelName(name.upper())
+    return level if isinstance(level, int) else default
+
+
+def _logger_levels():
+    """LOG_LEVELS ("sensor_logger=WARNING,back_data_sender=DEBUG") 를 dict로 변환"""
+    levels = {}
+    for item in LOG_LEVELS.split(","):
+        if "=" in item:
+            name, _, level = item.partition("=")
+            levels[name.strip()] = _parse_level(level, _parse_level(LOG_LEVEL))
+    return levels
 
-def get_logger(name: str):
-    """
-    지정된 이름으로 로거를 생성하고 반환합니다.
-    :param name: 로거의 이름
-    :return: 로거 객체
-    """
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+
+def _start_listener():
+    """콘솔 출력 핸들러를 가진 QueueListener 를 한 번만 시작"""
+    global _listener
+    if _listener is not None:
+        return
 
     # 콘솔 출력 핸들러
     console_handler = logging.StreamHandler()
@@ -17,8 +48,33 @@ def get_logger(name: str):
     formatter = logging.Formatter("[%(asctime)s] %(levelname)s - %(message)s")
     console_handler.setFormatter(formatter)
 
+    _listener = logging.handlers.QueueListener(_log_queue, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """남은 로그를 모두 출력하고 리스너 스레드를 종료 (main.py의 shutdown, 프로세스 종료 시 호출)"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str):
+    """
+    지정된 이름으로 로거를 생성하고 반환합니다.
+    로그 레벨은 환경 변수 LOG_LEVEL(전체), LOG_LEVELS(로거별, 예: "sensor_logger=WARNING")로 정합니다.
+    :param name: 로거의 이름
+    :return: 로거 객체
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(_logger_levels().get(name, _parse_level(LOG_LEVEL)))
+
     # 핸들러가 중복 추가되지 않도록 체크
     if not logger.handlers:
-        logger.addHandler(console_handler)
+        _start_listener()
+        logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+        logger.propagate = False
 
     return logger
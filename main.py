@@ -10,7 +10,7 @@ from starlette.middleware.cors import CORSMiddleware
 # from fastapi.staticfiles import StaticFiles
 
 # 별도의 로깅 설정 가져오기
-from logger import get_logger
+from logger import get_logger, stop_logging
 
 #router로 main이 각 실행파일을 가져오도록 import
 from receive_and_parsing import receive_and_parsing_router
@@ -18,6 +18,37 @@ from receive_and_parsing import receive_and_parsing_router
 #redis import
 import aioredis
 
+# 세션 큐 백엔드 (redis / memory)
+from queue_backend import create_queue_backend
+from config import QUEUE_BACKEND, PUBSUB_BACKEND, REDIS_URL, REDIS_MAX_CONNECTIONS
+
+# 실시간 구독용 pub/sub 허브 (memory / redis)
+from pubsub_hub import create_pubsub_hub
+
+# 백엔드 전송용 공유 httpx 클라이언트 생성 함수
+from send_to_data_back import create_http_client
+
+# 큐 가득 참 이벤트를 받아 백그라운드에서 업로드하는 워커
+from upload_worker import UploadFlusher
+
+# 업로드 실패 배치 스풀 / 재전송
+from upload_spool import UploadSpool, UploadRetrier
+from config import UPLOAD_SPOOL_PATH
+
+# 여러 사용자 업로드를 요청 하나로 묶는 배치
+from upload_coalescer import UploadCoalescer
+from config import UPLOAD_BATCH_SENSORS
+
+# 장비 세션 수신 제한 (동시 세션 수 / 중복 세션 / 패킷 속도 / 이벤트 루프 지연)
+from admission import AdmissionController
+
+# Prometheus 형식 지표
+from metrics import REGISTRY, CONTENT_TYPE, UPLOAD_QUEUE_DEPTH, SUBSCRIBERS, SPOOL_DEPTH, ADMISSION_LIMITS, EVENT_LOOP_LAG
+from starlette.responses import Response
+
+# 공통 로깅 설정
+logger = get_logger("main")
+
 app = FastAPI() # fastapi의 인스턴스를 app이라는 변수에 할당. (쉽게 말하면 fastapi를 다룰 수 있는 리모컨을 app이라는 애한테 줘버린 것.)
 
 # CORS 설정_클라이언트에서 데이터 전송시에 막지 않으려는 작업.
@@ -34,14 +65,71 @@ app.add_middleware(
 # 시작
 @app.on_event("startup")
 async def startup():
-    app.state.redis = await aioredis.from_url("redis://localhost:6379")
-    logger.info("Redis 연결 완료.")
+    # memory 큐 백엔드 + memory 허브 조합이면 프로세스 안에서만 동작하므로 Redis 연결을 만들지 않음
+    app.state.redis = None
+    if QUEUE_BACKEND == "redis" or PUBSUB_BACKEND == "redis":
+        # 워커 프로세스마다 커넥션 풀 하나 (세션들이 나눠 씀)
+        app.state.redis = await aioredis.from_url(REDIS_URL, max_connections=REDIS_MAX_CONNECTIONS)
+        logger.info("Redis 연결 완료. (커넥션 풀 최대 %s)", REDIS_MAX_CONNECTIONS)
+    app.state.queue_backend = create_queue_backend(QUEUE_BACKEND, app.state.redis)
+    logger.info("큐 백엔드: %s", app.state.queue_backend.name)
+    # 실시간 구독 허브
+    app.state.pubsub_hub = create_pubsub_hub(PUBSUB_BACKEND, app.state.redis)
+    app.state.pubsub_hub.start()
+    SUBSCRIBERS.set_function(app.state.pubsub_hub.subscriber_counts)
+    # 백엔드 업로드용 keep-alive 커넥션 풀 (업로드마다 새 연결을 만들지 않음)
+    app.state.http_client = create_http_client()
+    logger.info("httpx 클라이언트 생성 완료.")
+    # 업로드 실패 배치 스풀 (UPLOAD_SPOOL_PATH 가 비어 있으면 사용하지 않음)
+    app.state.upload_spool = None
+    app.state.upload_retrier = None
+    if UPLOAD_SPOOL_PATH:
+        app.state.upload_spool = UploadSpool(UPLOAD_SPOOL_PATH)
+        await app.state.upload_spool.open()
+        app.state.upload_retrier = UploadRetrier(app.state.upload_spool, app.state.http_client)
+        app.state.upload_retrier.start()
+        SPOOL_DEPTH.set_function(lambda: {(): app.state.upload_spool.pending})
+    # 배치 전송 (UPLOAD_BATCH_SENSORS 로 지정한 센서가 있을 때만)
+    app.state.upload_coalescer = None
+    if UPLOAD_BATCH_SENSORS:
+        app.state.upload_coalescer = UploadCoalescer(app.state.http_client, app.state.upload_retrier)
+        logger.info("배치 전송 센서: %s", ", ".join(sorted(UPLOAD_BATCH_SENSORS)))
+    # 업로드 워커 시작 (WebSocket 수신 루프가 업로드를 기다리지 않도록)
+    app.state.upload_flusher = UploadFlusher(app.state.queue_backend, app.state.http_client,
+                                             retrier=app.state.upload_retrier,
+                                             coalescer=app.state.upload_coalescer)
+    app.state.upload_flusher.start()
+    UPLOAD_QUEUE_DEPTH.set_function(lambda: {(): app.state.upload_flusher.queue.qsize()})
+    # 장비 세션 수신 제한 (이벤트 루프 지연 측정 태스크 시작)
+    # redis 큐 백엔드는 여러 워커가 같은 큐를 쓸 수 있으므로 세션 소유권({key}:owner)을 Redis 에 기록
+    app.state.admission = AdmissionController(
+        redis=app.state.redis if app.state.queue_backend.name == "redis" else None)
+    app.state.admission.start()
+    ADMISSION_LIMITS.set_function(app.state.admission.limits)
+    EVENT_LOOP_LAG.set_function(lambda: {(): app.state.admission.loop_lag})
 
 # 종료
 @app.on_event("shutdown")
 async def shutdown():
-    await app.state.redis.close()
-    logger.info("Redis 연결 종료.")
+    await app.state.admission.stop()
+    await app.state.upload_flusher.stop()
+    # 모으고 있던 배치를 보낸 뒤(실패하면 스풀에 보관) 스풀을 닫음
+    if app.state.upload_coalescer is not None:
+        await app.state.upload_coalescer.stop()
+    # 업로드 워커가 마지막으로 스풀에 넣은 배치까지 파일에 남긴 뒤 닫음 (다음 실행 때 재전송)
+    if app.state.upload_retrier is not None:
+        await app.state.upload_retrier.stop()
+        await app.state.upload_spool.close()
+    await app.state.pubsub_hub.close()
+    await app.state.http_client.aclose()
+    logger.info("httpx 클라이언트 종료.")
+    await app.state.queue_backend.close()
+    if app.state.redis is not None:
+        if app.state.queue_backend.name != "redis":
+            await app.state.redis.close()
+        logger.info("Redis 연결 종료.")
+    # 큐에 남은 로그 출력 후 로그 리스너 스레드 종료
+    stop_logging()
  
 app.include_router(receive_and_parsing_router) # 데이터를 읽어와서 파싱하는 API 루트 경로 설정
 
@@ -51,6 +139,26 @@ app.include_router(receive_and_parsing_router) # 데이터를 읽어와서 파
 async def read_root():
     return {"message": "Welcome to the main API!"}
 
+# Prometheus 형식 지표 (수신 / 파싱 / Redis / 업로드 지연, 세션 수, 큐 깊이)
+@app.get("/metrics")
+async def metrics():
+    return Response(REGISTRY.expose(), media_type=CONTENT_TYPE)
+
+# 업로드 워커의 backpressure 지표 (대기 작업 수, 지연, 수신 쪽 대기 횟수, 스풀 / 회로 차단기 상태 등)
+@app.get("/upload_stats")
+async def upload_stats():
+    stats = app.state.upload_flusher.stats()
+    if app.state.upload_retrier is not None:
+        stats["spool"] = app.state.upload_retrier.stats()
+    if app.state.upload_coalescer is not None:
+        stats["batch"] = app.state.upload_coalescer.stats()
+    return stats
+
+# 장비 세션 수신 제한 상태 (연결 중인 세션 수, 이벤트 루프 지연, 사유별 거절 수, 설정된 한도)
+@app.get("/admission_stats")
+async def admission_stats():
+    return app.state.admission.stats()
+
 # 정적 파일 경로 설정 - websocket과 충돌의 여지가 있으므로, 출력은 log에 두고 정적 파일 및 경로 없음.
 # app.mount("/static", StaticFiles(directory="public"), name="static")
 
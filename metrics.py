@@ -0,0 +1,252 @@
+# Prometheus 텍스트 형식 지표 모듈 (외부 의존성 없음)
+from bisect import bisect_left
+# - bisect_left: 히스토그램에서 값이 들어갈 버킷을 이진 탐색으로 찾기 위함.
+
+import time
+# - time: 구간 측정(perf_counter)을 위함.
+
+
+# 지연 시간 히스토그램 기본 버킷(초)
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 파싱 시간 히스토그램 버킷(초), 패킷 하나 파싱은 수 마이크로초 단위
+PARSE_BUCKETS = (0.000002, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005)
+# 배치 요청 하나에 담긴 레코드 수 / 메시지 하나에 담긴 패킷 수 버킷
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    """라벨 값이 고정된 카운터. 핫 패스에서는 이 객체를 미리 만들어두고 inc()만 호출함."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class _GaugeChild:
+    """라벨 값이 고정된 게이지"""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class _HistogramChild:
+    """라벨 값이 고정된 히스토그램. 버킷별 개수는 누적하지 않고 저장하고, 출력할 때 누적함."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        """with 문으로 구간 시간을 측정"""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _Metric:
+    """지표 하나(이름, 설명, 라벨 이름)와 라벨 값별 자식 객체들"""
+
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._function = None
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        라벨 값에 해당하는 자식 객체를 반환 (없으면 만들어서 캐시).
+        연결 시점에 한 번 호출해두고, 패킷마다 다시 찾지 않도록 함.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: 라벨 {self.labelnames} 이 필요합니다.")
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def set_function(self, function):
+        """
+        출력 시점에 값을 계산하는 함수 지정. 함수는 {라벨 값 튜플: 값} dict 를 반환해야 함.
+        (큐 깊이처럼 핫 패스에서 매번 갱신할 필요가 없는 값용)
+        """
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            return list(self._function().items())
+        return [(values, child.value) for values, child in self._children.items()]
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in self.samples():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+                cumulative += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    """지표 모음. /metrics 요청 때 expose()로 Prometheus 텍스트 형식 문자열을 만듦."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"이미 등록된 지표입니다: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def expose(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+# 기본 레지스트리
+REGISTRY = Registry()
+
+# Prometheus 텍스트 형식의 Content-Type (charset=utf-8 은 Starlette 가 붙임)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+# 수신 / 파싱
+PACKETS_RECEIVED = Counter("iot_packets_received_total", "WebSocket으로 수신한 패킷 수", ("sensor",))
+PACKETS_PARSED = Counter("iot_packets_parsed_total", "파싱에 성공한 패킷 수", ("sensor",))
+PACKETS_REJECTED = Counter("iot_packets_rejected_total", "거부된 패킷 수 (사유별)", ("sensor", "reason"))
+PARSE_SECONDS = Histogram("iot_parse_seconds", "패킷 하나의 디코딩 시간(초)", ("sensor",), PARSE_BUCKETS)
+PACKETS_PER_MESSAGE = Histogram("iot_packets_per_message", "WebSocket 메시지 하나에 담긴 패킷 수", ("sensor",),
+                              BATCH_BUCKETS)
+FRAMER_DISCARDED = Counter("iot_framer_discarded_bytes_total", "패킷 경계를 다시 찾으면서 버린 바이트 수", ("sensor",))
+
+# Redis
+REDIS_SECONDS = Histogram("iot_redis_command_seconds", "Redis 명령(파이프라인) 지연 시간(초)", ("operation",))
+
+# 백엔드 업로드
+UPLOAD_SECONDS = Histogram("iot_backend_upload_seconds", "send_to_data_backend 요청 지연 시간(초)", ("sensor",))
+UPLOAD_RESPONSES = Counter("iot_backend_upload_total", "백엔드 업로드 결과 (HTTP 상태 코드 또는 error)",
+                           ("sensor", "status"))
+UPLOAD_BATCH_RECORDS = Histogram("iot_backend_upload_batch_records", "배치 업로드 요청 하나에 담긴 레코드 수", ("sensor",),
+                                 BATCH_BUCKETS)
+
+# 세션 / 큐
+ACTIVE_SESSIONS = Gauge("iot_websocket_sessions", "현재 연결된 WebSocket 세션 수", ("sensor",))
+QUEUE_DEPTH = Gauge("iot_queue_depth_samples", "현재 세션 큐에 쌓인 샘플 수 합계", ("sensor",))
+UPLOAD_QUEUE_DEPTH = Gauge("iot_upload_queue_depth", "업로드 워커가 아직 처리하지 않은 작업 수")
+
+# 실시간 구독 (/ws/subscribe)
+SUBSCRIBERS = Gauge("iot_subscribers", "현재 연결된 실시간 구독자 수", ("sensor",))
+SUBSCRIBER_DROPPED = Counter("iot_subscriber_dropped_total", "구독자 버퍼가 가득 차서 버린 메시지 수", ("sensor",))
+
+# 업로드 실패 스풀 / 재전송 / 회로 차단기
+SPOOL_DEPTH = Gauge("iot_upload_spool_batches", "업로드 스풀에 남아 있는 배치 수")
+SPOOLED_BATCHES = Counter("iot_upload_spooled_total", "업로드에 실패해서 스풀에 보관한 배치 수", ("sensor",))
+SPOOL_REPLAYS = Counter("iot_upload_replay_total", "스풀 배치 재전송 결과", ("result",))
+CIRCUIT_OPEN = Gauge("iot_upload_circuit_open", "백엔드 호스트별 회로 차단기 열림 여부 (1이면 전송 중단)", ("host",))
+
+# 장비 연결 수신 제한 (admission.py)
+ADMISSION_REJECTED = Counter("iot_admission_rejected_total",
+                             "수신 제한으로 닫은 장비 세션 수 (사유별: max_sessions / duplicate / replaced / overloaded / unavailable)",
+                             ("sensor", "reason"))
+PACKETS_RATE_LIMITED = Counter("iot_packets_rate_limited_total", "연결별 패킷 속도 제한을 넘어서 버린 패킷 수", ("sensor",))
+ADMISSION_LIMITS = Gauge("iot_admission_limit", "설정된 수신 제한 값 (0이면 제한 없음)", ("limit",))
+EVENT_LOOP_LAG = Gauge("iot_event_loop_lag_seconds", "마지막으로 잰 이벤트 루프 지연 시간(초)")
@@ -0,0 +1,113 @@
+# WebSocket 메시지에서 센서 패킷 경계를 찾는 스트리밍 프레이머
+# 장비가 메시지 하나에 패킷 여러 개를 이어 보내거나, 패킷 하나가 메시지 두 개로 나뉘어 와도
+# SOP(0xF7) ... EOP(0xFA) 와 data_size 로 정해지는 길이로 패킷을 잘라냄.
+
+# 패킷 공통 상수 및 cmd 값으로 찾는 코덱 레지스트리 가져오기
+from sensor_codec import SOP, EOP, CODECS_BY_CMD
+# - CODECS_BY_CMD: 헤더의 cmd / data_size 가 등록된 센서의 값과 맞는지 확인하기 위함.
+#   목적: 샘플 값 안에 우연히 들어 있는 0xF7 을 패킷 시작으로 잘못 보지 않기 위함.
+
+# 헤더(SOP, CMD, data_size) 크기, 이만큼 모여야 패킷 길이를 알 수 있음
+HEADER_LENGTH = 3
+
+
+class PacketFramer:
+    """
+    WebSocket 세션 하나의 수신 바이트 스트림을 패킷 단위로 나눔.
+    - 패킷 길이 = data_size + 6 (SOP + CMD + data_size + 데이터 + 예약(2) + EOP)
+    - 메시지 끝에 걸친 패킷은 남겨뒀다가 다음 메시지와 이어서 처리함
+    - 헤더(cmd / data_size)나 EOP 가 맞지 않으면 한 바이트 뒤부터 다시 SOP 를 찾음 (버린 바이트 수를 셈)
+    - 패킷 경계를 놓칠 때마다 첫 번째 원인을 rejections 에 남김 (다시 패킷을 찾을 때까지는 한 번만,
+      깨진 패킷 안의 0xF7 마다 거부가 따로 세어지지 않도록)
+      · sop_eop: SOP 앞의 잡음 바이트 / EOP 불일치, bad_cmd: 등록되지 않은 cmd, bad_length: data_size 불일치
+    남겨두는 바이트는 최대 패킷 하나 길이보다 짧으므로 버퍼가 계속 커지지 않음.
+    """
+
+    __slots__ = ("codecs", "_buffer", "discarded", "rejections", "synced")
+
+    def __init__(self, codecs=CODECS_BY_CMD):
+        """
+        :param codecs: cmd 값 → 코덱 (패킷 길이 / data_size 확인용)
+        """
+        self.codecs = codecs
+        self._buffer = bytearray()  # 이전 메시지에서 남은 (아직 완성되지 않은) 패킷 앞부분
+        self.discarded = 0          # 패킷 경계를 다시 찾으면서 버린 바이트 수
+        self.rejections = []        # 마지막 feed 에서 패킷 경계를 놓친 사유들 (sop_eop / bad_cmd / bad_length)
+        self.synced = True          # 마지막으로 본 바이트까지 패킷 경계가 맞았는지
+
+    @property
+    def pending(self):
+        """다음 메시지를 기다리고 있는 바이트 수"""
+        return len(self._buffer)
+
+    def feed(self, data):
+        """
+        수신한 메시지를 넣고 완성된 패킷들을 꺼냄.
+        남은 바이트가 없고 메시지가 패킷 하나면 복사 없이 그대로 반환함 (기존 장비의 일반적인 경우).
+
+        :param data: WebSocket 메시지 (bytes)
+        :return: 패킷 리스트 (bytes / bytearray, 순서대로)
+        """
+        if self.rejections:
+            self.rejections = []
+        buffer = self._buffer
+        if buffer:
+            buffer += data
+            packets, consumed = self._scan(buffer)
+            del buffer[:consumed]
+        else:
+            packets, consumed = self._scan(data)
+            if consumed < len(data):
+                buffer += data[consumed:]
+        return packets
+
+    def _scan(self, data):
+        """
+        :param data: 스캔할 바이트열
+        :return: (패킷 리스트, 처리가 끝난 바이트 수)
+        """
+        packets = []
+        codecs = self.codecs
+        end = len(data)
+        position = 0
+        while position < end:
+            start = data.find(SOP, position)
+            if start < 0:
+                # 남은 바이트에는 패킷 시작이 없음
+                self._discard(end - position, "sop_eop")
+                return packets, end
+            if start > position:
+                self._discard(start - position, "sop_eop")
+            if end - start < HEADER_LENGTH:
+                return packets, start
+
+            codec = codecs.get(data[start + 1])
+            if codec is None or codec.data_size != data[start + 2]:
+                # 헤더가 아님 (샘플 값 안의 0xF7 등), 다음 바이트부터 다시 찾음
+                self._discard(1, "bad_cmd" if codec is None else "bad_length")
+                position = start + 1
+                continue
+            stop = start + codec.packet_length
+            if stop > end:
+                # 패킷 뒷부분이 아직 오지 않음
+                return packets, start
+            if data[stop - 1] != EOP:
+                self._discard(1, "sop_eop")
+                position = start + 1
+                continue
+
+            # bytes 를 처음부터 끝까지 자르면 복사 없이 같은 객체가 반환됨
+            packets.append(data[start:stop])
+            self.synced = True
+            position = stop
+        return packets, position
+
+    def _discard(self, count, reason):
+        """
+        :param count: 버린 바이트 수
+        :param reason: 패킷 경계를 놓친 사유 (이미 놓친 상태면 세지 않음)
+        """
+        self.discarded += count
+        if self.synced:
+            self.synced = False
+            self.rejections.append(reason)
@@ -0,0 +1,249 @@
+# 업로드 페이로드 인코딩 모듈
+import json
+# - json: 기존 httpx 의 json= 과 같은 결과를 내는 기본 인코더.
+
+import gzip
+# - gzip: JSON 페이로드 압축 (Content-Encoding: gzip).
+
+import base64
+# - base64: 바이너리 샘플 배열을 JSON 안에 문자열로 넣기 위함.
+
+import struct
+# - struct: 바이너리 포맷의 헤더를 만들기 위함.
+
+import sys
+from array import array
+# - array: 샘플 리스트를 C 배열(바이트열)로 한 번에 변환하기 위함.
+
+import orjson
+# - orjson: requirements.txt 에 이미 포함된 빠른 JSON 인코더.
+
+# delta + zigzag + varint 샘플 인코딩 (varint 형식)
+from signal_processing import encode_delta_varint, decode_delta_varint
+
+try:
+    import zstandard
+    # - zstandard: zstd 압축 (선택 의존성, 없으면 gzip으로 대체)
+except ImportError:
+    zstandard = None
+
+# 사용자 정의 로깅 설정 가져오기
+from logger import get_logger
+
+
+logger = get_logger("payload_encoder")
+
+# 지원하는 페이로드 형식
+# - json: 기존과 동일한 JSON (httpx json= 과 같은 결과)
+# - orjson: orjson 으로 인코딩한 JSON
+# - gzip / zstd: orjson 으로 인코딩한 뒤 압축 (Content-Encoding 헤더)
+# - base64: 샘플 배열을 little endian 바이너리 + base64 문자열로 넣은 JSON
+# - binary: application/octet-stream, 헤더 + little endian 샘플 배열
+# - varint: binary 와 같은 헤더에 샘플 배열 대신 delta + zigzag + varint 바이트열 (타입 코드 'v', 정수 샘플만, 실수면 binary)
+PAYLOAD_FORMATS = ("json", "orjson", "gzip", "zstd", "base64", "binary", "varint")
+
+# 바이너리 포맷 헤더
+# magic(4) + version(1) + 샘플 타입 코드(1, 'i' / 'd' / 'v') + 샘플레이트(2) + 샘플 수(4), 전부 little endian
+# 그 뒤에 device_id / userid / sensor_type 을 (길이 2바이트 + UTF-8) 순서로 붙이고, 마지막에 샘플 배열이 옴.
+# 여러 레코드를 한 요청으로 보낼 때(encode_batch_payload)는 이 프레임을 이어 붙이며, 각 프레임의 길이는 헤더로 알 수 있음.
+BINARY_MAGIC = b"IOTB"
+BINARY_VERSION = 1
+_BINARY_HEADER = struct.Struct("<4sBcHI")
+_BINARY_STRING_LENGTH = struct.Struct("<H")
+
+_zstd_compressor = zstandard.ZstdCompressor() if zstandard is not None else None
+_zstd_warned = False
+
+
+def pack_samples(values):
+    """
+    샘플 리스트를 little endian 바이트열로 변환.
+    파형 값은 16비트를 넘을 수 있으므로(최대 66045) 부호 있는 32비트, 실수(TEMP)는 64비트 실수로 담음.
+
+    :param values: 샘플 값 리스트 (정수 또는 실수)
+    :return: (타입 코드, 바이트열)
+    """
+    try:
+        samples = array("i", values)
+    except TypeError:
+        # 실수가 섞여 있으면 64비트 실수 배열로
+        samples = array("d", values)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples.typecode, samples.tobytes()
+
+
+def encode_binary(device_id, userid, sensor_type, values, sample_rate=0, varint=False):
+    """
+    바이너리 포맷(application/octet-stream) 본문 생성.
+
+    :param device_id: 장비 식별자
+    :param userid: 사용자 이름
+    :param sensor_type: 센서 종류
+    :param values: 샘플 값 리스트
+    :param sample_rate: 샘플레이트(Hz), 모르면 0
+    :param varint: True 이면 샘플을 delta + zigzag + varint 로 담음 (정수 샘플일 때만, 실수가 있으면 그대로 배열)
+    :return: 바이트열
+    """
+    if varint and all(type(value) is int for value in values):
+        typecode, samples = "v", encode_delta_varint(values)
+    else:
+        typecode, samples = pack_samples(values)
+    parts = [_BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, typecode.encode(), sample_rate, len(values))]
+    for text in (device_id, userid, sensor_type):
+        encoded = str(text).encode("utf-8")
+        parts.append(_BINARY_STRING_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    parts.append(samples)
+    return b"".join(parts)
+
+
+def _decode_binary_at(body, offset):
+    """body 의 offset 위치에 있는 바이너리 프레임 하나를 풀고, (레코드 dict, 다음 프레임 위치)를 반환"""
+    magic, version, typecode, sample_rate, count = _BINARY_HEADER.unpack_from(body, offset)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("지원하지 않는 바이너리 페이로드입니다.")
+    offset += _BINARY_HEADER.size
+    texts = []
+    for _ in range(3):
+        (length,) = _BINARY_STRING_LENGTH.unpack_from(body, offset)
+        offset += _BINARY_STRING_LENGTH.size
+        texts.append(bytes(body[offset:offset + length]).decode("utf-8"))
+        offset += length
+    device_id, userid, sensor_type = texts
+    if typecode == b"v":
+        values, end = decode_delta_varint(body, count, offset)
+    else:
+        samples = array(typecode.decode())
+        end = offset + count * samples.itemsize
+        samples.frombytes(body[offset:end])
+        if sys.byteorder == "big":
+            samples.byteswap()
+        values = samples.tolist()
+    return {"device_id": device_id, "userid": userid, "sensor_type": sensor_type,
+            "sample_rate": sample_rate, "data": values}, end
+
+
+def decode_binary(body):
+    """
+    encode_binary 로 만든 본문을 다시 풀어냄 (백엔드 구현 및 검증용).
+
+    :param body: 바이트열
+    :return: {"device_id", "userid", "sensor_type", "sample_rate", "data"}
+    """
+    return _decode_binary_at(body, 0)[0]
+
+
+def decode_binary_batch(body):
+    """
+    encode_batch_payload 의 binary 형식 본문(프레임을 이어 붙인 것)을 레코드 리스트로 풀어냄 (백엔드 구현 및 검증용).
+
+    :param body: 바이트열
+    :return: [{"device_id", "userid", "sensor_type", "sample_rate", "data"}, ...]
+    """
+    records = []
+    offset = 0
+    while offset < len(body):
+        record, offset = _decode_binary_at(body, offset)
+        records.append(record)
+    return records
+
+
+def _base64_payload(payload, data_key, values, sensor_type, sample_rate):
+    """파형 리스트를 little endian 바이너리 + base64 문자열로 바꾼 payload 사본"""
+    typecode, samples = pack_samples(values)
+    payload = {key: value for key, value in payload.items() if key != data_key}
+    payload.update({
+        "sensor_type": sensor_type,
+        "sample_rate": sample_rate,
+        "encoding": "int32le" if typecode == "i" else "float64le",
+        "count": len(values),
+        data_key: base64.b64encode(samples).decode("ascii"),
+    })
+    return payload
+
+
+def _encode_json(payload, payload_format):
+    """orjson 으로 인코딩하고 형식에 따라 압축 (orjson / gzip / zstd)"""
+    global _zstd_warned
+    body = orjson.dumps(payload)
+    headers = {"Content-Type": "application/json"}
+
+    if payload_format == "zstd":
+        if _zstd_compressor is not None:
+            return _zstd_compressor.compress(body), dict(headers, **{"Content-Encoding": "zstd"})
+        if not _zstd_warned:
+            logger.warning("zstandard 패키지가 없어 gzip으로 압축합니다.")
+            _zstd_warned = True
+        payload_format = "gzip"
+    if payload_format == "gzip":
+        return gzip.compress(body, compresslevel=5), dict(headers, **{"Content-Encoding": "gzip"})
+    if payload_format != "orjson":
+        raise ValueError(f"지원하지 않는 페이로드 형식: {payload_format}")
+    return body, headers
+
+
+def encode_payload(payload, payload_format="json", sensor_type=None, sample_rate=0):
+    """
+    send_to_data_backend 가 만든 payload(dict)를 지정한 형식의 HTTP 본문과 헤더로 변환.
+    파형 리스트가 없는 payload(NIBP, SPO2, TEMP)는 base64 / binary / varint 형식이어도 orjson JSON으로 보냄.
+
+    :param payload: {"device_id", "userid", ...} 형태의 dict
+    :param payload_format: PAYLOAD_FORMATS 중 하나
+    :param sensor_type: 센서 종류 (파형 필드 이름 f"{sensor_type}data" 를 찾기 위함)
+    :param sample_rate: 바이너리 형식 헤더에 넣을 샘플레이트(Hz)
+    :return: (본문 바이트열, 헤더 dict)
+    """
+    if payload_format == "json":
+        # httpx 의 json= 과 같은 형태
+        return json.dumps(payload).encode("utf-8"), {"Content-Type": "application/json"}
+
+    if payload_format in ("base64", "binary", "varint"):
+        data_key = f"{sensor_type}data"
+        values = payload.get(data_key)
+        if not isinstance(values, list):
+            payload_format = "orjson"
+        elif payload_format != "base64":
+            body = encode_binary(payload["device_id"], payload["userid"], sensor_type, values, sample_rate,
+                                 varint=payload_format == "varint")
+            return body, {"Content-Type": "application/octet-stream"}
+        else:
+            payload = _base64_payload(payload, data_key, values, sensor_type, sample_rate)
+            payload_format = "orjson"
+
+    return _encode_json(payload, payload_format)
+
+
+def encode_batch_payload(payloads, payload_format="json", sensor_type=None, sample_rate=0):
+    """
+    여러 사용자의 payload 를 요청 하나의 본문으로 묶음 (upload_coalescer.py 참고).
+    - JSON 계열(json / orjson / gzip / zstd / base64): {"records": [payload, ...]}, 레코드 하나는 단건 전송과 같은 모양
+    - binary / varint: 단건 바이너리 프레임을 이어 붙임 (decode_binary_batch 로 복원)
+    파형 리스트가 없는 payload(NIBP, SPO2, TEMP)는 단건과 마찬가지로 JSON 으로 보냄.
+
+    :param payloads: send_to_data_back.build_payload 가 만든 dict 리스트 (같은 센서)
+    :param payload_format: PAYLOAD_FORMATS 중 하나
+    :param sensor_type: 센서 종류
+    :param sample_rate: 바이너리 형식 헤더에 넣을 샘플레이트(Hz)
+    :return: (본문 바이트열, 헤더 dict), 헤더에는 레코드 수(X-Record-Count)가 들어감
+    """
+    count = {"X-Record-Count": str(len(payloads))}
+    if payload_format in ("base64", "binary", "varint"):
+        data_key = f"{sensor_type}data"
+        if not all(isinstance(payload.get(data_key), list) for payload in payloads):
+            payload_format = "orjson"
+        elif payload_format != "base64":
+            varint = payload_format == "varint"
+            body = b"".join(encode_binary(payload["device_id"], payload["userid"], sensor_type, payload[data_key],
+                                          sample_rate, varint) for payload in payloads)
+            return body, {"Content-Type": "application/octet-stream", **count}
+        else:
+            payloads = [_base64_payload(payload, data_key, payload[data_key], sensor_type, sample_rate)
+                        for payload in payloads]
+            payload_format = "orjson"
+
+    if payload_format == "json":
+        return json.dumps({"records": payloads}).encode("utf-8"), {"Content-Type": "application/json", **count}
+    body, headers = _encode_json({"records": payloads}, payload_format)
+    headers.update(count)
+    return body, headers
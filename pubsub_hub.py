@@ -0,0 +1,339 @@
+# 실시간 구독(모니터링 대시보드)용 pub/sub 허브
+import asyncio
+# - asyncio: 구독자 대기(Event)와 Redis 발행 / 수신 백그라운드 태스크를 위함.
+
+import time
+# - time: 다른 워커의 구독 여부를 캐시해 두고 일정 시간마다 다시 확인하기 위함.
+
+import uuid
+# - uuid: 여러 워커 중 어느 프로세스가 발행한 메시지인지 구분하기 위함.
+
+from collections import deque
+# - deque(maxlen=N): 구독자별 버퍼. 가득 차면 가장 오래된 메시지가 자동으로 밀려남(drop-oldest).
+
+# 사용자 정의 로깅 설정 가져오기
+from logger import get_logger
+
+# 지표
+from metrics import SUBSCRIBER_DROPPED
+
+# 설정 값 가져오기
+from config import PUBSUB_BACKEND, PUBSUB_BUFFER, PUBSUB_CHANNEL_PREFIX
+
+
+logger = get_logger("pubsub_hub")
+
+# 지원하는 허브 종류
+# - memory: 같은 프로세스 안의 구독자에게만 전달 (단일 워커)
+# - redis: Redis pub/sub 을 거쳐 다른 워커 프로세스의 구독자에게도 전달
+PUBSUB_BACKENDS = ("memory", "redis")
+
+# 다른 워커의 구독 여부(PUBSUB NUMSUB 결과)를 캐시해 두는 시간(초)
+_REMOTE_RECHECK = 1.0
+# 이 시간(초) 동안 묻지 않은 토픽의 캐시는 지움 (끝난 세션의 토픽이 쌓이지 않도록)
+_REMOTE_FORGET = 60.0
+
+
+class Subscription:
+    """
+    구독자 하나의 버퍼. 발행 쪽은 put()으로 넣기만 하고 기다리지 않음.
+    버퍼가 가득 차면 가장 오래된 메시지를 버리고 dropped 를 늘리므로, 느린 브라우저가 장비 수신을 막지 못함.
+    """
+
+    __slots__ = ("topic", "buffer", "dropped", "closed", "_event", "_dropped_counter")
+
+    def __init__(self, topic, buffer_size=PUBSUB_BUFFER):
+        self.topic = topic
+        self.buffer = deque(maxlen=max(1, buffer_size))
+        self.dropped = 0
+        self.closed = False
+        self._event = asyncio.Event()
+        self._dropped_counter = SUBSCRIBER_DROPPED.labels(topic.rsplit(":", 1)[-1])
+
+    def put(self, message):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+            self._dropped_counter.inc()
+        self.buffer.append(message)
+        self._event.set()
+
+    def close(self):
+        """구독 종료 (기다리던 get_batch 가 바로 돌아옴)"""
+        self.closed = True
+        self._event.set()
+
+    async def get_batch(self):
+        """
+        쌓인 메시지를 모두 꺼냄 (없으면 올 때까지 기다림).
+
+        :return: 메시지 리스트 (close() 된 뒤에는 None)
+        """
+        while not self.buffer:
+            if self.closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+        messages = list(self.buffer)
+        self.buffer.clear()
+        return messages
+
+
+class PubSubHub:
+    """프로세스 내 허브. 토픽(username:sensor_type)별 구독자들에게 같은 메시지 객체를 나눠줌."""
+
+    name = "memory"
+
+    def __init__(self, buffer_size=PUBSUB_BUFFER):
+        """
+        :param buffer_size: 구독자별로 쌓아둘 최대 메시지 수
+        """
+        self.buffer_size = buffer_size
+        self.topics = {}  # 토픽 → 구독자 set
+
+    def has_subscribers(self, topic):
+        """발행할 필요가 있는지 (구독자가 없으면 handle_websocket 이 메시지를 만들지도 않음)"""
+        return topic in self.topics
+
+    def publish(self, topic, message):
+        """
+        메시지를 토픽의 구독자 버퍼에 넣음. 기다리지 않음.
+
+        :param topic: username:sensor_type
+        :param message: 구독자에게 그대로 보낼 문자열 (한 번만 인코딩해서 모든 구독자가 공유)
+        """
+        self._deliver(topic, message)
+
+    def _deliver(self, topic, message):
+        for subscription in self.topics.get(topic, ()):
+            subscription.put(message)
+
+    async def subscribe(self, topic):
+        """
+        토픽 구독 시작.
+
+        :return: Subscription
+        """
+        subscription = Subscription(topic, self.buffer_size)
+        self.topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription):
+        subscribers = self.topics.get(subscription.topic)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self.topics[subscription.topic]
+
+    def subscriber_counts(self):
+        """센서별 구독자 수 (지표용)"""
+        counts = {}
+        for topic, subscribers in list(self.topics.items()):
+            sensor = (topic.rsplit(":", 1)[-1],)
+            counts[sensor] = counts.get(sensor, 0) + len(subscribers)
+        return counts
+
+    def start(self):
+        pass
+
+    async def close(self):
+        self.topics.clear()
+
+
+class RedisPubSubHub(PubSubHub):
+    """
+    여러 워커 프로세스용 허브. 같은 프로세스의 구독자에게는 바로 전달하고,
+    다른 워커의 구독자를 위해 Redis 채널(PUBSUB_CHANNEL_PREFIX + 토픽)에도 발행함.
+
+    - 발행은 outbox 에 넣기만 하고 백그라운드 태스크가 파이프라인으로 모아서 PUBLISH (수신 루프에서 왕복 없음)
+    - 각 워커는 로컬 구독자가 있는 토픽의 채널만 SUBSCRIBE 하므로, 채널의 구독자 수(PUBSUB NUMSUB,
+      자기 자신 제외)가 곧 그 토픽을 받는 다른 워커 수. 토픽별로 _REMOTE_RECHECK 초 동안 캐시하고
+      (PUBLISH 반환값으로도 갱신), 다른 워커에 구독자가 없으면 인코딩 / 발행을 하지 않음
+    - 처음 묻는 토픽은 확인 결과가 올 때까지 다른 워커에 구독자가 없는 것으로 봄 (수신 루프에서 왕복 없음)
+    - 자기 자신이 발행한 메시지는 origin 으로 구분해서 다시 전달하지 않음
+    """
+
+    name = "redis"
+
+    def __init__(self, redis, buffer_size=PUBSUB_BUFFER, prefix=PUBSUB_CHANNEL_PREFIX, outbox_size=10000):
+        """
+        :param redis: Redis 연결 객체
+        :param buffer_size: 구독자별로 쌓아둘 최대 메시지 수
+        :param prefix: Redis 채널 이름 접두사
+        :param outbox_size: 아직 Redis로 발행하지 않은 메시지를 쌓아둘 최대 수 (넘으면 오래된 것부터 버림)
+        """
+        super().__init__(buffer_size)
+        self.redis = redis
+        self.prefix = prefix
+        self.origin = uuid.uuid4().hex[:12]
+        self._origin_prefix = self.origin + "|"
+        self._outbox = deque(maxlen=outbox_size)
+        self._outbox_event = asyncio.Event()
+        self._remote = {}             # 토픽 → (다른 워커에 구독자가 있는지, 다시 확인할 시각)
+        self._remote_checks = set()   # 확인 태스크가 PUBSUB NUMSUB 으로 확인할 토픽
+        self._remote_event = asyncio.Event()
+        self._subscribed = set()      # 이 워커가 실제로 SUBSCRIBE 중인 토픽 (구독자 수에서 자기 자신을 빼기 위함)
+        self._channel_changes = deque()  # 수신 태스크가 처리할 (subscribe/unsubscribe, 채널)
+        self._changes_event = asyncio.Event()
+        self._tasks = []
+
+    def has_subscribers(self, topic):
+        return topic in self.topics or self._has_remote(topic)
+
+    def publish(self, topic, message):
+        self._deliver(topic, message)
+        if self._has_remote(topic):
+            self._outbox.append((topic, self._origin_prefix + message))
+            self._outbox_event.set()
+
+    def _has_remote(self, topic):
+        """
+        다른 워커에 이 토픽의 구독자가 있는지 (캐시 값). 캐시가 없거나 오래됐으면 확인 태스크에 맡기고 기다리지 않음.
+
+        :param topic: username:sensor_type
+        :return: 마지막으로 확인한 값 (확인한 적이 없으면 False)
+        """
+        entry = self._remote.get(topic)
+        if entry is None or entry[1] <= time.monotonic():
+            if topic not in self._remote_checks:
+                self._remote_checks.add(topic)
+                self._remote_event.set()
+            if entry is None:
+                return False
+        return entry[0]
+
+    def _set_remote(self, topic, receivers, now):
+        """채널 구독자 수에서 자기 자신을 빼고 다른 워커의 구독 여부를 캐시함"""
+        own = 1 if topic in self._subscribed else 0
+        self._remote[topic] = (int(receivers) > own, now + _REMOTE_RECHECK)
+
+    async def subscribe(self, topic):
+        if topic not in self.topics:
+            self._change_channel("subscribe", topic)
+        return await super().subscribe(topic)
+
+    async def unsubscribe(self, subscription):
+        await super().unsubscribe(subscription)
+        if subscription.topic not in self.topics:
+            self._change_channel("unsubscribe", subscription.topic)
+
+    def _change_channel(self, action, topic):
+        self._channel_changes.append((action, self.prefix + topic))
+        self._changes_event.set()
+
+    def start(self):
+        """Redis 발행 / 수신 태스크 시작"""
+        self._tasks = [asyncio.create_task(self._publisher()), asyncio.create_task(self._listener()),
+                       asyncio.create_task(self._remote_checker())]
+        logger.info("Redis pub/sub 허브 시작 (채널 접두사 %s, origin %s)", self.prefix, self.origin)
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._remote.clear()
+        self._remote_checks.clear()
+        self._subscribed.clear()
+        await super().close()
+
+    async def _publisher(self):
+        """outbox 를 파이프라인 한 번으로 발행하고, 받은 워커 수로 다른 워커의 구독 여부 캐시를 갱신"""
+        while True:
+            await self._outbox_event.wait()
+            self._outbox_event.clear()
+            while self._outbox:
+                batch = [self._outbox.popleft() for _ in range(min(len(self._outbox), 500))]
+                pipe = self.redis.pipeline(transaction=False)
+                for topic, payload in batch:
+                    pipe.publish(self.prefix + topic, payload)
+                try:
+                    receivers = await pipe.execute()
+                except Exception as e:
+                    logger.error("Redis 발행 중 오류 발생: %s", e)
+                    await asyncio.sleep(1.0)
+                    continue
+                now = time.monotonic()
+                for (topic, _), count in zip(batch, receivers):
+                    self._set_remote(topic, count, now)
+
+    async def _remote_checker(self):
+        """캐시가 없거나 오래된 토픽의 채널 구독자 수를 PUBSUB NUMSUB 으로 확인하고, 오래 묻지 않은 토픽은 캐시에서 지움"""
+        pruned_at = time.monotonic()
+        while True:
+            await self._remote_event.wait()
+            self._remote_event.clear()
+            while self._remote_checks:
+                topics = list(self._remote_checks)[:500]
+                try:
+                    counts = await self.redis.pubsub_numsub(*(self.prefix + topic for topic in topics))
+                except Exception as e:
+                    logger.error("Redis 구독자 수 확인 중 오류 발생: %s", e)
+                    await asyncio.sleep(1.0)
+                    continue
+                now = time.monotonic()
+                # 응답은 요청한 채널 순서대로 (채널, 구독자 수)
+                for topic, (_, count) in zip(topics, counts):
+                    self._set_remote(topic, count, now)
+                self._remote_checks.difference_update(topics)
+            now = time.monotonic()
+            if now - pruned_at >= _REMOTE_RECHECK:
+                pruned_at = now
+                forget_before = now - _REMOTE_FORGET
+                for topic in [topic for topic, (_, expires) in self._remote.items() if expires < forget_before]:
+                    del self._remote[topic]
+
+    async def _listener(self):
+        """구독 채널 변경을 반영하고, 다른 워커가 발행한 메시지를 로컬 구독자에게 전달"""
+        pubsub = self.redis.pubsub()
+        prefix_length = len(self.prefix)
+        try:
+            while True:
+                while self._channel_changes:
+                    action, channel = self._channel_changes.popleft()
+                    await getattr(pubsub, action)(channel)
+                    if action == "subscribe":
+                        self._subscribed.add(channel[prefix_length:])
+                    else:
+                        self._subscribed.discard(channel[prefix_length:])
+                if not pubsub.subscribed:
+                    await self._changes_event.wait()
+                    self._changes_event.clear()
+                    continue
+                try:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.1)
+                except Exception as e:
+                    logger.error("Redis 구독 메시지 수신 중 오류 발생: %s", e)
+                    await asyncio.sleep(1.0)
+                    continue
+                if not message or message.get("type") != "message":
+                    continue
+                data = message["data"]
+                if isinstance(data, bytes):
+                    data = data.decode("utf-8")
+                origin, _, payload = data.partition("|")
+                if origin == self.origin:
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode("utf-8")
+                self._deliver(channel[prefix_length:], payload)
+        finally:
+            await pubsub.close()
+
+
+def create_pubsub_hub(name=PUBSUB_BACKEND, redis=None):
+    """
+    설정(PUBSUB_BACKEND)에 맞는 허브 생성.
+
+    :param name: memory / redis
+    :param redis: Redis 연결 객체 (redis 허브일 때 필요)
+    :return: 허브 객체
+    """
+    if name == "memory":
+        return PubSubHub()
+    if name == "redis":
+        if redis is None:
+            raise ValueError("redis pub/sub 허브에는 Redis 연결이 필요합니다.")
+        return RedisPubSubHub(redis)
+    raise ValueError(f"지원하지 않는 pub/sub 허브: {name}")
@@ -0,0 +1,337 @@
+# 세션 큐 백엔드 (Redis / 프로세스 내 링 버퍼)
+from array import array
+# - array: 같은 타입의 숫자를 C 배열로 담는 표준 라이브러리.
+#   목적: 프로세스 내 백엔드에서 샘플을 파이썬 객체 없이 C 배열 버퍼에 담기 위함.
+
+from collections import namedtuple
+# - namedtuple: 조회 결과(값 + 시퀀스 커서)를 묶어서 반환하기 위함.
+
+# Redis 큐 쓰기 / 스냅샷 읽기
+from redis_queue import QueueWriter, PACKED_TYPECODES, SEQ_KEY_SUFFIX, decode_queue_items, pop_snapshot
+
+# 설정 값 가져오기
+from config import QUEUE_BACKEND, REDIS_STORAGE_FORMAT, REDIS_KEY_PREFIX
+
+
+# 지원하는 큐 백엔드
+# - redis: 기존 방식 (세션 큐를 Redis 리스트에 저장, 여러 프로세스에서 조회 가능)
+# - memory: 프로세스 내 링 버퍼 (단일 노드 배포용, 샘플마다 네트워크 왕복과 문자열 변환이 없음)
+QUEUE_BACKENDS = ("redis", "memory")
+
+# 큐 조회 결과
+# - values: 샘플 값 (리스트 또는 array)
+# - first_seq: values[0] 의 시퀀스 번호 (세션 시작 후 몇 번째 샘플인지)
+# - next_seq: 마지막으로 돌려준 샘플 다음의 시퀀스 번호, 다음 조회의 since 커서로 그대로 쓰면 됨
+QueueSlice = namedtuple("QueueSlice", ("values", "first_seq", "next_seq"))
+
+
+def resolve_range(length, next_seq, offset=0, limit=None, since=None):
+    """
+    조회 조건을 큐 안의 인덱스 범위로 변환.
+
+    :param length: 현재 큐 길이
+    :param next_seq: 큐에 다음으로 들어올 샘플의 시퀀스 번호 (= 지금까지 들어온 샘플 수)
+    :param offset: 큐 앞에서부터 건너뛸 샘플 수 (음수면 뒤에서부터, since가 있으면 무시)
+    :param limit: 최대 샘플 수 (None이면 끝까지)
+    :param since: 이 시퀀스 번호부터 (이전 조회의 next_seq). 이미 잘려나간 번호면 큐의 맨 앞부터,
+                  next_seq 보다 크면(세션이 새로 시작되어 번호가 초기화됨) 역시 맨 앞부터
+    :return: (시작 인덱스, 끝 인덱스)
+    """
+    first_seq = next_seq - length
+    if since is not None:
+        begin = since - first_seq if first_seq <= since <= next_seq else 0
+    else:
+        begin = min(offset, length) if offset >= 0 else max(0, length + offset)
+    end = length if limit is None else min(length, begin + limit)
+    return begin, end
+
+
+class RedisQueueBackend:
+    """세션 큐를 Redis 리스트에 저장하는 백엔드 (세션별 쓰기는 redis_queue.QueueWriter 가 담당)"""
+
+    name = "redis"
+
+    def __init__(self, redis, storage=REDIS_STORAGE_FORMAT, key_prefix=REDIS_KEY_PREFIX):
+        """
+        :param redis: Redis 연결 객체
+        :param storage: 저장 방식 (text / packed)
+        :param key_prefix: 모든 큐 키 앞에 붙일 접두사 (스냅샷 / 카운터 / 잠금 키도 큐 키에서 만들어지므로 함께 적용됨)
+        """
+        self.redis = redis
+        self.storage = storage
+        self.key_prefix = key_prefix
+
+    def open(self, key, output_type=int, capacity=None):
+        """
+        세션 하나의 큐를 엶.
+
+        :param key: 큐 키 (예: username:ecg)
+        :param output_type: 센서 값의 타입 (int 또는 float)
+        :param capacity: 예상 최대 샘플 수 (Redis 백엔드는 사용하지 않음)
+        :return: QueueWriter
+        """
+        return QueueWriter(self.redis, self.key_prefix + key, output_type, storage=self.storage)
+
+    async def read(self, key, output_type=int, offset=0, limit=None, since=None):
+        """
+        세션 큐의 일부를 읽음 (get_sensor_data 용, 인자는 resolve_range 참고).
+        text 저장 방식은 필요한 범위만 LRANGE 로 가져오고, packed 는 패킷 단위 원소라서 전체를 읽은 뒤 자름.
+
+        :return: QueueSlice
+        """
+        key = self.key_prefix + key
+        seq_key = key + SEQ_KEY_SUFFIX
+        if self.storage == "packed":
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.get(seq_key)
+            pipe.lrange(key, 0, -1)
+            next_seq, items = await pipe.execute()
+            values = decode_queue_items(items, output_type, self.storage)
+            next_seq = max(int(next_seq or 0), len(values))
+            begin, end = resolve_range(len(values), next_seq, offset, limit, since)
+            first_seq = next_seq - len(values)
+            return QueueSlice(values[begin:end], first_seq + begin, first_seq + end)
+
+        # 길이와 시퀀스를 먼저 읽어서 범위를 정하고, 그 범위만 가져옴.
+        # 그 사이에 앞쪽이 잘려나가면(take_window) 인덱스가 밀리므로 다시 시도.
+        for _ in range(3):
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.get(seq_key)
+            pipe.llen(key)
+            next_seq, length = await pipe.execute()
+            length = int(length)
+            next_seq = max(int(next_seq or 0), length)
+            begin, end = resolve_range(length, next_seq, offset, limit, since)
+            first_seq = next_seq - length
+            if begin >= end:
+                return QueueSlice([], first_seq + begin, first_seq + begin)
+
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.get(seq_key)
+            pipe.llen(key)
+            pipe.lrange(key, begin, end - 1)
+            next_seq_now, length_now, items = await pipe.execute()
+            if max(int(next_seq_now or 0), int(length_now)) - int(length_now) == first_seq:
+                break
+        values = decode_queue_items(items, output_type, self.storage)
+        return QueueSlice(values, first_seq + begin, first_seq + begin + len(values))
+
+    async def pop_snapshot(self, snapshot_key, output_type=int, storage=None):
+        """detach()로 떼어낸 스냅샷을 읽고 삭제"""
+        return await pop_snapshot(self.redis, snapshot_key, output_type, storage or self.storage)
+
+    async def close(self):
+        await self.redis.close()
+
+
+# 링 버퍼를 처음 만들 때 할당하는 최대 샘플 수 (500Hz 파형 약 2초)
+# 큐 크기(15000)만큼 한 번에 잡으면 연결 직후부터 세션마다 약 60KB 를 쓰므로, 동시 연결이 많을 때는 값이 쌓이는 만큼만 늘림.
+RING_INITIAL_CAPACITY = 1024
+
+
+class RingBuffer:
+    """
+    array 위의 링 버퍼.
+    앞에서 꺼낼 때(take_window) 남은 값을 옮기지 않고 시작 위치만 옮김.
+    처음에는 RING_INITIAL_CAPACITY 까지만 할당하고, 용량이 모자라면 예상 최대 크기(limit)까지 두 배씩 늘림 (넘으면 필요한 만큼).
+    total 은 지금까지 들어온 샘플 수(다음 샘플의 시퀀스 번호)로, 앞에서 꺼내거나 비워도 줄지 않음.
+    """
+
+    __slots__ = ("typecode", "buffer", "capacity", "limit", "head", "size", "total")
+
+    def __init__(self, typecode, capacity, initial=RING_INITIAL_CAPACITY):
+        """
+        :param typecode: array 타입 코드
+        :param capacity: 예상 최대 샘플 수 (보통 queue_size 또는 스트리밍 윈도우 + 패킷 하나)
+        :param initial: 처음에 할당할 최대 샘플 수
+        """
+        self.typecode = typecode
+        self.limit = max(1, capacity)
+        self.capacity = min(self.limit, max(1, initial))
+        self.buffer = array(typecode, bytes(array(typecode).itemsize * self.capacity))
+        self.head = 0
+        self.size = 0
+        self.total = 0
+
+    def __len__(self):
+        return self.size
+
+    def extend(self, values):
+        """값들을 뒤에 추가 (같은 타입 코드의 array 는 변환 없이 그대로 복사)"""
+        chunk = values if isinstance(values, array) and values.typecode == self.typecode else array(self.typecode, values)
+        count = len(chunk)
+        if self.size + count > self.capacity:
+            self._grow(self.size + count)
+        tail = (self.head + self.size) % self.capacity
+        first = min(count, self.capacity - tail)
+        # 슬라이스 길이를 같게 맞춰서 대입해야 배열 크기가 바뀌지 않음
+        self.buffer[tail:tail + first] = chunk[:first]
+        if first < count:
+            self.buffer[:count - first] = chunk[first:]
+        self.size += count
+        self.total += count
+
+    def copy(self, start=0, stop=None):
+        """큐 안의 [start, stop) 범위를 array 로 복사 (파이썬 객체로 풀지 않음)"""
+        stop = self.size if stop is None else min(stop, self.size)
+        if start >= stop:
+            return array(self.typecode)
+        begin = (self.head + start) % self.capacity
+        end = begin + stop - start
+        if end <= self.capacity:
+            return self.buffer[begin:end]
+        return self.buffer[begin:] + self.buffer[:end - self.capacity]
+
+    def peek(self, count=None):
+        """앞에서 count개(None이면 전부)를 리스트로 복사"""
+        return self.copy(0, count).tolist()
+
+    def discard(self, count):
+        """앞에서 count개를 버림"""
+        count = min(count, self.size)
+        self.head = (self.head + count) % self.capacity
+        self.size -= count
+        if not self.size:
+            self.head = 0
+
+    def clear(self):
+        self.head = 0
+        self.size = 0
+
+    def _grow(self, needed):
+        capacity = max(needed, min(self.capacity * 2, self.limit))
+        values = self.copy()
+        values.extend(array(self.typecode, bytes(values.itemsize * (capacity - len(values)))))
+        self.buffer = values
+        self.capacity = capacity
+        self.head = 0
+
+
+class MemoryQueue:
+    """
+    프로세스 내 백엔드의 세션 큐. QueueWriter 와 같은 메서드(push / length / drain / detach / take_window ...)를 제공함.
+    모든 연산이 이벤트 루프 안에서 끝나므로 await 할 일이 없지만, 호출하는 쪽 코드를 같게 하려고 코루틴으로 둠.
+    """
+
+    storage = "memory"
+
+    def __init__(self, backend, key, output_type=int, capacity=0):
+        self.backend = backend
+        self.key = key
+        self.output_type = output_type
+        buffer = backend.buffers.get(key)
+        if buffer is None:
+            buffer = backend.buffers[key] = RingBuffer(PACKED_TYPECODES[output_type], capacity)
+        self.buffer = buffer
+
+    @property
+    def length(self):
+        return len(self.buffer)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    @property
+    def seq(self):
+        """다음으로 들어올 샘플의 시퀀스 번호 (조회 API의 next_seq 와 같은 번호)"""
+        return self.buffer.total
+
+    async def push(self, values, limit=None):
+        """
+        패킷 하나의 값을 큐에 추가하고 현재 큐 길이를 반환 (limit 은 QueueWriter 와의 호환용).
+        값은 링 버퍼로 복사되므로 호출한 쪽은 values 를 다음 패킷에 다시 써도 됨.
+        """
+        self.buffer.extend(values)
+        return len(self.buffer)
+
+    async def flush(self):
+        return len(self.buffer)
+
+    async def read_all(self):
+        return self.buffer.peek()
+
+    async def drain(self):
+        """큐에 쌓인 모든 값을 꺼내고 비움"""
+        values = self.buffer.peek()
+        self.buffer.clear()
+        return values
+
+    async def detach(self, suffix):
+        """
+        현재 큐의 값을 스냅샷으로 옮기고 이 세션은 빈 큐로 계속 쌓음.
+        스냅샷은 업로드 워커가 backend.pop_snapshot()으로 가져감.
+        """
+        snapshot_key = f"{self.key}:flush:{suffix}"
+        self.backend.snapshots[snapshot_key] = await self.drain()
+        return snapshot_key
+
+    async def take_window(self, window, overlap=0):
+        """앞쪽 window개를 꺼내고, 그중 마지막 overlap개는 다음 윈도우를 위해 남김"""
+        values = self.buffer.peek(window)
+        self.buffer.discard(window - overlap)
+        return values
+
+    async def delete(self, owner=None):
+        """owner 는 QueueWriter 와의 호환용 (프로세스 하나만 쓰므로 소유권은 AdmissionController 안에서 끝남)"""
+        self.buffer.clear()
+        if self.backend.buffers.get(self.key) is self.buffer:
+            del self.backend.buffers[self.key]
+        return True
+
+
+class MemoryQueueBackend:
+    """세션 큐를 프로세스 메모리의 링 버퍼에 저장하는 백엔드 (단일 프로세스 배포 전용)"""
+
+    name = "memory"
+
+    def __init__(self):
+        self.buffers = {}    # 큐 키 → RingBuffer
+        self.snapshots = {}  # 스냅샷 키 → 업로드 대기 중인 값 리스트
+
+    def open(self, key, output_type=int, capacity=0):
+        """
+        세션 하나의 큐를 엶. 같은 키로 이미 열린 큐가 있으면 버퍼를 함께 씀 (Redis 백엔드와 같은 동작).
+
+        :param key: 큐 키 (예: username:ecg)
+        :param output_type: 센서 값의 타입 (int 또는 float)
+        :param capacity: 예상 최대 샘플 수 (보통 queue_size 또는 스트리밍 윈도우 + 패킷 하나, 버퍼는 값이 쌓이는 만큼 이 크기까지 늘어남)
+        :return: MemoryQueue
+        """
+        return MemoryQueue(self, key, output_type, capacity)
+
+    async def read(self, key, output_type=int, offset=0, limit=None, since=None):
+        """
+        세션 큐의 일부를 array 그대로 읽음 (인자는 resolve_range 참고).
+
+        :return: QueueSlice
+        """
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            return QueueSlice([], 0, 0)
+        begin, end = resolve_range(len(buffer), buffer.total, offset, limit, since)
+        first_seq = buffer.total - len(buffer)
+        return QueueSlice(buffer.copy(begin, end), first_seq + begin, first_seq + end)
+
+    async def pop_snapshot(self, snapshot_key, output_type=int, storage=None):
+        return self.snapshots.pop(snapshot_key, [])
+
+    async def close(self):
+        self.buffers.clear()
+        self.snapshots.clear()
+
+
+def create_queue_backend(name=QUEUE_BACKEND, redis=None):
+    """
+    설정(QUEUE_BACKEND)에 맞는 큐 백엔드 생성.
+
+    :param name: redis / memory
+    :param redis: Redis 연결 객체 (redis 백엔드일 때 필요)
+    :return: 큐 백엔드 객체
+    """
+    if name == "redis":
+        if redis is None:
+            raise ValueError("redis 큐 백엔드에는 Redis 연결이 필요합니다.")
+        return RedisQueueBackend(redis)
+    if name == "memory":
+        return MemoryQueueBackend()
+    raise ValueError(f"지원하지 않는 큐 백엔드: {name}")
@@ -0,0 +1,61 @@
+# 큐 조회 API(get_sensor_data)용 다운샘플링 / 응답 본문 생성
+from array import array
+# - array: 프로세스 내 큐 백엔드가 돌려주는 샘플 배열을 그대로 다루기 위함.
+
+import orjson
+# - orjson: 큰 샘플 리스트를 빠르게 JSON으로 인코딩하기 위함 (requirements.txt 에 포함).
+
+
+def downsample_step(values, step):
+    """
+    step개마다 하나씩 고름 (step이 1이면 그대로).
+
+    :param values: 샘플 값 (리스트 또는 array)
+    :param step: 간격
+    :return: 고른 값 (입력과 같은 타입)
+    """
+    return values[::step] if step > 1 else values
+
+
+def downsample_minmax(values, bucket):
+    """
+    bucket개씩 묶어서 묶음마다 최솟값과 최댓값만 남김 (그래프용, 피크가 사라지지 않음).
+    두 값은 묶음 안에서 나온 순서대로 넣으므로 결과도 시간 순서를 유지함.
+
+    :param values: 샘플 값 (리스트 또는 array)
+    :param bucket: 묶음 크기
+    :return: [묶음1 값1, 묶음1 값2, 묶음2 값1, ...] 리스트 (마지막 묶음이 값 하나면 하나만)
+    """
+    result = []
+    for start in range(0, len(values), bucket):
+        part = values[start:start + bucket]
+        low, high = min(part), max(part)
+        low_index, high_index = part.index(low), part.index(high)
+        if low_index == high_index:
+            result.append(low)
+        elif low_index < high_index:
+            result += (low, high)
+        else:
+            result += (high, low)
+    return result
+
+
+def as_list(values):
+    """array 면 리스트로 변환 (orjson 은 array 를 직렬화하지 못함)"""
+    return values.tolist() if isinstance(values, array) else values
+
+
+def iter_json_chunks(fields, values, chunk_size):
+    """
+    {**fields, "data": values} 형태의 JSON을 chunk_size 개씩 나눠서 인코딩 (StreamingResponse 용).
+    전체 리스트를 한 번에 파이썬 객체 / JSON 문자열로 만들지 않음.
+
+    :param fields: data 외의 필드 dict
+    :param values: 샘플 값 (리스트 또는 array)
+    :param chunk_size: 한 번에 인코딩할 샘플 수
+    """
+    yield orjson.dumps(fields)[:-1] + b',"data":['
+    for start in range(0, len(values), chunk_size):
+        encoded = orjson.dumps(as_list(values[start:start + chunk_size]))[1:-1]
+        yield b"," + encoded if start else encoded
+    yield b"]}"
@@ -1,9 +1,14 @@
 # FastAPI의 기능을 사용하기 위해 import
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Request, Query
+from fastapi.responses import Response, StreamingResponse, ORJSONResponse
 # - APIRouter: 라우터를 생성, main.py에서 관리하기 위함.
 # - WebSocket: Iot장비와의 실시간 통신을 하기 위함.
 # - WebSocketDisconnect: WebSocket 연결이 끊어졌을 때 발생하는 예외 처리
-# - Request: Redis 인스턴스를 app.state에서 가져오기 위함.
+# - Request: 큐 백엔드를 app.state에서 가져오기 위함.
+# - Query: 조회 API의 쿼리 파라미터(offset, limit, since, ...) 검증
+# - StreamingResponse / ORJSONResponse: 큰 조회 결과를 나눠 보내거나 orjson 으로 빠르게 인코딩하기 위함.
+
+from typing import Optional
 
 # 사용자 정의 로깅 설정 가져오기
 from logger import get_logger
@@ -15,6 +20,46 @@ from send_to_data_back import send_to_data_backend
 # - send_to_data_backend: 백엔드로 센서값 전송을 위한 함수 불러오기
 #   목적: handle_websocket에서 send_to_data_backend를 통해 json형식으로 백엔드에 데이터를 전송하기 위함.
 
+# 세션 큐는 main.py에서 만든 큐 백엔드(app.state.queue_backend)를 통해 씀
+# - redis: redis_queue.QueueWriter 가 패킷을 모아 파이프라인 한 번으로 RPUSH 하고, 반환된 길이로 큐 길이를 추적
+# - memory: queue_backend.MemoryQueue 가 프로세스 내 링 버퍼에 바로 쌓음 (네트워크 왕복, 문자열 변환 없음)
+#   두 백엔드 모두 push / length / drain / detach / take_window / delete 를 같은 형태로 제공.
+
+# 백그라운드 업로드 작업
+from upload_worker import FlushJob
+# - FlushJob: 큐 가득 참 이벤트(스냅샷 키 + 전송 정보), main.py에서 시작한 UploadFlusher가 처리함.
+#   목적: 업로드를 기다리는 동안 WebSocket 수신이 멈추지 않도록 하기 위함.
+
+import uuid
+# - uuid: 큐 스냅샷 키가 서로 겹치지 않도록 접미사를 만들기 위함.
+
+import orjson
+# - orjson: 실시간 구독자에게 보낼 메시지를 패킷마다 한 번만 빠르게 인코딩하기 위함.
+
+# 조회 API 다운샘플링 / 응답 인코딩
+from queue_view import downsample_step, downsample_minmax, iter_json_chunks, as_list
+from payload_encoder import pack_samples
+# - pack_samples: binary 조회 응답을 업로드 바이너리 포맷과 같은 little endian 배열로 만들기 위함.
+
+# 설정 값 가져오기
+from config import STREAM_MODE, STREAM_OVERLAP, STREAM_MAX_WINDOW, READ_CHUNK_SAMPLES
+
+import logging
+# - logging: 로그 레벨 상수(logging.DEBUG)로 isEnabledFor 검사를 하기 위함.
+
+# 지표 (Prometheus 형식, main.py의 /metrics 에서 출력)
+from metrics import ACTIVE_SESSIONS, QUEUE_DEPTH
+
+# 장비 연결 수신 제한 (main.py에서 만든 app.state.admission)
+# - AdmissionController: 동시 세션 수 / 같은 키의 중복 세션 / 연결별 패킷 속도(토큰 버킷) / 이벤트 루프 지연으로 새 세션 거절
+#   목적: 장비 하나가 연결을 계속 열거나 패킷을 쏟아내도 같은 노드의 다른 환자 세션 지연이 늘어나지 않도록 하기 위함.
+
+# 연결 하나의 수신 상태
+from sensor_session import SensorSession
+# - SensorSession: 코덱 / 큐 키 / 카운터 / 지표 / 프레이머 / 신호 처리 상태 / 샘플 버퍼를 연결마다 한 번만 만들어 둠.
+#   목적: 메시지마다 설정 조회, 키 문자열 생성, 리스트 할당을 하지 않고, 연결이 많을 때 연결당 메모리를 줄이기 위함.
+#   메시지 하나에 이어 붙은 패킷들과 메시지 사이에 나뉜 패킷은 세션 안의 packet_framer.PacketFramer 가 잘라냄.
+
 import asyncio
 # - asyncio: Python의 비동기 프로그래밍을 지원하는 모듈.
 #   목적: 비동기처리를 통해 들어오는 값들이 많을 경우의 병목을 방지하기 위함.
@@ -23,6 +68,12 @@ from functools import partial
 # - partial: 함수의 일부 매개변수를 고정해 새로운 함수를 생성 임시 함수 느낌으로 처리.
 #   목적: 라우터에서 유저명(username), 센서 타입(sensor_type)별 엔드포인트를 동적으로 생성하는데 쓰임.
 
+# 센서 설정 및 패킷 코덱 레지스트리 가져오기
+from sensor_codec import WAVEFORM_SAMPLES_PER_PACKET, SENSOR_CODECS
+# - SENSOR_CODECS: 센서 유형으로 찾는 코덱(헤더, 길이, 디코더, 출력 타입)
+#   목적: cmd/길이 if 분기 대신 dict 조회 한 번으로 센서별 디코더를 찾기 위함.
+#   패킷 검증(SOP / cmd / 길이 / EOP)과 디코딩은 세션 안의 packet_framer.PacketFramer 와 SensorSession 이 함.
+
 
 # FastAPI 애플리케이션과 연결하는 라우터 생성
 receive_and_parsing_router = APIRouter()
@@ -31,163 +82,29 @@ receive_and_parsing_router = APIRouter()
 logger = get_logger("sensor_logger")
 
 
-# 센서별 설정 정의
-# cmd: 센서 타입에 따른 명령어 값
-# data_size: 데이터 크기 (바이트 단위)
-# queue_size: 사용자별 큐 크기
-SENSOR_CONFIGS = {
-    'ecg': {"cmd": 0x12, "data_size": 0x50, "queue_size": 15000},
-    'emg': {"cmd": 0x22, "data_size": 0x50, "queue_size": 15000},
-    'eog': {"cmd": 0x32, "data_size": 0x50, "queue_size": 15000},
-    'gsr': {"cmd": 0x82, "data_size": 0x50, "queue_size": 15000},
-    'airflow': {"cmd": 0x62, "data_size": 0x50, "queue_size": 15000},
-    'temp': {"cmd": 0xa2, "data_size": 0x04, "queue_size": 60},
-    'nibp': {"cmd": 0x42, "data_size": 0x04, "queue_size": 2},
-    'spo2': {"cmd": 0x52, "data_size": 0x04, "queue_size": 10},
-}
-
-# 공통 파싱 함수(모든 센서를 여기서 파싱)
-# 인자값으로 Iot장비로 부터 받아온, 센서 타입과 패킷을 인자로 받음.
-def parse_sensor_data(sensor_type, raw_data_hex):
-    """
-    :sensor_type: 센서 유형 (예: ecg, emg 등)
-    :raw_data_hex: 센서로부터 수신된 패킷 (16진수 문자열 : f7a2000000000000fa 의 형식)
-    :패킷 형식에 대해서 자세히 알고 싶다면, 라즈베리파이의 DAQ_Seral.py의 정의된 부분을 보면 됨.
-    :return: 파싱된 데이터 리스트를 반환, 그리고 json으로 묶어서 Post로 백엔드로 전송
-    """
-    try:
-        # 들어온 패킷 데이터를 바이트로 변환
-        raw_data_bytes = bytes.fromhex(raw_data_hex)
-        # 패킷 길이 계산
-        packet_length = len(raw_data_bytes)
-
-        # 센서 설정 가져오기
-        config = SENSOR_CONFIGS[sensor_type]
-        cmd = config["cmd"]
-        data_size = config["data_size"]
-
-        # 패킷의 sop, cmd, data size, eop 데이터 검증
-        sop = raw_data_bytes[0]
-        received_cmd = raw_data_bytes[1]
-        received_data_size = raw_data_bytes[2]
-        eop = raw_data_bytes[-1]
-
-        # SOP와 EOP 값 검증
-        if sop != 0xF7 or eop != 0xFA:
-            logger.error(f"[{sensor_type}] 패킷 헤더/트레일러 불일치")
-            return []
-
-        # CMD 값 검증
-        if received_cmd != cmd:
-            logger.warning(f"[{sensor_type}] 잘못된 cmd 값 수신: {received_cmd} (예상 cmd: {cmd})")
-            return []
-
-        # 패킷 길이 10 : NIBP, TEMP, SPO2
-        if packet_length == 10:
-            if received_cmd == 0x52:  # SPO2
-                return [raw_data_bytes[5]]
-
-            elif received_cmd == 0x42:  # NIBP
-                diastolic = raw_data_bytes[4]
-                systolic = raw_data_bytes[5]
-                return [systolic, diastolic]
-
-            elif received_cmd == 0xa2:  # TEMP
-                high_byte = int.from_bytes(raw_data_bytes[3:5], byteorder="big")
-                low_byte = int.from_bytes(raw_data_bytes[5:7], byteorder="big")
-                temp_raw = ((high_byte + low_byte) / 100.0) + 5
-                return [temp_raw]
-
-            else:
-                logger.warning(f"[{sensor_type}] 10바이트 패킷이지만 알 수 없는 cmd 값: {received_cmd}")
-                return []
-
-        # 패킷 길이 86 : ECG, EOG, EMG, GSR, AIRFLOW
-        elif packet_length == 86:
-            if received_cmd == 0x12:  # ECG 데이터
-                logger.info(f"[{sensor_type}] ECG 데이터 파싱 로직 실행")
-                data = raw_data_bytes[3:-1]
-                data_values = []
-                for i in range(0, len(data), 4):
-                    if i + 4 > len(data):
-                        break
-                    byte1 = data[i]
-                    byte2 = data[i + 1]
-                    fixed_value = int.from_bytes(data[i + 2:i + 4], byteorder="big")
-                    real_value = byte1 + byte2 + fixed_value
-                    data_values.append(real_value)
-                return data_values
-
-            elif received_cmd == 0x22:  # EMG 데이터 (ECG와 동일)
-                logger.info(f"[{sensor_type}] EMG 데이터 파싱 로직 실행")
-                data = raw_data_bytes[3:-1]
-                data_values = []
-                for i in range(0, len(data), 4):
-                    if i + 4 > len(data):
-                        break
-                    byte1 = data[i]
-                    byte2 = data[i + 1]
-                    fixed_value = int.from_bytes(data[i + 2:i + 4], byteorder="big")
-                    real_value = byte1 + byte2 + fixed_value
-                    data_values.append(real_value)
-                return data_values
-
-            elif received_cmd == 0x32:  # EOG 데이터 (ECG와 동일)
-                logger.info(f"[{sensor_type}] EOG 데이터 파싱 로직 실행")
-                data = raw_data_bytes[3:-1]
-                data_values = []
-                for i in range(0, len(data), 4):
-                    if i + 4 > len(data):
-                        break
-                    byte1 = data[i]
-                    byte2 = data[i + 1]
-                    fixed_value = int.from_bytes(data[i + 2:i + 4], byteorder="big")
-                    real_value = byte1 + byte2 + fixed_value
-                    data_values.append(real_value)
-                return data_values
-
-            elif received_cmd == 0x82:  # GSR 데이터 (ECG와 동일)
-                logger.info(f"[{sensor_type}] GSR 데이터 파싱 로직 실행")
-                data = raw_data_bytes[3:-1]
-                data_values = []
-                for i in range(0, len(data), 4):
-                    if i + 4 > len(data):
-                        break
-                    byte1 = data[i]
-                    byte2 = data[i + 1]
-                    fixed_value = int.from_bytes(data[i + 2:i + 4], byteorder="big")
-                    real_value = byte1 + byte2 + fixed_value
-                    data_values.append(real_value)
-                return data_values
-
-            elif received_cmd == 0x62:  # Airflow 데이터
-                logger.info(f"[{sensor_type}] AIRFLOW 데이터 파싱 로직 실행")
-                data = raw_data_bytes[3:-1]
-                data_values = []
-                for i in range(0, len(data), 4):
-                    if i + 4 > len(data):
-                        break
-                    byte1 = int.from_bytes(data[i:i + 2], byteorder="big")  # 00FF
-                    byte2 = int.from_bytes(data[i + 2:i + 4], byteorder="big")  # FF00
-                    real_value = byte1 + byte2
-                    # 값이 0xFFFF일 경우 -1로 치환 (2의 보수 처리)
-                    if real_value == 65535:
-                        data_values.append(-1)
-                        return data_values
-                    data_values.append(real_value)
-                return data_values
-
-            else:
-                logger.warning(f"[{sensor_type}] 86바이트 패킷이지만 알 수 없는 cmd 값: {received_cmd}")
-                return []
-
-        else:
-            logger.warning(f"[{sensor_type}] 잘못된 패킷 길이: {packet_length} (10 또는 86 예상)")
-            return []
+# 현재 연결 중인 세션들의 큐 (지표 출력 시점에 센서별 큐 깊이를 합산)
+_active_writers = set()
+
+
+def _queue_depths():
+    depths = {}
+    for writer in list(_active_writers):
+        sensor = (writer.key.rsplit(":", 1)[-1],)
+        depths[sensor] = depths.get(sensor, 0) + writer.length
+    return depths
+
+
+QUEUE_DEPTH.set_function(_queue_depths)
 
-    except Exception as e:
-        logger.error(f"[{sensor_type}] 데이터 파싱 중 오류 발생: {e}")
-        return []
+
+# 이미 읽어온 값을 백그라운드 업로드 워커에게 넘김 (워커가 없으면 바로 전송)
+async def _ship_values(websocket, device_id, username, sensor_type, values):
+    flusher = getattr(websocket.app.state, "upload_flusher", None)
+    if flusher is not None:
+        await flusher.submit(FlushJob(device_id, username, sensor_type, values=values))
+    else:
+        await send_to_data_backend(device_id, username, sensor_type, values,
+                                   client=getattr(websocket.app.state, "http_client", None))
 
 
 # WebSocket 처리 함수
@@ -201,87 +118,262 @@ async def handle_websocket(sensor_type: str, username: str, websocket: WebSocket
     :param websocket: WebSocket 연결 객체
     """
     await websocket.accept()
-    logger.info(f"WebSocket 연결 수락됨: 사용자={username}, 센서={sensor_type}")
-
-    # Redis 인스턴스 및 키 설정
-    redis = websocket.app.state.redis
-    redis_key = f"{username}:{sensor_type}"
-    queue_size = SENSOR_CONFIGS[sensor_type]["queue_size"]
+    logger.info("WebSocket 연결 수락됨: 사용자=%s, 센서=%s", username, sensor_type)
+
+    # 센서 코덱은 연결 시점에 한 번만 조회
+    codec = SENSOR_CODECS.get(sensor_type)
+    if codec is None:
+        logger.warning("등록되지 않은 센서 유형: %s", sensor_type)
+        await websocket.close(code=1008, reason="Unknown sensor type")
+        return
+
+    # 전송 방식 선택 (?mode=stream&window=5000&overlap=500)
+    # - batch: 큐가 가득 차면 전송 후 연결 종료 (기존 방식)
+    # - stream: 연결을 유지하며 window개씩 계속 전송, 큐는 링 버퍼처럼 window + 패킷 하나 이하로 유지
+    params = websocket.query_params
+    mode = params.get("mode", STREAM_MODE)
+    # 윈도우가 세션 큐의 최대 크기가 되므로 연결마다 고를 수 있는 크기에 상한을 둠
+    max_window = STREAM_MAX_WINDOW or codec.queue_size
+    try:
+        window = int(params.get("window", min(codec.queue_size, max_window)))
+        overlap = int(params.get("overlap", STREAM_OVERLAP))
+    except ValueError:
+        window, overlap = -1, -1
+    if mode not in ("batch", "stream") or not 0 < window <= max_window or not 0 <= overlap < window:
+        logger.warning("[%s] 잘못된 전송 방식 설정: mode=%s, window=%s (최대 %s), overlap=%s",
+                       sensor_type, mode, window, max_window, overlap)
+        await websocket.close(code=1008, reason="Invalid streaming parameters")
+        return
+    if mode == "stream":
+        logger.info("[%s] 스트리밍 모드: window=%s, overlap=%s", sensor_type, window, overlap)
+
+    # 연결 하나의 수신 상태 (코덱, 큐 키, 카운터, 지표, 프레이머, 신호 처리 상태, 샘플 버퍼)를 한 번만 만듦
+    session = SensorSession(codec, username, mode, window if mode == "stream" else None, overlap)
+    queue_size = session.queue_size
+    redis_key = session.key
+
+    # 수신 제한 확인 (큐를 열기 전에 해서, 같은 큐 키에 두 세션이 동시에 쓰거나 지우지 않도록 함)
+    admission = getattr(websocket.app.state, "admission", None)
+    ticket = None
+    if admission is not None:
+        ticket, rejection = await admission.admit(redis_key, sensor_type, websocket)
+        if ticket is None:
+            code, reason = rejection
+            logger.warning("[%s] 장비 세션 거절 (사용자: %s): %s", sensor_type, username, reason)
+            await websocket.close(code=code, reason=reason)
+            return
+        session.limiter = admission.rate_limiter()
+
+    # 세션 큐 열기 (memory 백엔드는 큐 크기 + 패킷 하나를 최대 크기로 보고 값이 쌓이는 만큼 버퍼를 늘림)
+    queue_writer = websocket.app.state.queue_backend.open(redis_key, codec.output_type,
+                                                          capacity=queue_size + WAVEFORM_SAMPLES_PER_PACKET)
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+
+    session_gauge = ACTIVE_SESSIONS.labels(sensor_type)
+    session_gauge.inc()
+    _active_writers.add(queue_writer)
+
+    # 실시간 구독 허브 (구독자가 없으면 메시지마다 dict 조회 한 번으로 끝남)
+    pubsub_hub = getattr(websocket.app.state, "pubsub_hub", None)
 
     try:
         # 장치 ID 및 사용자 정보 수신
-        device_id = await websocket.receive_text()
-        logger.info(f"장치 ID 수신: {device_id}")
+        device_id = session.device_id = await websocket.receive_text()
+        logger.info("장치 ID 수신: %s", device_id)
 
-        username = await websocket.receive_text()
-        logger.info(f"수신된 사용자 이름: {username}")
+        username = session.username = await websocket.receive_text()
+        logger.info("수신된 사용자 이름: %s", username)
 
         while True:
             try:
-                # 패킷(데이터) 수신
+                # 메시지 수신 (패킷 하나 또는 여러 개, 패킷 일부일 수도 있음)
                 data = await websocket.receive_bytes()
-                raw_data_hex = data.hex()
-                logger.debug(f"수신된 데이터: {raw_data_hex}")
-
-                # 데이터 파싱 및 Redis 큐에 저장
-                parsed_values = parse_sensor_data(sensor_type, raw_data_hex)
-                if parsed_values:
-                    await redis.rpush(redis_key, *[str(v) for v in parsed_values])
-                    logger.info(f"[{sensor_type}] {len(parsed_values)}개의 데이터가 저장되었습니다.")
+                # hex 문자열은 DEBUG 레벨이 켜져 있을 때만 만듦
+                if debug_enabled:
+                    logger.debug("수신된 데이터: %s", data.hex())
+
+                # 메시지 안의 패킷을 모두 파싱한 뒤 큐 저장 / 구독 알림은 메시지마다 한 번만 함
+                # 배치 모드는 큐가 차면 연결을 끊으므로, 큐를 채우고 남은 패킷은 기존처럼 받지 않은 것으로 봄
+                samples = session.feed(data, queue_size - queue_writer.length if mode == "batch" else None)
+                if samples:
+                    # 큐 백엔드는 값을 바로 복사 / 인코딩하므로 세션 버퍼를 그대로 넘김
+                    await queue_writer.push(samples, limit=queue_size)
+                    # 구독 중인 대시보드가 있으면 한 번 인코딩한 메시지를 모든 구독자 버퍼에 넣음 (기다리지 않음)
+                    # seq 는 큐 백엔드의 시퀀스 번호(조회 API의 since 와 같은 번호)를 그대로 쓰므로,
+                    # 끊겼던 구독자는 GET ?since= 로 빈 구간을 채울 수 있음 (같은 키의 이전 세션에 이어서 셈)
+                    if pubsub_hub is not None and pubsub_hub.has_subscribers(redis_key):
+                        pubsub_hub.publish(redis_key, orjson.dumps(
+                            {"sensor": sensor_type, "seq": queue_writer.seq - len(samples),
+                             "data": samples.tolist()}).decode())
+                    session.stored_samples += len(samples)
+
+                # 스트리밍 모드: 윈도우가 찼으면 전송하고 연결은 유지
+                if mode == "stream":
+                    while queue_writer.length >= window:
+                        window_values = await queue_writer.take_window(window, overlap)
+                        if not window_values:
+                            # 다른 워커의 같은 세션이 이 큐를 처리 중 (다음 메시지에서 다시 시도)
+                            break
+                        await _ship_values(websocket, device_id, username, sensor_type, window_values)
+                    continue
 
                 # 큐가 가득 찼을 경우, 백엔드로 데이터 전송
-                current_len = await redis.llen(redis_key)
-                if current_len >= queue_size:
-                    logger.info(f"[{sensor_type}] 큐가 최대 용량에 도달했습니다. 백엔드로 데이터 전송 시도.")
-                    raw_data = await redis.lrange(redis_key, 0, -1)
-                    data_list = [int(v) for v in raw_data]
-                    await send_to_data_backend(device_id, username, sensor_type, data_list)
+                if queue_writer.length >= queue_size:
+                    logger.info("[%s] 큐가 최대 용량에 도달했습니다. 백엔드로 데이터 전송 시도.", sensor_type)
+                    flusher = getattr(websocket.app.state, "upload_flusher", None)
+                    if flusher is not None:
+                        # 큐를 스냅샷 키로 바꿔치기(RENAME)한 뒤 업로드는 백그라운드 워커에게 넘김
+                        # 다른 워커가 같은 키를 먼저 떼어냈으면 None (그 워커가 업로드하므로 여기서는 넘기지 않음)
+                        snapshot_key = await queue_writer.detach(uuid.uuid4().hex)
+                        if snapshot_key is None:
+                            # 연결을 끊으면 세션 정리에서 그 워커가 쓰는 큐를 지우게 되므로, 이 세션은 계속 받음
+                            logger.warning("[%s] 다른 워커가 이미 큐를 전송 중입니다 (사용자: %s).", sensor_type, username)
+                            continue
+                        await flusher.submit(FlushJob(device_id, username, sensor_type, snapshot_key,
+                                                      codec.output_type, queue_writer.storage))
+                    else:
+                        data_list = await queue_writer.read_all()
+                        await send_to_data_backend(device_id, username, sensor_type, data_list,
+                                                   client=getattr(websocket.app.state, "http_client", None))
 
                     # 클라이언트와의 통신을 끊음.
                     await websocket.close(code=1000, reason="Queue reached maximum capacity")
+                    break
 
             except WebSocketDisconnect:
-                logger.warning(f"[{sensor_type}] WebSocket 연결 끊김 (사용자: {username}).")
+                logger.warning("[%s] WebSocket 연결 끊김 (사용자: %s).", sensor_type, username)
                 break
             except Exception as e:
-                logger.error(f"[{sensor_type}] WebSocket 처리 중 오류 발생: {e}")
+                logger.error("[%s] WebSocket 처리 중 오류 발생: %s", sensor_type, e)
                 break
 
     finally:
-        # Redis 큐 정리
-        await redis.delete(redis_key)
-        logger.info(f"[{sensor_type}] Redis 큐 정리 완료 (사용자: {username}).")
+        session_gauge.dec()
+        _active_writers.discard(queue_writer)
+        # 수신 제한 목록에서 먼저 뺌 (소유권 갱신 태스크가 큐를 지우는 중인 세션의 소유자 키를 다시 만들지 않도록)
+        if ticket is not None:
+            admission.release(ticket)
+        # 세션 큐 정리 (같은 키의 새 세션에 밀려서 닫힌 세션이면 새 세션이 큐를 이어서 쓰므로 지우지 않음)
+        # 워커 사이의 소유권을 쓰면 아직 이 세션이 소유자일 때만 지움 (다른 워커의 새 세션이 가져갔을 수 있음)
+        if ticket is None or not ticket.replaced:
+            await queue_writer.delete(owner=ticket.owner if ticket is not None else None)
+        logger.info("[%s] 큐 정리 완료 (사용자: %s). %s", sensor_type, session.username, session.describe())
 
 
 # HTTP GET 엔드포인트
 @receive_and_parsing_router.get("/{username}/{sensor_type}")
-async def get_sensor_data(sensor_type: str, username: str, request: Request):
+async def get_sensor_data(sensor_type: str, username: str, request: Request,
+                          offset: int = 0,
+                          limit: Optional[int] = Query(None, ge=0),
+                          since: Optional[int] = Query(None, ge=0),
+                          step: int = Query(1, ge=1),
+                          bucket: int = Query(0, ge=0),
+                          response_format: str = Query("json", alias="format", regex="^(json|binary)$")):
     """
     HTTP GET 요청을 통해 센서 데이터를 조회.
+    대시보드가 폴링할 때 매번 큐 전체를 받지 않도록, 응답의 next_seq 를 다음 요청의 since 로 넘기면 새 샘플만 받음.
 
     :param sensor_type: 센서 유형
     :param username: 사용자 이름
-    :param request: Redis 인스턴스 접근을 위한 Request 객체
+    :param request: 큐 백엔드 접근을 위한 Request 객체
+    :param offset: 큐 앞에서부터 건너뛸 샘플 수 (음수면 뒤에서부터, 예: -500 은 최근 500개)
+    :param limit: 최대 샘플 수
+    :param since: 이 시퀀스 번호 이후의 샘플만 (이전 응답의 next_seq, 지정하면 offset 무시)
+    :param step: step개마다 하나씩만 반환 (다운샘플링)
+    :param bucket: bucket개씩 묶어 최솟값 / 최댓값만 반환 (그래프용 다운샘플링, step보다 우선)
+    :param response_format: json / binary (little endian int32, TEMP는 float64 배열, 커서는 헤더로 전달)
     :return: 센서 데이터 큐 상태
     """
-    redis = request.app.state.redis
     redis_key = f"{username}:{sensor_type}"
-    data = await redis.lrange(redis_key, 0, -1)
+    codec = SENSOR_CODECS.get(sensor_type)
+    # 현재 사용 중인 큐 백엔드(redis / memory)에서 필요한 범위만 읽음
+    queue_slice = await request.app.state.queue_backend.read(
+        redis_key, codec.output_type if codec else int, offset=offset, limit=limit, since=since)
+    data = queue_slice.values
+    if bucket > 1:
+        data = downsample_minmax(data, bucket)
+    else:
+        data = downsample_step(data, step)
+
+    cursor = {"first_seq": queue_slice.first_seq, "next_seq": queue_slice.next_seq}
+    if response_format == "binary":
+        typecode, body = pack_samples(data)
+        return Response(body, media_type="application/octet-stream", headers={
+            "X-First-Seq": str(queue_slice.first_seq),
+            "X-Next-Seq": str(queue_slice.next_seq),
+            "X-Sample-Type": "int32le" if typecode == "i" else "float64le",
+            "X-Sample-Count": str(len(data)),
+        })
+
+    if not len(data):
+        return ORJSONResponse({"status": "error", "message": f"{sensor_type.upper()} 데이터 없음.", "data": [],
+                               **cursor})
+    fields = {"status": "success", "message": f"{sensor_type.upper()} 데이터 조회 성공", **cursor}
+    if len(data) > READ_CHUNK_SAMPLES:
+        # 큰 윈도우는 나눠서 인코딩하며 바로 내보냄
+        return StreamingResponse(iter_json_chunks(fields, data, READ_CHUNK_SAMPLES), media_type="application/json")
+    return ORJSONResponse({**fields, "data": as_list(data)})
+
+
+# 구독자 연결이 끊기면 구독을 닫아서 전송 루프를 끝냄
+async def _close_on_disconnect(websocket, subscription):
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    except Exception:
+        pass
+    finally:
+        subscription.close()
+
+
+# 실시간 구독 WebSocket (모니터링 대시보드)
+@receive_and_parsing_router.websocket("/ws/subscribe/{username}/{sensor_type}")
+async def subscribe_sensor_data(username: str, sensor_type: str, websocket: WebSocket):
+    """
+    장비 세션(handle_websocket)이 파싱한 값을 수신 메시지 단위로 받아보는 구독 엔드포인트.
+    메시지: {"sensor": "ecg", "seq": 첫 샘플의 시퀀스 번호, "data": [...]}
+    구독자 버퍼(PUBSUB_BUFFER)가 가득 차서 버린 메시지가 있으면 {"type": "dropped", "count": n} 을 먼저 보냄.
 
-    if not data:
-        return {"status": "error", "message": f"{sensor_type.upper()} 데이터 없음.", "data": []}
-    return {
-        "status": "success",
-        "message": f"{sensor_type.upper()} 데이터 조회 성공",
-        "data": [int(v) for v in data],
-    }
+    :param username: 사용자 이름
+    :param sensor_type: 센서 유형
+    :param websocket: WebSocket 연결 객체
+    """
+    await websocket.accept()
+    hub = getattr(websocket.app.state, "pubsub_hub", None)
+    if sensor_type not in SENSOR_CODECS or hub is None:
+        logger.warning("구독할 수 없는 센서 유형: %s", sensor_type)
+        await websocket.close(code=1008, reason="Unknown sensor type")
+        return
+
+    topic = f"{username}:{sensor_type}"
+    subscription = await hub.subscribe(topic)
+    watcher = asyncio.create_task(_close_on_disconnect(websocket, subscription))
+    logger.info("[%s] 실시간 구독 시작 (사용자: %s)", sensor_type, username)
+    reported_drops = 0
+    try:
+        while True:
+            messages = await subscription.get_batch()
+            if messages is None:
+                break
+            if subscription.dropped != reported_drops:
+                await websocket.send_text(
+                    orjson.dumps({"type": "dropped", "count": subscription.dropped - reported_drops}).decode())
+                reported_drops = subscription.dropped
+            for message in messages:
+                await websocket.send_text(message)
+    except Exception as e:
+        logger.debug("[%s] 구독자 전송 중단 (사용자: %s): %s", sensor_type, username, e)
+    finally:
+        watcher.cancel()
+        await hub.unsubscribe(subscription)
+        logger.info("[%s] 실시간 구독 종료 (사용자: %s), 버린 메시지 %d개", sensor_type, username, subscription.dropped)
 
 
-# 센서별 경로 등록
-for sensor_type in SENSOR_CONFIGS.keys():
+# 센서별 경로 등록 (코덱 레지스트리에 등록된 센서 기준)
+for sensor_type in SENSOR_CODECS.keys():
     # WebSocket 경로 등록
     receive_and_parsing_router.websocket(f"/ws/{{username}}/{sensor_type}")(partial(handle_websocket, sensor_type))
-    logger.info(f"WebSocket 경로 등록: /ws/{{username}}/{sensor_type}")
+    logger.info("WebSocket 경로 등록: /ws/{username}/%s", sensor_type)
     # HTTP GET 경로 등록
     receive_and_parsing_router.get(f"/{{username}}/{sensor_type}")(partial(get_sensor_data, sensor_type))
-    logger.info(f"HTTP GET 경로 등록: {{username}}/{sensor_type}")
+    logger.info("HTTP GET 경로 등록: {username}/%s", sensor_type)
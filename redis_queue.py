@@ -0,0 +1,400 @@
+# 패킷 단위 바이너리 저장을 위한 array 모듈
+from array import array
+# - array: 같은 타입의 숫자를 C 배열로 담는 표준 라이브러리.
+#   목적: packed 저장 방식에서 패킷 하나의 샘플들을 바이트열 하나로 만들기 위함.
+
+import asyncio
+# - asyncio: 다음 패킷이 오지 않아도 flush_interval 안에 전송하는 타이머와, 타이머 전송 / 세션 전송이 겹치지 않게 하는 잠금을 위함.
+
+import time
+# - time: 마지막 전송 이후 경과 시간을 재기 위함.
+
+import uuid
+# - uuid: 큐 가득 참 전송 잠금의 소유자 토큰을 만들기 위함.
+
+# 사용자 정의 로깅 설정 가져오기
+from logger import get_logger
+
+# Redis 명령 지연 지표 (연산별로 미리 바인딩)
+from metrics import REDIS_SECONDS
+
+# 설정 값 가져오기
+from config import REDIS_FLUSH_PACKETS, REDIS_FLUSH_INTERVAL, REDIS_STORAGE_FORMAT, UPLOAD_SNAPSHOT_TTL, FLUSH_LOCK_TTL
+
+
+logger = get_logger("redis_queue")
+
+# packed 저장 시 출력 타입별 배열 타입 코드
+# 파형 값은 byte1 + byte2 + fixed_value 로 16비트를 넘을 수 있고(최대 66045), AIRFLOW는 -1이 있으므로 부호 있는 32비트 사용.
+PACKED_TYPECODES = {int: "i", float: "d"}
+
+_flush_seconds = REDIS_SECONDS.labels("flush")
+_read_seconds = REDIS_SECONDS.labels("read")
+_detach_seconds = REDIS_SECONDS.labels("detach")
+_window_seconds = REDIS_SECONDS.labels("take_window")
+_snapshot_seconds = REDIS_SECONDS.labels("pop_snapshot")
+_delete_seconds = REDIS_SECONDS.labels("delete")
+_lock_seconds = REDIS_SECONDS.labels("lock")
+
+# packed 저장 시 샘플 개수를 따로 세는 키의 접미사 (리스트 원소 수 = 패킷 수 이므로)
+COUNT_KEY_SUFFIX = ":count"
+# 세션 큐에 지금까지 들어온 샘플 수(시퀀스 번호)를 세는 키의 접미사
+# 큐 앞쪽이 잘려나가도(take_window, detach) 줄지 않으므로, 조회 API의 since 커서로 "새로 들어온 샘플"만 골라낼 수 있음.
+SEQ_KEY_SUFFIX = ":seq"
+# 큐를 통째로 떼어내거나(detach) 다시 쓰는(packed take_window) 동안 잡는 잠금 키의 접미사
+# 여러 워커 프로세스에 같은 사용자:센서 세션이 동시에 붙어 있어도 같은 데이터를 두 번 전송하지 않도록 함.
+LOCK_KEY_SUFFIX = ":lock"
+# 지금 이 큐에 쓰는 장비 세션의 소유자 토큰 키의 접미사 (admission.AdmissionController 가 SET NX PX 로 잡고 갱신)
+# 여러 워커에 같은 사용자:센서 세션이 붙어도 한 세션만 큐를 쓰고 지울 수 있도록 함.
+OWNER_KEY_SUFFIX = ":owner"
+
+# 잠금 해제 Lua 스크립트: 값이 내가 넣은 소유자 토큰일 때만 삭제.
+# 작업이 FLUSH_LOCK_TTL 보다 오래 걸려 잠금이 풀리고 다른 워커가 다시 잡았으면, 그 워커의 잠금은 지우지 않음.
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# 세션 큐 삭제 Lua 스크립트: 소유자 키(KEYS[1])의 값이 이 세션의 토큰일 때만 큐 / 카운터 / 시퀀스 키와 소유자 키를 함께 지움.
+# 다른 워커의 새 세션이 소유권을 가져간 뒤 끝난 이전 세션이 그 세션의 큐를 지우지 않도록 함.
+DELETE_IF_OWNER_SCRIPT = """
+if redis.call("get", KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+return redis.call("del", unpack(KEYS))
+"""
+
+
+def decode_queue_items(items, output_type=int, storage=REDIS_STORAGE_FORMAT):
+    """
+    Redis 리스트에서 꺼낸 원소들을 값 리스트로 복원.
+
+    :param items: LRANGE 결과 (bytes 리스트)
+    :param output_type: 센서 값의 타입 (int 또는 float)
+    :param storage: 저장 방식 (text / packed)
+    :return: 샘플 값 리스트
+    """
+    if storage == "packed":
+        values = array(PACKED_TYPECODES[output_type])
+        for item in items:
+            values.frombytes(item)
+        return values.tolist()
+    return [output_type(v) for v in items]
+
+
+async def pop_snapshot(redis, snapshot_key, output_type=int, storage=REDIS_STORAGE_FORMAT):
+    """
+    detach()로 떼어낸 스냅샷 키를 읽고 삭제 (트랜잭션 한 번).
+
+    :param redis: Redis 연결 객체
+    :param snapshot_key: 스냅샷 키
+    :param output_type: 센서 값의 타입 (int 또는 float)
+    :param storage: 저장 방식 (text / packed)
+    :return: 샘플 값 리스트
+    """
+    pipe = redis.pipeline(transaction=True)
+    pipe.lrange(snapshot_key, 0, -1)
+    pipe.delete(snapshot_key, snapshot_key + COUNT_KEY_SUFFIX)
+    with _snapshot_seconds.time():
+        items, _ = await pipe.execute()
+    return decode_queue_items(items, output_type, storage)
+
+
+class QueueWriter:
+    """
+    세션 하나(사용자:센서)의 Redis 큐 쓰기를 담당.
+    패킷을 모아두었다가 파이프라인 한 번으로 전송하고, 큐 길이는 RPUSH(또는 INCRBY)의 반환값으로 추적하여
+    패킷마다 LLEN 을 따로 호출하지 않음. 키는 이 세션만 쓴다는 전제.
+    장비가 잠시 멈춰도 모아둔 값이 flush_interval 보다 오래 프로세스 메모리에만 남지 않도록,
+    첫 패킷이 쌓일 때 타이머를 걸어서 그때까지 전송되지 않았으면 타이머가 전송함.
+    """
+
+    def __init__(self, redis, key, output_type=int, flush_packets=REDIS_FLUSH_PACKETS,
+                 flush_interval=REDIS_FLUSH_INTERVAL, storage=REDIS_STORAGE_FORMAT):
+        """
+        :param redis: Redis 연결 객체
+        :param key: 큐 키 (예: username:ecg)
+        :param output_type: 센서 값의 타입 (int 또는 float)
+        :param flush_packets: 몇 개의 패킷이 쌓이면 전송할지
+        :param flush_interval: 첫 패킷이 쌓인 뒤 최대 몇 초 안에 전송할지
+        :param storage: 저장 방식 (text / packed)
+        """
+        if storage not in ("text", "packed"):
+            raise ValueError(f"지원하지 않는 저장 방식: {storage}")
+        self.redis = redis
+        self.key = key
+        self.count_key = key + COUNT_KEY_SUFFIX
+        self.seq_key = key + SEQ_KEY_SUFFIX
+        self.lock_key = key + LOCK_KEY_SUFFIX
+        self.owner_key = key + OWNER_KEY_SUFFIX
+        self.output_type = output_type
+        self.typecode = PACKED_TYPECODES[output_type]
+        self.flush_packets = max(1, flush_packets)
+        self.flush_interval = flush_interval
+        self.storage = storage
+
+        self.pending = []  # 아직 Redis로 보내지 않은 패킷들의 값 (array 복사본)
+        self.pending_samples = 0
+        self.pending_since = 0.0
+        self.inflight_samples = 0  # 전송 중인(응답을 기다리는) 샘플 수
+        self.stored = 0  # Redis에 저장된 샘플 수 (마지막 전송 결과 기준)
+        # {key}:seq 카운터 값 (마지막 전송 결과 기준, 첫 push 때 읽어옴)
+        # 같은 키의 이전 세션(replace 정책)이 쓰던 번호를 이어받으므로 0부터 세지 않음
+        self.stored_seq = None
+
+        # 타이머 전송과 세션의 전송 / 삭제가 겹치지 않도록 순서대로 실행 (RPUSH 순서 유지)
+        self._lock = asyncio.Lock()
+        self._timer = None       # flush_interval 뒤의 전송 예약 (loop.call_later 핸들)
+        self._timer_task = None  # 타이머가 시작한 전송 태스크
+
+    @property
+    def length(self):
+        """Redis에 저장된 샘플 수 + 전송 중이거나 아직 보내지 않은 샘플 수"""
+        return self.stored + self.inflight_samples + self.pending_samples
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def seq(self):
+        """다음으로 들어올 샘플의 시퀀스 번호 (조회 API의 next_seq 와 같은 번호, 전송 대기 중인 샘플 포함)"""
+        return (self.stored_seq or 0) + self.inflight_samples + self.pending_samples
+
+    async def push(self, values, limit=None):
+        """
+        패킷 하나의 값을 큐에 추가. 모인 패킷 수나 시간이 기준을 넘거나,
+        limit(큐 최대 크기)에 도달하면 바로 전송.
+        값은 array 로 복사해서 모아두므로(파이썬 int 객체를 들고 있지 않음) 호출한 쪽은 values 를 다음 패킷에 다시 써도 됨.
+
+        :param values: 파싱된 값 리스트 또는 array
+        :param limit: 이 길이에 도달하면 즉시 전송 (보통 queue_size)
+        :return: 현재 큐 길이 (전송 대기 중인 샘플 포함)
+        """
+        if self.stored_seq is None:
+            # 세션의 첫 패킷: 이어받을 시퀀스 번호를 읽어둠 (세션마다 한 번)
+            with _read_seconds.time():
+                self.stored_seq = int(await self.redis.get(self.seq_key) or 0)
+        if not self.pending:
+            self.pending_since = time.monotonic()
+        self.pending.append(array(self.typecode, values))
+        self.pending_samples += len(values)
+
+        elapsed = time.monotonic() - self.pending_since
+        if (len(self.pending) >= self.flush_packets
+                or (limit is not None and self.length >= limit)
+                or elapsed >= self.flush_interval):
+            await self.flush()
+        elif self._timer is None:
+            # 다음 패킷이 오지 않아도 flush_interval 안에 전송되도록 예약
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval - elapsed, self._on_timer)
+        return self.length
+
+    def _on_timer(self):
+        self._timer = None
+        if self.pending and self._timer_task is None:
+            self._timer_task = asyncio.create_task(self._flush_on_timer())
+
+    async def _flush_on_timer(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            # 값은 pending 에 남아 있으므로 다음 push / flush 때 다시 전송됨
+            logger.error("Redis 타이머 전송 실패 (%s): %s", self.key, e)
+        finally:
+            self._timer_task = None
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def flush(self):
+        """
+        모아둔 패킷을 파이프라인 한 번(왕복 1회)으로 Redis에 저장.
+        전송을 기다리는 동안 들어온 패킷은 다음 전송으로 넘어감 (타이머 전송 중에도 push 할 수 있음).
+
+        :return: Redis에 저장된 샘플 수
+        """
+        async with self._lock:
+            self._cancel_timer()
+            if not self.pending:
+                return self.stored
+
+            pending, count = self.pending, self.pending_samples
+            self.pending = []
+            self.pending_samples = 0
+            self.inflight_samples = count
+
+            pipe = self.redis.pipeline(transaction=False)
+            if self.storage == "packed":
+                # 패킷 하나 = 리스트 원소 하나(바이너리 배열), 샘플 수는 별도 카운터로 관리
+                pipe.rpush(self.key, *[values.tobytes() for values in pending])
+                pipe.incrby(self.count_key, count)
+            else:
+                # 샘플 하나 = 리스트 원소 하나 (기존 방식과 동일한 형태)
+                pipe.rpush(self.key, *[str(v) for values in pending for v in values])
+            pipe.incrby(self.seq_key, count)
+            try:
+                with _flush_seconds.time():
+                    results = await pipe.execute()
+            except BaseException:
+                # 보내지 못한 값은 그 사이에 들어온 값 앞에 되돌려 둠
+                self.pending[:0] = pending
+                self.pending_samples += count
+                raise
+            finally:
+                self.inflight_samples = 0
+
+            # text: RPUSH 반환값(원소 수 = 샘플 수), packed: INCRBY 카운터 반환값
+            self.stored = int(results[1] if self.storage == "packed" else results[0])
+            # 다른 워커가 같은 키에 쓴 샘플도 반영된 카운터 값으로 맞춤
+            self.stored_seq = int(results[-1])
+            return self.stored
+
+    async def read_all(self):
+        """
+        큐에 쌓인 모든 값을 읽어옴 (전송 대기 중인 값은 먼저 저장).
+
+        :return: 샘플 값 리스트
+        """
+        await self.flush()
+        with _read_seconds.time():
+            items = await self.redis.lrange(self.key, 0, -1)
+        return decode_queue_items(items, self.output_type, self.storage)
+
+    async def drain(self):
+        """
+        큐에 쌓인 모든 값을 읽고 비움 (읽기 + 삭제를 트랜잭션 한 번으로).
+
+        :return: 샘플 값 리스트
+        """
+        await self.flush()
+        values = await pop_snapshot(self.redis, self.key, self.output_type, self.storage)
+        self.stored = 0
+        return values
+
+    async def _acquire_lock(self):
+        """
+        키별 잠금을 SET NX PX 로 잡음 (FLUSH_LOCK_TTL 뒤에 자동으로 풀림).
+
+        :return: 잡았으면 소유자 토큰 (_release_lock 에 넘김), 다른 워커가 잡고 있으면 None
+        """
+        token = uuid.uuid4().hex
+        with _lock_seconds.time():
+            acquired = await self.redis.set(self.lock_key, token, nx=True, px=int(FLUSH_LOCK_TTL * 1000))
+        return token if acquired else None
+
+    async def _release_lock(self, token, pipe=None):
+        """
+        _acquire_lock 으로 잡은 잠금을 풂 (토큰이 같을 때만, RELEASE_LOCK_SCRIPT).
+
+        :param token: _acquire_lock 이 돌려준 소유자 토큰
+        :param pipe: 주어지면 이 트랜잭션에 해제 명령만 추가 (실행은 호출한 쪽)
+        """
+        if pipe is not None:
+            pipe.eval(RELEASE_LOCK_SCRIPT, 1, self.lock_key, token)
+            return
+        with _lock_seconds.time():
+            await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, self.lock_key, token)
+
+    async def detach(self, suffix):
+        """
+        현재 큐를 스냅샷 키로 원자적으로 바꿔치기(RENAME)하고, 이 세션은 빈 큐로 계속 쌓음.
+        스냅샷은 업로드 워커가 pop_snapshot()으로 가져감.
+        다른 워커의 세션이 같은 키를 이미 떼어내는 중이거나 떼어내서 큐가 비었으면 아무것도 하지 않음
+        (같은 데이터가 두 번 업로드되지 않도록).
+
+        :param suffix: 스냅샷 키를 구분하기 위한 접미사
+        :return: 스냅샷 키 (떼어낸 것이 없으면 None)
+        """
+        await self.flush()
+        token = await self._acquire_lock()
+        if token is None:
+            self.stored = 0
+            return None
+        snapshot_key = f"{self.key}:flush:{suffix}"
+        # 잠금을 잡은 동안에는 다른 워커가 이 키를 떼어내지 않으므로, 확인 후 RENAME 해도 됨
+        if not await self.redis.exists(self.key):
+            await self._release_lock(token)
+            self.stored = 0
+            return None
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.rename(self.key, snapshot_key)
+        pipe.expire(snapshot_key, UPLOAD_SNAPSHOT_TTL)
+        if self.storage == "packed":
+            pipe.rename(self.count_key, snapshot_key + COUNT_KEY_SUFFIX)
+            pipe.expire(snapshot_key + COUNT_KEY_SUFFIX, UPLOAD_SNAPSHOT_TTL)
+        # 잠금 해제도 같은 트랜잭션에서
+        await self._release_lock(token, pipe)
+        with _detach_seconds.time():
+            await pipe.execute()
+        self.stored = 0
+        return snapshot_key
+
+    async def take_window(self, window, overlap=0):
+        """
+        스트리밍 모드용 링 버퍼 처리. 큐 앞쪽 window개를 꺼내고, 그중 마지막 overlap개와
+        window 뒤에 이미 들어온 값만 남김. 큐 길이는 window + 패킷 하나 이하로 유지됨.
+
+        :param window: 한 번에 내보낼 샘플 수
+        :param overlap: 다음 윈도우와 겹칠 샘플 수 (0이면 겹치지 않음)
+        :return: window개의 샘플 값 리스트
+        """
+        await self.flush()
+        keep_from = window - overlap
+        if self.storage == "packed":
+            # 원소가 패킷 단위이므로 샘플 단위로 풀어서 자른 뒤 남길 부분만 다시 저장.
+            # 읽기와 다시 쓰기 사이에 다른 워커가 같은 키를 건드리지 않도록 잠금을 잡음
+            token = await self._acquire_lock()
+            if token is None:
+                return []
+            try:
+                with _window_seconds.time():
+                    items = await self.redis.lrange(self.key, 0, -1)
+                values = decode_queue_items(items, self.output_type, self.storage)
+                rest = values[keep_from:]
+                pipe = self.redis.pipeline(transaction=True)
+                pipe.delete(self.key, self.count_key)
+                if rest:
+                    pipe.rpush(self.key, array(self.typecode, rest).tobytes())
+                    pipe.set(self.count_key, len(rest))
+                await self._release_lock(token, pipe)
+                with _window_seconds.time():
+                    await pipe.execute()
+            except Exception:
+                await self._release_lock(token)
+                raise
+            self.stored = len(rest)
+            return values[:window]
+
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lrange(self.key, 0, window - 1)
+        pipe.ltrim(self.key, keep_from, -1)
+        pipe.llen(self.key)
+        with _window_seconds.time():
+            items, _, remaining = await pipe.execute()
+        self.stored = int(remaining)
+        return decode_queue_items(items, self.output_type, self.storage)
+
+    async def delete(self, owner=None):
+        """
+        큐와 카운터 / 시퀀스 키를 삭제하고 대기 중인 값도 버림 (전송 중인 값이 있으면 전송이 끝난 뒤 삭제).
+
+        :param owner: 세션의 소유자 토큰 (AdmissionTicket.owner). 주어지면 {key}:owner 가 아직 이 토큰일 때만
+                      지우고 소유자 키도 함께 지움 (DELETE_IF_OWNER_SCRIPT)
+        :return: 지웠으면 True, 다른 세션이 소유권을 가져가서 남겨 두었으면 False
+        """
+        self._cancel_timer()
+        async with self._lock:
+            self.pending.clear()
+            self.pending_samples = 0
+            self.stored = 0
+            self.stored_seq = 0
+            with _delete_seconds.time():
+                if owner is None:
+                    await self.redis.delete(self.key, self.count_key, self.seq_key)
+                    return True
+                return bool(await self.redis.eval(DELETE_IF_OWNER_SCRIPT, 4, self.owner_key,
+                                                  self.key, self.count_key, self.seq_key, owner))
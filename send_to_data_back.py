@@ -3,10 +3,22 @@ import httpx
 # httpx: HTTP 클라이언트를 비동기 방식으로 제공하는 Python 라이브러리.
 # - 목적: 비동기 방식으로 http POST 요청을 백엔드에 전달하기 위함.
 
-# json 형식으로 데이터셋을 맞추기
-import json
-# json: JSON형식으로 payload 생성 모듈
-# - 목적: 큐에 쌓인 데이터의 저장과 결과 도출을 위해 json방식으로 보내야하기에.
+# 페이로드 인코딩 (json / orjson / gzip / zstd / base64 / binary / varint)
+from payload_encoder import encode_payload, encode_batch_payload, PAYLOAD_FORMATS
+# encode_payload: payload(dict)를 센서별로 지정한 형식의 HTTP 본문과 헤더로 변환
+# encode_batch_payload: 여러 사용자의 payload 를 요청 하나의 본문으로 묶음 (배치 전송)
+# - 목적: 15000개짜리 파형 리스트를 기본 JSON보다 빠르고 작게 보내기 위함.
+
+# 센서별 샘플레이트 (바이너리 형식 헤더에 사용)
+from sensor_codec import SENSOR_CODECS
+
+# 업로드 지연 / 결과 지표
+from metrics import UPLOAD_SECONDS, UPLOAD_RESPONSES, UPLOAD_BATCH_RECORDS
+
+from time import perf_counter
+
+import logging
+# - logging: 로그 레벨 상수(logging.DEBUG)로 isEnabledFor 검사를 하기 위함.
 
 # 사용자 정의 로깅 설정 가져오기
 from logger import get_logger
@@ -14,54 +26,95 @@ from logger import get_logger
 #   목적: 테스트 환경에서 실제로 값에 대한 로그 출력을 위함. 
 
 
+# 설정 값 가져오기
+from config import (
+    DATA_BACKEND_URL, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY,
+    HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT, HTTP2, UPLOAD_BATCH_SENSORS, payload_format_for,
+)
+
+
 logger = get_logger("back_data_sender")
 
+# 백엔드 주소 (환경 변수 DATA_BACKEND_URL)
+base_url = DATA_BACKEND_URL
+
 # 서버 URL 매핑 테이블(실제 데이터를 받는 url, ngrok으로 뚫어둠)
+# url: 센서 데이터를 받는 주소
+# format: 페이로드 형식 (json / orjson / gzip / zstd / base64 / binary / varint, payload_encoder.py 참고)
+#         환경 변수 PAYLOAD_FORMAT_<SENSOR>(예: PAYLOAD_FORMAT_ECG=binary)로 센서마다 바꿀 수 있고, 없으면 PAYLOAD_FORMAT
+# batch: True 이면 여러 사용자의 payload 를 모아 요청 하나로 보냄 (백엔드가 {"records": [...]} 를 받을 수 있어야 함, upload_coalescer.py)
 SENSOR_URL_MAPPING = {
-    "ecg": f"{base_url}/ws/ecg",
-    "ecg": f"{base_url}/ws/ecg",
-    "emg": f"{base_url}/ws/emg",
-    "gsr": f"{base_url}/ws/gsr",
-    "airflow": f"{base_url}/ws/airflow",
-    "temp": f"{base_url}/ws/bodytemp",
-    "nibp": f"{base_url}/ws/nibp",
-    "spo2": f"{base_url}/ws/spo2"
+    "ecg": {"url": f"{base_url}/ws/ecg", "format": payload_format_for("ecg"), "batch": "ecg" in UPLOAD_BATCH_SENSORS},
+    "emg": {"url": f"{base_url}/ws/emg", "format": payload_format_for("emg"), "batch": "emg" in UPLOAD_BATCH_SENSORS},
+    "eog": {"url": f"{base_url}/ws/eog", "format": payload_format_for("eog"), "batch": "eog" in UPLOAD_BATCH_SENSORS},
+    "gsr": {"url": f"{base_url}/ws/gsr", "format": payload_format_for("gsr"), "batch": "gsr" in UPLOAD_BATCH_SENSORS},
+    "airflow": {"url": f"{base_url}/ws/airflow", "format": payload_format_for("airflow"), "batch": "airflow" in UPLOAD_BATCH_SENSORS},
+    "temp": {"url": f"{base_url}/ws/bodytemp", "format": payload_format_for("temp"), "batch": "temp" in UPLOAD_BATCH_SENSORS},
+    "nibp": {"url": f"{base_url}/ws/nibp", "format": payload_format_for("nibp"), "batch": "nibp" in UPLOAD_BATCH_SENSORS},
+    "spo2": {"url": f"{base_url}/ws/spo2", "format": payload_format_for("spo2"), "batch": "spo2" in UPLOAD_BATCH_SENSORS},
 }
+for _sensor_type, _target in SENSOR_URL_MAPPING.items():
+    if _target["format"] not in PAYLOAD_FORMATS:
+        raise ValueError(f"지원하지 않는 페이로드 형식입니다 ({_sensor_type}): {_target['format']} "
+                         f"({' / '.join(PAYLOAD_FORMATS)})")
 
-# 백엔드로 파싱된 패킷을 리스트에 넣어 json으로 보내고, 응답을 받는 함수
-# 여기서 data는 전부다 list
-async def send_to_data_backend(device_id, username, sensor_type, data):
+# 다시 보내면 성공할 수 있는 4xx 응답 (5xx 는 모두 재전송 대상)
+RETRYABLE_STATUS_CODES = frozenset((408, 425, 429))
+
+# 앱 전체가 함께 쓰는 httpx 클라이언트 생성 (main.py의 startup에서 한 번 생성, shutdown에서 종료)
+def create_http_client():
     """
-    센서 데이터를 백엔드로 전송하는 함수.
-    :device_id: 장비 고유 정보(식별자)
+    keep-alive 커넥션 풀을 가진 공유 httpx.AsyncClient 생성.
+    업로드마다 TCP/TLS 핸드셰이크를 새로 하지 않도록 연결을 재사용함.
+
+    :return: httpx.AsyncClient
+    """
+    http2 = HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401  (httpx의 HTTP/2 지원에 필요)
+        except ImportError:
+            logger.warning("h2 패키지가 없어 HTTP/1.1로 동작합니다. (pip install httpx[http2])")
+            http2 = False
+
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    logger.info("httpx 클라이언트 생성: 최대 연결 %s, keep-alive %s, HTTP/2 %s",
+                HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, http2)
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+# 센서 종류에 따라 백엔드로 보낼 payload(dict) 생성
+def build_payload(device_id, username, sensor_type, data):
+    """
+    센서 데이터를 백엔드 payload 로 변환. 단건 전송과 배치 전송의 레코드가 같은 모양이 되도록 함께 사용.
+
+    :param device_id: 장비 고유 정보(식별자)
     :param username: 사용자 이름
-    :param sensor_type: 센서 종류 (예: 'ecg', 'gsr', 'spo2' 등)
-    :param data: 전송할 데이터 단일 데이터 혹은 큐(리스트)
+    :param sensor_type: 센서 종류
+    :param data: 전송할 데이터 리스트
+    :return: payload dict, 보낼 수 없는 입력이면 None
     """
 
     # 사용자 정보가 없을 경우, 처리 X
     if not device_id:
         logger.warning("장비에 대한 정보가 없습니다.")
-        return
+        return None
 
     # 사용자 정보가 없을 경우, 처리 X
     if not username:
         logger.warning("사용자 이름이 설정되지 않았습니다.")
-        return
+        return None
 
     # 데이터가 유효한 리스트인지 확인
     if not data:
-        logger.warning(f"{sensor_type} 데이터가 비어 있거나 유효하지 않습니다.")
-        return
-
-    # 센서 종류에 따른 서버 URL 선택
-    backend_url = SENSOR_URL_MAPPING.get(sensor_type)
-    if not backend_url:
-        logger.error(f"센서 종류 '{sensor_type}'에 해당하는 URL이 없습니다.")
-        return
-        
-    logger.debug(f"선택된 서버 URL: {backend_url}")
-    
+        logger.warning("%s 데이터가 비어 있거나 유효하지 않습니다.", sensor_type)
+        return None
+
    # Payload 생성
     # nibp를 측정하는 데 필요한 속성의 수가 2개로 지정되어 있어서 payload가 다름. 별도의 양식 사용.
     if sensor_type == "nibp":
@@ -89,29 +142,121 @@ async def send_to_data_backend(device_id, username, sensor_type, data):
         }
     
     # Payload 생성 로그
-    logger.debug(f"device_id: {payload['device_id']}, userid: {payload['userid']}")
+    logger.debug("device_id: %s, userid: %s", payload['device_id'], payload['userid'])
+    return payload
 
-    
+
+async def _post(client, backend_url, content, headers, sensor_type, description):
+    """
+    본문을 백엔드로 POST 하고 결과를 지표와 로그로 남김.
+
+    :param description: 로그에 남길 요청 설명 (예: "사용자: hong", "레코드 32개")
+    :return: 다시 보낼 필요가 없으면 True, 연결 실패 · 타임아웃 · 5xx · 408 · 429 이면 False
+    """
     response = None  # response를 초기화
+    status = "error"
+    delivered = False
+    started = perf_counter()
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(backend_url, json=payload)
+        if client is not None:
+            # 공유 클라이언트: 커넥션 풀의 keep-alive 연결 재사용
+            response = await client.post(backend_url, content=content, headers=headers)
+        else:
+            async with httpx.AsyncClient() as temp_client:
+                response = await temp_client.post(backend_url, content=content, headers=headers)
 
-            # 상태 코드와 서버 응답 메시지 로그
-            logger.info(f"HTTP 상태 코드: {response.status_code}")
-            logger.info(f"서버 응답 메시지: {response.text}")
-            
+        status = str(response.status_code)
+        # 상태 코드와 서버 응답 메시지 로그
+        logger.info("[%s] HTTP 상태 코드: %s (%s)", sensor_type, response.status_code, description)
+        # 5xx(ngrok 터널 끊김 502 등), 408, 429 는 나중에 다시 보내면 성공할 수 있음
+        delivered = not (response.status_code >= 500 or response.status_code in RETRYABLE_STATUS_CODES)
+        if response.status_code >= 400:
+            logger.error("[%s] 백엔드가 업로드를 거부했습니다: %s (%s, 재전송 %s)",
+                         sensor_type, response.status_code, description, "안 함" if delivered else "예정")
+        # 응답 본문은 DEBUG 레벨에서만, 앞부분 200자까지만 남김
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("서버 응답 메시지: %.200s", response.text)
 
     except httpx.HTTPStatusError as http_err:
         # HTTP 상태 코드 에러 (응답 있음)
-        logger.error(f"HTTP 에러 발생: {http_err.response.status_code}, 응답: {http_err.response.text}")
+        logger.error("HTTP 에러 발생: %s, 응답: %.200s", http_err.response.status_code, http_err.response.text)
 
     except httpx.RequestError as req_err:
         # 요청 실패 (연결 문제 등)
-        logger.error(f"요청 실패: {req_err}")
+        logger.error("요청 실패: %s", req_err)
         # 상태 코드와 서버 응답 메시지 로그
 
     except Exception as e:
         # 기타 예외
-        logger.error(f"예상치 못한 오류 발생: {e}")
+        logger.error("예상치 못한 오류 발생: %s", e)
+
+    finally:
+        # 업로드 지연 / 결과 지표 기록
+        UPLOAD_SECONDS.labels(sensor_type).observe(perf_counter() - started)
+        UPLOAD_RESPONSES.labels(sensor_type, status).inc()
+    return delivered
+
+
+# 백엔드로 파싱된 패킷을 리스트에 넣어 json으로 보내고, 응답을 받는 함수
+# 여기서 data는 전부다 list
+async def send_to_data_backend(device_id, username, sensor_type, data, client=None):
+    """
+    센서 데이터를 백엔드로 전송하는 함수.
+    :device_id: 장비 고유 정보(식별자)
+    :param username: 사용자 이름
+    :param sensor_type: 센서 종류 (예: 'ecg', 'gsr', 'spo2' 등)
+    :param data: 전송할 데이터 단일 데이터 혹은 큐(리스트)
+    :param client: 공유 httpx.AsyncClient (app.state.http_client). 없으면 이번 요청만을 위한 클라이언트를 만듦.
+    :return: 다시 보낼 필요가 없으면 True (2xx 응답, 또는 다시 보내도 결과가 같은 입력 오류 / 4xx 응답),
+             연결 실패 · 타임아웃 · 5xx · 408 · 429 처럼 나중에 다시 보내야 하면 False
+    """
+
+    payload = build_payload(device_id, username, sensor_type, data)
+    if payload is None:
+        return True
+
+    # 센서 종류에 따른 서버 URL 및 페이로드 형식 선택
+    target = SENSOR_URL_MAPPING.get(sensor_type)
+    if not target:
+        logger.error("센서 종류 '%s'에 해당하는 URL이 없습니다.", sensor_type)
+        return True
+    backend_url = target["url"]
+    payload_format = target.get("format", "json")
+        
+    logger.debug("선택된 서버 URL: %s", backend_url)
+
+    # 지정한 형식으로 본문 인코딩 (NIBP, SPO2, TEMP 처럼 리스트가 없는 payload는 JSON으로 보냄)
+    codec = SENSOR_CODECS.get(sensor_type)
+    content, headers = encode_payload(payload, payload_format, sensor_type, codec.sample_rate if codec else 0)
+
+    return await _post(client, backend_url, content, headers, sensor_type, f"사용자: {username}")
+
+
+# 여러 사용자의 데이터를 요청 하나로 묶어 보내는 함수 (SENSOR_URL_MAPPING 의 batch 가 True 인 센서, upload_coalescer.py 에서 호출)
+async def send_batch_to_data_backend(sensor_type, records, client=None):
+    """
+    같은 센서의 레코드 여러 개를 요청 하나로 전송.
+
+    :param sensor_type: 센서 종류
+    :param records: [(device_id, username, data), ...]
+    :param client: 공유 httpx.AsyncClient
+    :return: send_to_data_backend 와 같음 (배치 전체에 대해 한 번)
+    """
+    payloads = []
+    for device_id, username, data in records:
+        payload = build_payload(device_id, username, sensor_type, data)
+        if payload is not None:
+            payloads.append(payload)
+    if not payloads:
+        return True
+
+    target = SENSOR_URL_MAPPING.get(sensor_type)
+    if not target:
+        logger.error("센서 종류 '%s'에 해당하는 URL이 없습니다.", sensor_type)
+        return True
 
+    codec = SENSOR_CODECS.get(sensor_type)
+    content, headers = encode_batch_payload(payloads, target.get("format", "json"), sensor_type,
+                                            codec.sample_rate if codec else 0)
+    UPLOAD_BATCH_RECORDS.labels(sensor_type).observe(len(payloads))
+    return await _post(client, target["url"], content, headers, sensor_type, f"레코드 {len(payloads)}개")
@@ -0,0 +1,262 @@
+# 패킷을 한 번에 해석하기 위한 struct 모듈
+import struct
+# - struct: 바이트 배열을 C 구조체처럼 미리 정의된 형식으로 해석하는 표준 라이브러리.
+#   목적: 4바이트씩 파이썬 루프를 돌던 파싱을 미리 컴파일된 Struct 한 번의 호출로 처리하기 위함.
+
+from itertools import chain
+# - chain: 여러 패킷의 필드를 복사 없이 하나의 스트림으로 이어 붙임.
+#   목적: 배치 디코딩에서 패킷 경계와 상관없이 샘플을 한 번에 계산하기 위함.
+
+# 센서별 신호 처리 (데시메이션 / 필터)
+from signal_processing import build_processing
+# - build_processing: SENSOR_CONFIGS 의 "processing" 설정을 코덱에 붙일 ProcessingSpec 으로 변환
+
+# 설정 값 가져오기
+from config import (
+    SIGNAL_TARGET_RATE, SIGNAL_FIR_TAPS, ECG_NOTCH_HZ, ECG_NOTCH_Q, ECG_BASELINE_HZ, WAVEFORM_SAMPLE_RATE,
+    sample_rate_for,
+)
+
+
+# 패킷 공통 상수
+# 패킷 형식: SOP(1) + CMD(1) + data_size(1) + 데이터(data_size) + 예약(2) + EOP(1)
+SOP = 0xF7
+EOP = 0xFA
+
+# 비정형(파형) 패킷: 86바이트 한 패킷 안에 4바이트 단위 샘플 20개
+WAVEFORM_PACKET_LENGTH = 86
+WAVEFORM_SAMPLES_PER_PACKET = 20
+
+# ECG / EMG / EOG / GSR: [byte1][byte2][fixed_value(2바이트, big endian)] x 20
+# 앞의 3바이트(SOP, CMD, data_size)와 뒤의 3바이트(남는 2바이트, EOP)는 건너뜀.
+_WAVEFORM_STRUCT = struct.Struct(">3x" + "BBH" * WAVEFORM_SAMPLES_PER_PACKET + "3x")
+
+# AIRFLOW: [byte1(2바이트, big endian)][byte2(2바이트, big endian)] x 20
+_AIRFLOW_STRUCT = struct.Struct(">3x" + "HH" * WAVEFORM_SAMPLES_PER_PACKET + "3x")
+
+# 배치 디코딩용: 헤더(SOP, CMD)와 EOP까지 함께 꺼내서 iter_unpack 한 번으로 검증 + 디코딩
+_WAVEFORM_FRAME_STRUCT = struct.Struct(">BBx" + "BBH" * WAVEFORM_SAMPLES_PER_PACKET + "2xB")
+_AIRFLOW_FRAME_STRUCT = struct.Struct(">BBx" + "HH" * WAVEFORM_SAMPLES_PER_PACKET + "2xB")
+
+# AIRFLOW에서 측정 불가를 의미하는 값(0xFFFF)과 치환값
+AIRFLOW_INVALID_VALUE = 0xFFFF
+AIRFLOW_INVALID_SUBSTITUTE = -1
+
+
+def decode_waveform(packet):
+    """
+    ECG / EMG / EOG / GSR 86바이트 패킷 한 개를 샘플 리스트로 변환.
+    헤더 검증은 호출하는 쪽(packet_framer.PacketFramer / SensorSession)에서 끝났다고 가정함.
+
+    :param packet: 86바이트 패킷 (bytes, bytearray, memoryview)
+    :return: byte1 + byte2 + fixed_value 로 계산된 샘플 20개
+    """
+    fields = iter(_WAVEFORM_STRUCT.unpack_from(packet))
+    return [byte1 + byte2 + fixed_value for byte1, byte2, fixed_value in zip(fields, fields, fields)]
+
+
+def decode_airflow(packet):
+    """
+    AIRFLOW 86바이트 패킷 한 개를 샘플 리스트로 변환.
+    합이 0xFFFF 인 샘플을 만나면 -1 로 치환하고 그 뒤의 샘플은 버림(기존 파싱 규칙 유지).
+
+    :param packet: 86바이트 패킷 (bytes, bytearray, memoryview)
+    :return: byte1 + byte2 로 계산된 샘플 리스트
+    """
+    fields = iter(_AIRFLOW_STRUCT.unpack_from(packet))
+    return _cut_airflow([byte1 + byte2 for byte1, byte2 in zip(fields, fields)])
+
+
+def _cut_airflow(values):
+    """AIRFLOW 샘플 중 0xFFFF 가 처음 나온 위치에서 -1 로 치환하고 뒤를 버림."""
+    try:
+        cut = values.index(AIRFLOW_INVALID_VALUE)
+    except ValueError:
+        return values
+    del values[cut:]
+    values.append(AIRFLOW_INVALID_SUBSTITUTE)
+    return values
+
+
+def decode_waveform_batch(packets, cmd=None, airflow=False):
+    """
+    여러 개의 86바이트 패킷을 한 번에 디코딩하여 하나의 샘플 리스트로 합침.
+    SOP / CMD / EOP 가 맞지 않는 패킷은 건너뜀.
+
+    :param packets: 패킷들을 이어붙인 bytes류 객체(길이가 86의 배수), 또는 패킷들의 리스트
+    :param cmd: 기대하는 cmd 값 (None이면 cmd 검증 생략)
+    :param airflow: True면 AIRFLOW 규칙으로 디코딩
+    :return: 모든 패킷의 샘플을 순서대로 이어붙인 리스트
+    """
+    if isinstance(packets, (bytes, bytearray, memoryview)):
+        if len(packets) % WAVEFORM_PACKET_LENGTH:
+            raise ValueError(f"패킷 묶음 길이({len(packets)})가 {WAVEFORM_PACKET_LENGTH}의 배수가 아닙니다.")
+        frames = (_AIRFLOW_FRAME_STRUCT if airflow else _WAVEFORM_FRAME_STRUCT).iter_unpack(packets)
+    else:
+        frame_struct = _AIRFLOW_FRAME_STRUCT if airflow else _WAVEFORM_FRAME_STRUCT
+        frames = (frame_struct.unpack(p) for p in packets if len(p) == WAVEFORM_PACKET_LENGTH)
+
+    # 검증을 통과한 패킷의 필드만 하나의 스트림으로 이어서, 컴프리헨션 한 번으로 전체 샘플을 계산
+    valid = [frame[2:-1] for frame in frames
+             if frame[0] == SOP and frame[-1] == EOP and (cmd is None or frame[1] == cmd)]
+    if airflow:
+        values = []
+        for fields in valid:
+            it = iter(fields)
+            values += _cut_airflow([byte1 + byte2 for byte1, byte2 in zip(it, it)])
+        return values
+    fields = iter(chain.from_iterable(valid))
+    return [byte1 + byte2 + fixed_value for byte1, byte2, fixed_value in zip(fields, fields, fields)]
+
+
+def decode_airflow_batch(packets, cmd=None):
+    """AIRFLOW 패킷 여러 개를 한 번에 디코딩 (decode_waveform_batch 의 AIRFLOW 규칙)"""
+    return decode_waveform_batch(packets, cmd, airflow=True)
+
+
+# 10바이트(정형) 패킷 디코더
+def decode_spo2(packet):
+    """SPO2: byte[5] → 산소포화도 단일값"""
+    return [packet[5]]
+
+
+def decode_nibp(packet):
+    """NIBP: byte[4] 이완기, byte[5] 수축기 → [수축기, 이완기]"""
+    diastolic = packet[4]
+    systolic = packet[5]
+    return [systolic, diastolic]
+
+
+def decode_temp(packet):
+    """TEMP: byte[3:5] + byte[5:7] → (high + low) / 100.0 + 5"""
+    high_byte = int.from_bytes(packet[3:5], byteorder="big")
+    low_byte = int.from_bytes(packet[5:7], byteorder="big")
+    return [((high_byte + low_byte) / 100.0) + 5]
+
+
+# 센서별 설정 정의
+# cmd: 센서 타입에 따른 명령어 값
+# data_size: 데이터 크기 (바이트 단위)
+# queue_size: 사용자별 큐 크기
+# sample_rate: 샘플레이트(Hz), 파형 센서만 해당 (WAVEFORM_SAMPLE_RATE, 센서별로는 SAMPLE_RATE_<SENSOR>), 나머지는 0
+# processing: 파싱 후 큐에 넣기 전의 신호 처리 (signal_processing.py, 켜진 항목이 없으면 처리하지 않음)
+#   target_rate: 데시메이션 후 샘플레이트 / num_taps: 안티에일리어싱 FIR 탭 수
+#   notch / notch_q: 전원 잡음 노치 필터 / baseline: 기저선 제거 고역통과 차단 주파수
+#   AIRFLOW는 측정 불가 표시(-1)가 필터에 섞이지 않도록 처리하지 않음
+_WAVEFORM_PROCESSING = {"target_rate": SIGNAL_TARGET_RATE, "num_taps": SIGNAL_FIR_TAPS}
+SENSOR_CONFIGS = {
+    'ecg': {"cmd": 0x12, "data_size": 0x50, "queue_size": 15000, "sample_rate": WAVEFORM_SAMPLE_RATE,
+            "processing": dict(_WAVEFORM_PROCESSING, notch=ECG_NOTCH_HZ, notch_q=ECG_NOTCH_Q, baseline=ECG_BASELINE_HZ)},
+    'emg': {"cmd": 0x22, "data_size": 0x50, "queue_size": 15000, "sample_rate": WAVEFORM_SAMPLE_RATE,
+            "processing": _WAVEFORM_PROCESSING},
+    'eog': {"cmd": 0x32, "data_size": 0x50, "queue_size": 15000, "sample_rate": WAVEFORM_SAMPLE_RATE,
+            "processing": _WAVEFORM_PROCESSING},
+    'gsr': {"cmd": 0x82, "data_size": 0x50, "queue_size": 15000, "sample_rate": WAVEFORM_SAMPLE_RATE,
+            "processing": _WAVEFORM_PROCESSING},
+    'airflow': {"cmd": 0x62, "data_size": 0x50, "queue_size": 15000, "sample_rate": WAVEFORM_SAMPLE_RATE},
+    'temp': {"cmd": 0xa2, "data_size": 0x04, "queue_size": 60, "sample_rate": 0},
+    'nibp': {"cmd": 0x42, "data_size": 0x04, "queue_size": 2, "sample_rate": 0},
+    'spo2': {"cmd": 0x52, "data_size": 0x04, "queue_size": 10, "sample_rate": 0},
+}
+
+# 센서별 디코더와 출력 타입 (TEMP만 실수, 나머지는 정수)
+# 배치 디코더는 메시지 하나에 같은 센서의 86바이트 패킷이 여러 개 담겨 올 때 한 번에 디코딩하기 위함 (정형 센서는 없음)
+SENSOR_DECODERS = {
+    'ecg': (decode_waveform, int),
+    'emg': (decode_waveform, int),
+    'eog': (decode_waveform, int),
+    'gsr': (decode_waveform, int),
+    'airflow': (decode_airflow, int),
+    'temp': (decode_temp, float),
+    'nibp': (decode_nibp, int),
+    'spo2': (decode_spo2, int),
+}
+SENSOR_BATCH_DECODERS = {
+    'ecg': decode_waveform_batch,
+    'emg': decode_waveform_batch,
+    'eog': decode_waveform_batch,
+    'gsr': decode_waveform_batch,
+    'airflow': decode_airflow_batch,
+}
+
+
+class SensorCodec:
+    """
+    센서 한 종류의 패킷 규칙(헤더, 길이, 디코더, 출력 타입)을 묶은 객체.
+    모듈 import 시점에 한 번만 만들어지고, 패킷마다 cmd 값으로 바로 찾아 씀.
+    """
+
+    __slots__ = ("sensor_type", "cmd", "data_size", "packet_length", "queue_size", "decode", "output_type",
+                 "sample_rate", "processing", "decode_batch")
+
+    def __init__(self, sensor_type, cmd, data_size, queue_size, decode, output_type=int, sample_rate=0,
+                 processing=None, decode_batch=None):
+        """
+        :param sensor_type: 센서 유형 (예: ecg, emg 등)
+        :param cmd: 패킷의 byte[1]에 들어오는 명령어 값
+        :param data_size: 패킷의 byte[2]에 들어오는 데이터 크기
+        :param queue_size: 사용자별 큐 크기
+        :param decode: 패킷(bytes류)을 받아 값 리스트를 돌려주는 함수
+        :param output_type: 디코딩된 값의 타입 (int 또는 float)
+        :param sample_rate: 샘플레이트(Hz), 모르면 0
+        :param processing: signal_processing.ProcessingSpec (없으면 파싱한 값을 그대로 저장)
+        :param decode_batch: 패킷 리스트를 받아 모든 샘플을 이어 붙인 리스트를 돌려주는 함수 (없으면 패킷마다 decode)
+        """
+        self.sensor_type = sensor_type
+        self.cmd = cmd
+        self.data_size = data_size
+        # SOP + CMD + data_size + 데이터 + 예약(2) + EOP
+        self.packet_length = data_size + 6
+        self.queue_size = queue_size
+        self.decode = decode
+        self.output_type = output_type
+        self.sample_rate = sample_rate
+        self.processing = processing
+        self.decode_batch = decode_batch
+        if processing is not None and processing.factor > 1:
+            # 큐에는 데시메이션된 샘플이 쌓이므로, 큐 크기와 샘플레이트(업로드 헤더)도 같은 비율로 맞춤
+            self.queue_size = max(1, queue_size // processing.factor)
+            self.sample_rate = processing.output_rate
+
+    def check_header(self, packet):
+        """SOP / CMD / EOP 가 모두 이 센서의 값과 맞는지 확인"""
+        return packet[0] == SOP and packet[1] == self.cmd and packet[-1] == EOP
+
+    def __repr__(self):
+        return f"SensorCodec({self.sensor_type!r}, cmd=0x{self.cmd:02x}, packet_length={self.packet_length})"
+
+
+# 코덱 레지스트리
+# - CODECS_BY_CMD: 패킷의 cmd 값 → 코덱 (패킷마다 dict 조회 한 번으로 분기)
+# - SENSOR_CODECS: 센서 유형 → 코덱 (라우트 등록, 연결 시점의 설정 조회)
+CODECS_BY_CMD = {}
+SENSOR_CODECS = {}
+
+
+def register_codec(codec):
+    """
+    코덱을 레지스트리에 등록. 새 센서는 여기에 코덱을 등록하는 것만으로
+    파싱, WebSocket 처리, 라우트 등록에 모두 반영됨.
+
+    :param codec: 등록할 SensorCodec
+    :return: 등록된 코덱
+    """
+    if codec.cmd in CODECS_BY_CMD and CODECS_BY_CMD[codec.cmd].sensor_type != codec.sensor_type:
+        raise ValueError(f"cmd 0x{codec.cmd:02x} 는 이미 '{CODECS_BY_CMD[codec.cmd].sensor_type}'에 등록되어 있습니다.")
+    CODECS_BY_CMD[codec.cmd] = codec
+    SENSOR_CODECS[codec.sensor_type] = codec
+    SENSOR_CONFIGS.setdefault(codec.sensor_type, {
+        "cmd": codec.cmd, "data_size": codec.data_size, "queue_size": codec.queue_size,
+        "sample_rate": codec.sample_rate,
+    })
+    return codec
+
+
+for _sensor_type, _config in SENSOR_CONFIGS.items():
+    _decode, _output_type = SENSOR_DECODERS[_sensor_type]
+    _config["sample_rate"] = sample_rate_for(_sensor_type, _config.get("sample_rate", 0))
+    register_codec(SensorCodec(_sensor_type, _config["cmd"], _config["data_size"], _config["queue_size"],
+                               _decode, _output_type, _config.get("sample_rate", 0),
+                               build_processing(_sensor_type, _config.get("sample_rate", 0),
+                                                _config.get("processing")),
+                               SENSOR_BATCH_DECODERS.get(_sensor_type)))
@@ -0,0 +1,212 @@
+# 장비 WebSocket 연결 하나의 수신 상태
+from array import array
+# - array: 메시지 하나에서 나온 샘플을 파이썬 int 객체 대신 C 배열에 담아 세션 동안 재사용하기 위함.
+
+from time import perf_counter
+# - perf_counter: 패킷 파싱 시간 측정
+
+# 사용자 정의 로깅 설정 가져오기
+from logger import get_logger
+
+# 수신 메시지를 패킷 단위로 나누는 프레이머
+from packet_framer import PacketFramer
+
+# 파형 패킷 하나의 샘플 수 (배치 디코딩 중에 큐가 찰 수 있는지 판단)
+from sensor_codec import WAVEFORM_SAMPLES_PER_PACKET
+
+# 큐 백엔드와 같은 배열 타입 코드 (int → 'i', float → 'd')
+from redis_queue import PACKED_TYPECODES
+
+# 지표 (연결 시점에 센서 라벨을 한 번만 바인딩)
+from metrics import (
+    PACKETS_RECEIVED, PACKETS_PARSED, PACKETS_REJECTED, PARSE_SECONDS, PACKETS_PER_MESSAGE, FRAMER_DISCARDED,
+    PACKETS_RATE_LIMITED,
+)
+
+# 설정 값 가져오기
+from config import LOG_SUMMARY_EVERY
+
+
+logger = get_logger("sensor_logger")
+
+
+class SensorSession:
+    """
+    장비 연결 하나(사용자:센서)의 수신 상태. 연결될 때 한 번 만들어서 연결이 끊길 때까지 씀.
+    코덱, 큐 키, 지표 객체를 미리 찾아두고, 메시지에서 나온 샘플은 세션이 가진 배열 하나에 다시 담으므로
+    패킷마다 설정 조회나 키 문자열 생성, 리스트 합치기가 일어나지 않음.
+    동시 연결이 수천 개일 때 연결당 메모리를 줄이기 위해 __slots__ 를 씀.
+    """
+
+    __slots__ = (
+        "sensor_type", "username", "device_id", "key", "codec", "mode", "queue_size", "window", "overlap",
+        "framer", "processor", "samples", "limiter",
+        "received_messages", "received_packets", "stored_samples", "rejected_packets", "rate_limited_packets",
+        "_next_summary",
+        "_received", "_parsed", "_bad_cmd", "_errors", "_parse_seconds", "_packets_per_message", "_discarded",
+        "_rate_limited",
+    )
+
+    def __init__(self, codec, username, mode="batch", window=None, overlap=0):
+        """
+        :param codec: sensor_codec.SensorCodec (연결 시점에 찾아 둔 센서 코덱)
+        :param username: 사용자 이름 (큐 키에 씀)
+        :param mode: 전송 방식 (batch / stream)
+        :param window: 스트리밍 모드의 윈도우 크기 (배치 모드는 None, 큐 크기를 씀)
+        :param overlap: 스트리밍 모드에서 다음 윈도우로 넘길 샘플 수
+        """
+        self.sensor_type = codec.sensor_type
+        self.username = username
+        self.device_id = None
+        self.key = f"{username}:{codec.sensor_type}"
+        self.codec = codec
+        self.mode = mode
+        self.queue_size = window if mode == "stream" else codec.queue_size
+        self.window = window
+        self.overlap = overlap
+
+        # 메시지 경계와 패킷 경계를 분리 (메시지 끝에 걸친 패킷은 다음 메시지와 이어 붙임)
+        self.framer = PacketFramer()
+        # 신호 처리(데시메이션 / 필터)가 설정된 센서는 세션마다 필터 상태를 따로 가짐 (패킷 경계를 넘어 연속으로 처리)
+        self.processor = codec.processing.new_session(codec.output_type) if codec.processing is not None else None
+        # 메시지 하나에서 나온 샘플 (feed 할 때마다 비우고 다시 채움)
+        self.samples = array(PACKED_TYPECODES[codec.output_type])
+        # 연결별 패킷 속도 제한 (admission.TokenBucket, 수신 제한을 통과한 뒤 정해짐, None 이면 제한 없음)
+        # 제한을 넘은 패킷은 파싱하지 않고 버림 (장비 하나가 파서와 큐를 독차지하지 않도록)
+        self.limiter = None
+
+        # 세션 수신 요약용 카운터
+        self.received_messages = 0
+        self.received_packets = 0
+        self.stored_samples = 0
+        self.rejected_packets = 0
+        self.rate_limited_packets = 0
+        self._next_summary = LOG_SUMMARY_EVERY if LOG_SUMMARY_EVERY > 0 else -1
+
+        sensor_type = codec.sensor_type
+        self._received = PACKETS_RECEIVED.labels(sensor_type)
+        self._parsed = PACKETS_PARSED.labels(sensor_type)
+        self._bad_cmd = PACKETS_REJECTED.labels(sensor_type, "bad_cmd")
+        self._errors = PACKETS_REJECTED.labels(sensor_type, "error")
+        self._parse_seconds = PARSE_SECONDS.labels(sensor_type)
+        self._packets_per_message = PACKETS_PER_MESSAGE.labels(sensor_type)
+        self._discarded = FRAMER_DISCARDED.labels(sensor_type)
+        self._rate_limited = PACKETS_RATE_LIMITED.labels(sensor_type)
+
+    def feed(self, data, room=None):
+        """
+        수신 메시지 하나를 패킷으로 나눠 파싱 / 신호 처리까지 하고, 큐에 넣을 샘플을 돌려줌.
+
+        :param data: WebSocket 메시지 (bytes)
+        :param room: 큐에 더 넣을 수 있는 샘플 수 (배치 모드). 이만큼 모이면 메시지의 나머지 패킷은 처리하지 않음
+                     (큐가 차면 연결을 끊으므로, 기존처럼 연결 종료 뒤에 온 패킷으로 봄)
+        :return: 샘플 배열 (세션이 재사용하는 버퍼이므로 다음 feed 전까지만 유효함)
+        """
+        self.received_messages += 1
+        framer = self.framer
+        discarded = framer.discarded
+        packets = framer.feed(data)
+        if framer.discarded != discarded:
+            self._discarded.inc(framer.discarded - discarded)
+            for reason in framer.rejections:
+                self._reject_frame(reason)
+        self._packets_per_message.observe(len(packets))
+        if self.limiter is not None and packets:
+            allowed = self.limiter.take(len(packets))
+            if allowed < len(packets):
+                self._drop_rate_limited(len(packets) - allowed)
+                del packets[allowed:]
+
+        samples = self.samples
+        del samples[:]
+        codec = self.codec
+        # 같은 센서의 파형 패킷이 여러 개면 배치 디코더로 한 번에 디코딩.
+        # 배치 모드에서 메시지 중간에 큐가 찰 수 있거나 cmd 가 다른 패킷이 섞여 있으면 패킷 단위로 처리함
+        # (찬 위치에서 멈추고 거부 사유를 패킷마다 세기 위함)
+        if (len(packets) > 1 and codec.decode_batch is not None
+                and (room is None or len(packets) * WAVEFORM_SAMPLES_PER_PACKET <= room)
+                and all(packet[1] == codec.cmd for packet in packets)):
+            self._feed_batch(packets, samples)
+            return samples
+
+        processor = self.processor
+        for packet in packets:
+            self._received.inc()
+            started = perf_counter()
+            values = self._decode(packet)
+            self._parse_seconds.observe(perf_counter() - started)
+            if values:
+                self._parsed.inc()
+                # 데시메이션 중에는 패킷 하나에서 나온 샘플이 없을 수도 있음 (다음 패킷과 이어서 처리됨)
+                if processor is not None:
+                    values = processor.process(values)
+                samples.extend(values)
+            else:
+                self.rejected_packets += 1
+            self._count_packets(1)
+
+            if room is not None and len(samples) >= room:
+                break
+        return samples
+
+    def _feed_batch(self, packets, samples):
+        """cmd 가 모두 맞는 파형 패킷들을 배치 디코더로 한 번에 디코딩 / 신호 처리해서 samples 에 담음"""
+        count = len(packets)
+        self._received.inc(count)
+        started = perf_counter()
+        values = self.codec.decode_batch(packets)
+        # 파싱 시간 히스토그램은 패킷 단위이므로 패킷당 평균을 패킷 수만큼 기록
+        per_packet = (perf_counter() - started) / count
+        for _ in range(count):
+            self._parse_seconds.observe(per_packet)
+        self._parsed.inc(count)
+        # 필터 상태는 샘플 단위로 이어지므로 패킷을 이어 붙인 값을 한 번에 처리해도 결과가 같음
+        if self.processor is not None:
+            values = self.processor.process(values)
+        samples.extend(values)
+        self._count_packets(count)
+
+    def _count_packets(self, count):
+        """패킷마다 로그를 남기지 않고, LOG_SUMMARY_EVERY 개마다 한 줄로 요약"""
+        self.received_packets += count
+        if 0 < self._next_summary <= self.received_packets:
+            while self._next_summary <= self.received_packets:
+                self._next_summary += LOG_SUMMARY_EVERY
+            logger.info("[%s] 수신 요약 (사용자: %s): %s", self.sensor_type, self.username, self.describe())
+
+    def _drop_rate_limited(self, count):
+        if not self.rate_limited_packets:
+            logger.warning("[%s] 패킷 속도 제한을 넘어서 패킷을 버립니다 (사용자: %s, 초당 %s개).",
+                           self.sensor_type, self.username, self.limiter.rate)
+        self.rate_limited_packets += count
+        self._rate_limited.inc(count)
+
+    def _reject_frame(self, reason):
+        """프레이머가 패킷 경계를 놓쳤을 때 (사유: sop_eop / bad_cmd / bad_length, 드물게 일어나므로 라벨은 그때 찾음)"""
+        self.rejected_packets += 1
+        PACKETS_REJECTED.labels(self.sensor_type, reason).inc()
+        logger.warning("[%s] 잘못된 패킷 (%s), 다음 패킷 시작을 다시 찾습니다 (사용자: %s).",
+                       self.sensor_type, reason, self.username)
+
+    def _decode(self, packet):
+        """
+        프레이머가 SOP / data_size / 길이 / EOP 를 이미 확인했으므로 cmd 만 이 세션의 센서와 맞는지 보고 디코딩.
+        프레이머에서 걸러진 패킷은 _reject_frame 에서, 여기서 걸러진 패킷은 bad_cmd / error 로 셈.
+        """
+        codec = self.codec
+        if packet[1] != codec.cmd:
+            self._bad_cmd.inc()
+            logger.warning("[%s] 잘못된 cmd 값 수신: %s (예상 cmd: %s)", self.sensor_type, packet[1], codec.cmd)
+            return None
+        try:
+            return codec.decode(packet)
+        except Exception as e:
+            self._errors.inc()
+            logger.error("[%s] 데이터 파싱 중 오류 발생: %s", self.sensor_type, e)
+            return None
+
+    def describe(self):
+        """수신 요약 (로그용)"""
+        return (f"메시지 {self.received_messages}개, 패킷 {self.received_packets}개, 저장된 데이터 {self.stored_samples}개, "
+                f"거부된 패킷 {self.rejected_packets}개, 속도 제한으로 버린 패킷 {self.rate_limited_packets}개, "
+                f"버린 바이트 {self.framer.discarded + self.framer.pending}개")
@@ -0,0 +1,92 @@
+# 서버 실행 스크립트 (단일 / 여러 워커 프로세스)
+import argparse
+# - argparse: 명령줄에서 주소 / 포트 / 워커 수를 바꿀 수 있도록 하기 위함.
+
+import importlib.util
+# - importlib.util: uvloop / httptools / gunicorn 이 설치되어 있는지 import 하지 않고 확인하기 위함.
+
+import os
+# - os: gunicorn 으로 실행할 때 현재 프로세스를 gunicorn 으로 바꾸기(execvp) 위함.
+
+import sys
+
+# FastAPI 애플리케이션 실행을 위한 ASGI 서버 구현체
+import uvicorn
+
+# 사용자 정의 로깅 설정 가져오기
+from logger import get_logger, stop_logging
+
+# 설정 값 가져오기
+from config import SERVER_HOST, SERVER_PORT, WEB_CONCURRENCY, QUEUE_BACKEND, PUBSUB_BACKEND, LOG_LEVEL
+
+
+logger = get_logger("serve")
+
+# 여러 워커일 때 앱은 워커 프로세스마다 새로 import 해야 하므로 import 문자열로 넘김
+APP = "main:app"
+
+
+def _installed(module):
+    return importlib.util.find_spec(module) is not None
+
+
+def check_multi_worker(workers):
+    """
+    여러 워커로 띄울 수 있는 설정인지 확인.
+    memory 큐 백엔드는 세션 큐가 워커 프로세스 안에만 있어서, 조회 API가 다른 워커로 가면 데이터를 찾지 못함.
+
+    :param workers: 워커 프로세스 수
+    :return: 문제가 없으면 None, 있으면 오류 메시지
+    """
+    if workers <= 1:
+        return None
+    if QUEUE_BACKEND == "memory":
+        return "QUEUE_BACKEND=memory 는 단일 프로세스 전용입니다. 여러 워커로 실행하려면 QUEUE_BACKEND=redis 를 사용하세요."
+    if PUBSUB_BACKEND == "memory":
+        logger.warning("PUBSUB_BACKEND=memory: 실시간 구독자는 같은 워커에 붙은 장비의 데이터만 받습니다. "
+                       "여러 워커에서는 PUBSUB_BACKEND=redis 를 권장합니다.")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Healthcare DAQ FastAPI 서버 실행")
+    parser.add_argument("--host", default=SERVER_HOST, help="바인딩 주소")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="포트")
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY, help="워커 프로세스 수 (WEB_CONCURRENCY)")
+    parser.add_argument("--gunicorn", action="store_true",
+                        help="gunicorn + UvicornWorker 로 실행 (gunicorn 설치 필요, 워커가 죽으면 다시 띄움)")
+    args = parser.parse_args()
+
+    error = check_multi_worker(args.workers)
+    if error:
+        logger.error(error)
+        sys.exit(2)
+
+    # 설치되어 있으면 uvloop 이벤트 루프와 httptools HTTP 파서를 사용 (requirements.txt 에 고정되어 있음)
+    loop = "uvloop" if _installed("uvloop") else "asyncio"
+    http = "httptools" if _installed("httptools") else "h11"
+    logger.info("서버 시작: %s:%s, 워커 %s개 (loop=%s, http=%s)", args.host, args.port, args.workers, loop, http)
+
+    if args.gunicorn:
+        if not _installed("gunicorn"):
+            logger.error("gunicorn 이 설치되어 있지 않습니다. (pip install gunicorn)")
+            sys.exit(2)
+        stop_logging()  # exec 전에 남은 로그 출력
+        # UvicornWorker 는 uvloop / httptools 가 있으면 자동으로 사용함
+        # WebSocket 세션이 길게 유지되므로 요청 타임아웃(--timeout)은 워커 응답 확인용으로만 쓰고, 종료 시 세션 정리 시간을 줌
+        os.execvp("gunicorn", [
+            "gunicorn", APP,
+            "--worker-class", "uvicorn.workers.UvicornWorker",
+            "--workers", str(args.workers),
+            "--bind", f"{args.host}:{args.port}",
+            "--graceful-timeout", "30",
+        ])
+
+    # uvicorn 이 소켓을 한 번 열고 워커 프로세스들이 같이 accept 함
+    uvicorn.run(APP, host=args.host, port=args.port, workers=args.workers, loop=loop, http=http,
+                ws="websockets", log_level=LOG_LEVEL.lower())
+    stop_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+# 파싱과 큐 저장 사이의 신호 처리 단계 (데시메이션, ECG 필터, delta/varint 인코딩)
+import math
+# - math: FIR 필터 계수(windowed-sinc)와 노치 / 고역통과 필터 계수를 계산하기 위함.
+
+from operator import mul
+# - mul: FIR 출력 하나를 sum(map(mul, 계수, 샘플)) 로 C 루프 안에서 계산하기 위함.
+#   목적: 샘플마다 파이썬 for 루프를 도는 대신 내장 함수 조합으로 곱셈-누산을 처리하기 위함.
+
+
+# 기본 FIR 탭 수 (홀수, 군지연 = (탭 수 - 1) / 2 샘플)
+DEFAULT_FIR_TAPS = 31
+# 안티에일리어싱 필터의 차단 주파수 = 새 나이퀴스트 주파수 × 이 비율 (천이 대역을 두기 위함)
+ANTI_ALIAS_RATIO = 0.8
+
+
+def design_lowpass(num_taps, cutoff):
+    """
+    windowed-sinc(Hamming 창) 저역통과 FIR 계수 설계. 직류 이득이 1이 되도록 정규화함.
+
+    :param num_taps: 탭 수 (홀수 권장)
+    :param cutoff: 차단 주파수 (샘플레이트에 대한 비율, 0 < cutoff < 0.5)
+    :return: 계수 리스트
+    """
+    center = (num_taps - 1) / 2
+    taps = []
+    for n in range(num_taps):
+        x = n - center
+        sinc = 2 * cutoff if x == 0 else math.sin(2 * math.pi * cutoff * x) / (math.pi * x)
+        window = 0.54 - 0.46 * math.cos(2 * math.pi * n / (num_taps - 1)) if num_taps > 1 else 1.0
+        taps.append(sinc * window)
+    total = sum(taps)
+    return [tap / total for tap in taps]
+
+
+class Decimator:
+    """
+    안티에일리어싱 FIR 필터 + 1/factor 데시메이션 (polyphase 방식: 남길 출력만 계산).
+    직전 패킷의 마지막 (탭 수 - 1)개 샘플과 다음 출력 위치를 상태로 들고 있으므로,
+    패킷 단위로 나눠 넣어도 전체를 한 번에 처리한 결과와 같음.
+    numpy 없이 출력 하나를 sum(map(mul, ...)) 한 번(C 루프)으로 계산함. 탭마다 출력 전체를 누산하는 방식
+    (탭 수만큼 map 을 두 번씩 돎)이나 대칭 계수를 접는 방식은 패킷(40샘플) 단위에서 오히려 느려서 쓰지 않음.
+    """
+
+    __slots__ = ("factor", "taps", "_history", "_phase")
+
+    def __init__(self, factor, num_taps=DEFAULT_FIR_TAPS):
+        """
+        :param factor: 데시메이션 비율 (2면 500Hz → 250Hz)
+        :param num_taps: FIR 탭 수
+        """
+        self.factor = factor
+        # sum(map(mul, ...)) 에 샘플 순서 그대로 넣을 수 있도록 뒤집어서 저장
+        self.taps = design_lowpass(num_taps, ANTI_ALIAS_RATIO * 0.5 / factor)[::-1]
+        self._history = None  # 첫 패킷에서 첫 샘플 값으로 채움
+        self._phase = 0  # 다음 출력이 나올 위치 (이번 입력 기준)
+
+    def process(self, values):
+        """
+        :param values: 입력 샘플 리스트
+        :return: 필터링 후 factor 개마다 하나씩 남긴 샘플 리스트 (실수)
+        """
+        taps = self.taps
+        width = len(taps)
+        history = width - 1
+        if self._history is None:
+            if not values:
+                return []
+            # 시작 전도 첫 샘플 값이 이어졌다고 보고 시작 (0에서 출발하는 과도 응답 방지, 노치 / 기저선 필터와 같음)
+            self._history = [float(values[0])] * history
+        buffer = self._history + values
+        # 입력 j 번째 샘플의 출력은 buffer[j : j + width] (history 만큼 앞의 샘플 포함)
+        out = [sum(map(mul, taps, buffer[j:j + width]))
+               for j in range(self._phase, len(values), self.factor)]
+        self._phase = (self._phase - len(values)) % self.factor
+        self._history = buffer[-history:] if history else []
+        return out
+
+
+class NotchFilter:
+    """
+    전원 잡음(50/60Hz) 제거용 2차 IIR 노치 필터 (RBJ biquad, direct form I).
+    이전 입력 / 출력 두 개씩을 상태로 들고 있어 패킷 경계와 상관없이 연속으로 처리됨.
+    """
+
+    __slots__ = ("b0", "b1", "b2", "a1", "a2", "x1", "x2", "y1", "y2")
+
+    def __init__(self, frequency, sample_rate, quality=30.0):
+        """
+        :param frequency: 제거할 주파수(Hz)
+        :param sample_rate: 샘플레이트(Hz)
+        :param quality: Q 값 (클수록 좁은 대역만 제거)
+        """
+        w0 = 2 * math.pi * frequency / sample_rate
+        alpha = math.sin(w0) / (2 * quality)
+        a0 = 1 + alpha
+        self.b0 = 1 / a0
+        self.b1 = -2 * math.cos(w0) / a0
+        self.b2 = 1 / a0
+        self.a1 = -2 * math.cos(w0) / a0
+        self.a2 = (1 - alpha) / a0
+        self.x1 = self.x2 = self.y1 = self.y2 = None
+
+    def process(self, values):
+        if not values:
+            return []
+        b0, b1, b2, a1, a2 = self.b0, self.b1, self.b2, self.a1, self.a2
+        x1, x2, y1, y2 = self.x1, self.x2, self.y1, self.y2
+        if x1 is None:
+            # 첫 샘플 값으로 정상 상태를 가정해서 시작 시의 큰 과도 응답을 막음 (노치는 직류 이득이 1)
+            x1 = x2 = y1 = y2 = float(values[0])
+        out = []
+        append = out.append
+        for x in values:
+            y = b0 * x + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2
+            x2, x1 = x1, x
+            y2, y1 = y1, y
+            append(y)
+        self.x1, self.x2, self.y1, self.y2 = x1, x2, y1, y2
+        return out
+
+
+class BaselineFilter:
+    """
+    기저선 변동(호흡, 움직임) 제거용 1차 고역통과 필터. 출력은 0 근처를 중심으로 움직임.
+    직전 입력 / 출력을 상태로 들고 있어 패킷 경계와 상관없이 연속으로 처리됨.
+    """
+
+    __slots__ = ("alpha", "x1", "y1")
+
+    def __init__(self, cutoff, sample_rate):
+        """
+        :param cutoff: 차단 주파수(Hz), 보통 0.5Hz
+        :param sample_rate: 샘플레이트(Hz)
+        """
+        rc = 1 / (2 * math.pi * cutoff)
+        self.alpha = rc / (rc + 1 / sample_rate)
+        self.x1 = None
+        self.y1 = 0.0
+
+    def process(self, values):
+        if not values:
+            return []
+        alpha = self.alpha
+        x1, y1 = self.x1, self.y1
+        if x1 is None:
+            # 첫 샘플을 기저선으로 보고 시작
+            x1 = values[0]
+        out = []
+        append = out.append
+        for x in values:
+            y1 = alpha * (y1 + x - x1)
+            x1 = x
+            append(y1)
+        self.x1, self.y1 = x1, y1
+        return out
+
+
+class ProcessingSpec:
+    """
+    센서 하나의 처리 설정 (sensor_codec 의 SENSOR_CONFIGS["processing"] 으로 만들어져 코덱에 붙음).
+    세션마다 new_session() 으로 상태를 가진 SignalProcessor 를 만들어 씀.
+    """
+
+    __slots__ = ("sample_rate", "factor", "num_taps", "notch", "notch_q", "baseline")
+
+    def __init__(self, sample_rate, factor=1, num_taps=DEFAULT_FIR_TAPS, notch=0, notch_q=30.0, baseline=0):
+        """
+        :param sample_rate: 입력 샘플레이트(Hz)
+        :param factor: 데시메이션 비율 (1이면 데시메이션 없음)
+        :param num_taps: 안티에일리어싱 FIR 탭 수
+        :param notch: 노치 필터 주파수(Hz), 0이면 사용 안 함
+        :param notch_q: 노치 필터 Q 값
+        :param baseline: 기저선 제거 차단 주파수(Hz), 0이면 사용 안 함
+        """
+        self.sample_rate = sample_rate
+        self.factor = factor
+        self.num_taps = num_taps
+        self.notch = notch
+        self.notch_q = notch_q
+        self.baseline = baseline
+
+    @property
+    def output_rate(self):
+        """처리 후 샘플레이트(Hz)"""
+        return self.sample_rate // self.factor
+
+    def new_session(self, output_type=int):
+        """
+        :param output_type: 큐에 저장할 값의 타입 (int 이면 반올림)
+        :return: 세션 하나의 상태를 가진 SignalProcessor
+        """
+        stages = []
+        if self.baseline:
+            stages.append(BaselineFilter(self.baseline, self.sample_rate))
+        if self.notch:
+            stages.append(NotchFilter(self.notch, self.sample_rate, self.notch_q))
+        if self.factor > 1:
+            stages.append(Decimator(self.factor, self.num_taps))
+        return SignalProcessor(stages, output_type)
+
+    def __repr__(self):
+        return (f"ProcessingSpec({self.sample_rate}Hz → {self.output_rate}Hz, notch={self.notch}, "
+                f"baseline={self.baseline})")
+
+
+def build_processing(sensor_type, sample_rate, config):
+    """
+    SENSOR_CONFIGS 의 "processing" 설정으로 ProcessingSpec 생성.
+
+    :param sensor_type: 센서 종류 (오류 메시지용)
+    :param sample_rate: 센서 샘플레이트(Hz)
+    :param config: {"target_rate", "num_taps", "notch", "notch_q", "baseline"} (없는 키는 사용 안 함)
+    :return: ProcessingSpec, 켜진 처리가 없으면 None
+    """
+    if not config or not sample_rate:
+        return None
+    target_rate = config.get("target_rate") or sample_rate
+    if target_rate > sample_rate or sample_rate % target_rate:
+        raise ValueError(f"{sensor_type}: 목표 샘플레이트 {target_rate}Hz 는 {sample_rate}Hz 를 나누어 떨어지게 해야 합니다.")
+    notch = config.get("notch") or 0
+    if notch and notch * 2 >= sample_rate:
+        raise ValueError(f"{sensor_type}: 노치 주파수 {notch}Hz 가 나이퀴스트 주파수 이상입니다.")
+    spec = ProcessingSpec(sample_rate, sample_rate // target_rate, config.get("num_taps") or DEFAULT_FIR_TAPS,
+                          notch, config.get("notch_q") or 30.0, config.get("baseline") or 0)
+    if spec.factor == 1 and not spec.notch and not spec.baseline:
+        return None
+    return spec
+
+
+class SignalProcessor:
+    """WebSocket 세션 하나의 처리 단계들 (기저선 제거 → 노치 → 데시메이션 순서, 각 단계가 상태를 가짐)"""
+
+    __slots__ = ("stages", "output_type")
+
+    def __init__(self, stages, output_type=int):
+        self.stages = stages
+        self.output_type = output_type
+
+    def process(self, values):
+        """
+        :param values: 파싱된 샘플 리스트 (패킷 하나)
+        :return: 처리된 샘플 리스트 (데시메이션 중이면 비어 있을 수 있음)
+        """
+        for stage in self.stages:
+            values = stage.process(values)
+        if self.output_type is int:
+            return [round(value) for value in values]
+        return values
+
+
+# delta + zigzag + varint 인코딩
+# 이웃한 샘플의 차이는 대부분 작으므로, 차이를 zigzag(음수를 홀수로)로 바꾼 뒤 7비트씩 나눠 담으면
+# 샘플 하나가 보통 1~2바이트가 됨 (int32 배열은 4바이트).
+def encode_delta_varint(values, previous=0):
+    """
+    정수 샘플 리스트를 delta + zigzag + varint 바이트열로 인코딩.
+
+    :param values: 정수 샘플 리스트
+    :param previous: 첫 샘플의 차이를 구할 기준값 (배치마다 따로 풀 수 있도록 보통 0)
+    :return: bytes
+    """
+    out = bytearray()
+    append = out.append
+    for value in values:
+        delta = value - previous
+        previous = value
+        zigzag = delta << 1 if delta >= 0 else ((-delta) << 1) - 1
+        while zigzag >= 0x80:
+            append((zigzag & 0x7F) | 0x80)
+            zigzag >>= 7
+        append(zigzag)
+    return bytes(out)
+
+
+def decode_delta_varint(data, count, offset=0, previous=0):
+    """
+    encode_delta_varint 로 만든 바이트열에서 샘플 count 개를 복원.
+
+    :param data: bytes류 객체
+    :param count: 복원할 샘플 수
+    :param offset: 시작 위치
+    :param previous: 인코딩할 때 쓴 기준값
+    :return: (샘플 리스트, 다음 위치)
+    """
+    values = []
+    append = values.append
+    for _ in range(count):
+        zigzag = 0
+        shift = 0
+        while True:
+            byte = data[offset]
+            offset += 1
+            zigzag |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        previous += (zigzag >> 1) ^ -(zigzag & 1)
+        append(previous)
+    return values, offset
@@ -0,0 +1,5 @@
+# 테스트에서 저장소 루트의 모듈(packet_framer, sensor_session 등)을 바로 import 하기 위함 (benchmarks 와 같은 방식)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,207 @@
+"""
+packet_framer.PacketFramer 와 SensorSession 의 패킷 경계 / 거부 사유 / 배치 디코딩 테스트.
+
+실행: python -m pytest -q tests
+"""
+import struct
+
+import pytest
+
+from metrics import PACKETS_REJECTED
+from packet_framer import PacketFramer
+from sensor_codec import SOP, EOP, SENSOR_CODECS, SensorCodec, WAVEFORM_SAMPLES_PER_PACKET
+from sensor_session import SensorSession
+from signal_processing import ProcessingSpec
+
+ECG = SENSOR_CODECS["ecg"]
+
+_WAVEFORM_PACKET = struct.Struct(">BBB" + "BBH" * WAVEFORM_SAMPLES_PER_PACKET + "BBB")
+_AIRFLOW_PACKET = struct.Struct(">BBB" + "HH" * WAVEFORM_SAMPLES_PER_PACKET + "BBB")
+
+
+def make_packet(codec, seq):
+    """
+    파형 패킷 하나를 만듦. 샘플 값 안에 SOP(0xF7) / EOP(0xFA) 바이트가 섞이도록 채워서,
+    프레이머가 값 안의 0xF7 을 패킷 시작으로 잘못 보지 않는지도 함께 확인함.
+    """
+    if codec.sensor_type == "airflow":
+        fields = []
+        for i in range(WAVEFORM_SAMPLES_PER_PACKET):
+            fields += [(seq * 31 + i * 0x0101) % 0xFFFF, 0xF7FA if i % 5 == 0 else i]
+        return _AIRFLOW_PACKET.pack(SOP, codec.cmd, codec.data_size, *fields, 0, 0, EOP)
+    fields = []
+    for i in range(WAVEFORM_SAMPLES_PER_PACKET):
+        fields += [SOP if i % 4 == 0 else i, (seq + i) % 256, (seq * 97 + i * 0x0F7) % 0x10000]
+    return _WAVEFORM_PACKET.pack(SOP, codec.cmd, codec.data_size, *fields, 0, 0, EOP)
+
+
+def rejected(sensor_type, reason):
+    return PACKETS_REJECTED.labels(sensor_type, reason).value
+
+
+def test_single_packet_is_returned_without_copy():
+    packet = make_packet(ECG, 0)
+    framer = PacketFramer()
+    packets = framer.feed(packet)
+    assert packets == [packet]
+    assert packets[0] is packet
+    assert (framer.discarded, framer.pending, framer.rejections) == (0, 0, [])
+
+
+def test_split_at_every_byte_offset():
+    packets = [make_packet(ECG, seq) for seq in range(3)]
+    stream = b"".join(packets)
+    for cut in range(len(stream) + 1):
+        framer = PacketFramer()
+        result = framer.feed(stream[:cut]) + framer.feed(stream[cut:])
+        assert result == packets, cut
+        assert (framer.discarded, framer.pending, framer.rejections) == (0, 0, []), cut
+
+
+def test_byte_by_byte():
+    packets = [make_packet(ECG, seq) for seq in range(3)]
+    framer = PacketFramer()
+    result = []
+    for byte in b"".join(packets):
+        result += framer.feed(bytes([byte]))
+    assert result == packets
+    assert (framer.discarded, framer.pending) == (0, 0)
+
+
+def test_truncated_tail_is_held_in_pending():
+    first, second = make_packet(ECG, 0), make_packet(ECG, 1)
+    framer = PacketFramer()
+    assert framer.feed(first + second[:50]) == [first]
+    assert framer.pending == 50
+    # 헤더(3바이트)도 다 오지 않은 경우
+    assert framer.feed(second[50:] + second[:2]) == [second]
+    assert framer.pending == 2
+    assert framer.feed(second[2:]) == [second]
+    assert (framer.discarded, framer.pending, framer.rejections) == (0, 0, [])
+
+
+def test_noise_before_sop():
+    packet = make_packet(ECG, 0)
+    framer = PacketFramer()
+    assert framer.feed(b"\x01\x02\x03" + packet) == [packet]
+    assert framer.discarded == 3
+    assert framer.rejections == ["sop_eop"]
+    # 다음 feed 에서는 사유를 비움
+    assert framer.feed(packet) == [packet]
+    assert framer.rejections == []
+
+
+def test_noise_without_sop_is_discarded():
+    framer = PacketFramer()
+    assert framer.feed(b"\x00" * 10) == []
+    assert (framer.discarded, framer.pending, framer.rejections) == (10, 0, ["sop_eop"])
+
+
+def test_bad_data_size():
+    good = make_packet(ECG, 1)
+    bad = bytearray(make_packet(ECG, 0))
+    bad[2] = ECG.data_size - 1
+    framer = PacketFramer()
+    assert framer.feed(bytes(bad) + good) == [good]
+    assert framer.discarded == len(bad)
+    assert framer.rejections == ["bad_length"]
+
+
+def test_unknown_cmd():
+    good = make_packet(ECG, 1)
+    framer = PacketFramer()
+    assert framer.feed(bytes([SOP, 0x99, 0x04, 1, 2, 3, 4, 0, 0, EOP]) + good) == [good]
+    assert framer.discarded == 10
+    assert framer.rejections == ["bad_cmd"]
+
+
+def test_eop_mismatch():
+    good = make_packet(ECG, 1)
+    bad = bytearray(make_packet(ECG, 0))
+    bad[-1] = 0x00
+    framer = PacketFramer()
+    assert framer.feed(bytes(bad) + good) == [good]
+    assert framer.discarded == len(bad)
+    assert framer.rejections == ["sop_eop"]
+
+
+def test_one_rejection_per_loss_of_sync():
+    good = [make_packet(ECG, seq) for seq in range(3)]
+    bad_length = bytearray(make_packet(ECG, 10))
+    bad_length[2] = 0x10
+    bad_eop = bytearray(make_packet(ECG, 11))
+    bad_eop[-1] = 0x00
+    # 깨진 패킷 안의 0xF7 마다 따로 세지 않고, 다시 패킷을 찾을 때까지는 첫 사유만 남김
+    message = b"\x00\x01" + bytes(bad_length) + good[0] + bytes(bad_eop) + b"\x02" + good[1] + good[2]
+    framer = PacketFramer()
+    assert framer.feed(message) == good
+    assert framer.rejections == ["sop_eop", "sop_eop"]
+    assert framer.discarded == 2 + len(bad_length) + len(bad_eop) + 1
+
+
+def test_session_counts_rejections_per_reason():
+    good = [make_packet(ECG, seq) for seq in range(3)]
+    bad_length = bytearray(make_packet(ECG, 10))
+    bad_length[2] = 0x10
+    bad_eop = bytearray(make_packet(ECG, 11))
+    bad_eop[-1] = 0x00
+    bad_cmd = bytes([SOP, 0x99, 0x04, 1, 2, 3, 4, 0, 0, EOP])
+    message = b"\x00" + good[0] + bytes(bad_length) + good[1] + bytes(bad_eop) + bad_cmd + good[2]
+
+    reasons = ("sop_eop", "bad_cmd", "bad_length")
+    before = {reason: rejected("ecg", reason) for reason in reasons}
+    session = SensorSession(ECG, "framer-test")
+    samples = session.feed(message)
+
+    assert len(samples) == 3 * WAVEFORM_SAMPLES_PER_PACKET
+    assert session.framer.rejections == ["sop_eop", "bad_length", "sop_eop"]
+    assert session.rejected_packets == 3
+    assert {reason: rejected("ecg", reason) - before[reason] for reason in reasons} == {
+        "sop_eop": 2, "bad_cmd": 0, "bad_length": 1}
+    assert session.received_packets == 3
+
+
+def test_session_counts_other_sensor_packet_as_bad_cmd():
+    # 프레이머는 등록된 다른 센서의 패킷도 잘라내고, 세션이 cmd 가 맞지 않는 패킷을 bad_cmd 로 셈
+    before = rejected("ecg", "bad_cmd")
+    session = SensorSession(ECG, "framer-test")
+    samples = session.feed(make_packet(ECG, 0) + make_packet(SENSOR_CODECS["emg"], 1) + make_packet(ECG, 2))
+    assert len(samples) == 2 * WAVEFORM_SAMPLES_PER_PACKET
+    assert session.rejected_packets == 1
+    assert rejected("ecg", "bad_cmd") - before == 1
+
+
+PROCESSED_ECG = SensorCodec("ecg", ECG.cmd, ECG.data_size, ECG.queue_size, ECG.decode, ECG.output_type, 250,
+                            ProcessingSpec(250, factor=2, notch=50, baseline=0.5), ECG.decode_batch)
+
+
+@pytest.mark.parametrize("codec", [ECG, SENSOR_CODECS["airflow"], PROCESSED_ECG],
+                         ids=["ecg", "airflow", "ecg-processed"])
+def test_batch_matches_per_packet(codec, monkeypatch):
+    packets = [make_packet(codec, seq) for seq in range(12)]
+
+    batch_calls = []
+    feed_batch = SensorSession._feed_batch
+
+    def spy(self, *args):
+        batch_calls.append(len(args[0]))
+        return feed_batch(self, *args)
+
+    monkeypatch.setattr(SensorSession, "_feed_batch", spy)
+
+    # 메시지 하나에 패킷 여러 개 → _feed_batch, 메시지마다 패킷 하나 → 패킷 단위 경로
+    batched = SensorSession(codec, "framer-test")
+    batch_samples = list(batched.feed(b"".join(packets[:5]))) + list(batched.feed(b"".join(packets[5:])))
+    assert batch_calls == [5, 7]
+
+    single = SensorSession(codec, "framer-test")
+    single_samples = []
+    for packet in packets:
+        single_samples += single.feed(packet)
+    assert batch_calls == [5, 7]
+
+    assert batch_samples == single_samples
+    assert len(batch_samples) == len(packets) * WAVEFORM_SAMPLES_PER_PACKET // (
+        codec.processing.factor if codec.processing is not None else 1)
+    assert batched.received_packets == single.received_packets == len(packets)
+    assert batched.rejected_packets == single.rejected_packets == 0
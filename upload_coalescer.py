@@ -0,0 +1,131 @@
+# 여러 사용자의 업로드를 백엔드 요청 하나로 묶는 모듈
+import asyncio
+# - asyncio: 최대 대기 시간이 지나면 모아둔 레코드를 보내는 타이머 태스크를 위함.
+
+import time
+# - time: 배치가 모이기 시작한 시각을 기록해서 실제로 기다린 시간을 재기 위함.
+
+# 사용자 정의 로깅 설정 가져오기
+from logger import get_logger
+
+# 배치 전송 함수 / 센서별 URL
+from send_to_data_back import send_batch_to_data_backend, SENSOR_URL_MAPPING
+
+# 설정 값 가져오기
+from config import UPLOAD_BATCH_MAX_RECORDS, UPLOAD_BATCH_MAX_LATENCY
+
+
+logger = get_logger("upload_coalescer")
+
+
+class _PendingBatch:
+    """백엔드 URL 하나에 모이고 있는 레코드들"""
+
+    __slots__ = ("sensor_type", "records", "started", "timer")
+
+    def __init__(self, sensor_type):
+        self.sensor_type = sensor_type
+        self.records = []   # [(device_id, username, data), ...]
+        self.started = time.monotonic()
+        self.timer = None   # max_latency 뒤에 전송하는 태스크
+
+
+class UploadCoalescer:
+    """
+    SENSOR_URL_MAPPING 에서 batch 가 True 인 센서의 업로드를 백엔드 URL별로 모아서 요청 하나로 보냄.
+    레코드가 max_records 개가 되거나, 첫 레코드가 들어온 뒤 max_latency 초가 지나면 전송함.
+    NIBP(큐 크기 2) / SPO2 / TEMP 처럼 큐가 금방 차는 센서에서 요청 수를 줄이기 위함.
+    batch 가 False 인 센서는 기존처럼 레코드마다 요청 하나로 보냄 (UploadFlusher 가 이 객체를 거치지 않음).
+    """
+
+    def __init__(self, client=None, retrier=None, max_records=UPLOAD_BATCH_MAX_RECORDS,
+                 max_latency=UPLOAD_BATCH_MAX_LATENCY):
+        """
+        :param client: 공유 httpx.AsyncClient
+        :param retrier: upload_spool.UploadRetrier (있으면 실패한 배치의 레코드를 스풀에 보관)
+        :param max_records: 요청 하나에 담을 최대 레코드 수
+        :param max_latency: 첫 레코드가 들어온 뒤 최대 대기 시간(초)
+        """
+        self.client = client
+        self.retrier = retrier
+        self.max_records = max(1, max_records)
+        self.max_latency = max_latency
+        self._pending = {}       # 백엔드 URL → _PendingBatch
+        self._sending = set()    # 타이머로 시작된 전송 태스크 (종료 시 기다리기 위함)
+
+        self.requests = 0        # 보낸 배치 요청 수
+        self.records = 0         # 배치로 보낸 레코드 수
+
+    @staticmethod
+    def accepts(sensor_type):
+        """이 센서의 업로드를 묶어서 보낼지 (SENSOR_URL_MAPPING 의 batch)"""
+        target = SENSOR_URL_MAPPING.get(sensor_type)
+        return bool(target and target.get("batch"))
+
+    async def add(self, device_id, username, sensor_type, data):
+        """
+        레코드 하나를 배치에 추가. 배치가 max_records 개가 되면 호출한 쪽(업로드 워커)에서 바로 전송함.
+
+        :param device_id: 장비 식별자
+        :param username: 사용자 이름
+        :param sensor_type: 센서 종류
+        :param data: 샘플 값 리스트
+        """
+        url = SENSOR_URL_MAPPING[sensor_type]["url"]
+        batch = self._pending.get(url)
+        if batch is None:
+            batch = self._pending[url] = _PendingBatch(sensor_type)
+            batch.timer = asyncio.create_task(self._flush_later(url, batch))
+        batch.records.append((device_id, username, data))
+        if len(batch.records) >= self.max_records:
+            self._take(url, batch)
+            await self._send(batch)
+
+    def _take(self, url, batch):
+        """배치를 모으는 중 목록에서 빼고 타이머를 멈춤"""
+        if self._pending.get(url) is batch:
+            del self._pending[url]
+        if batch.timer is not None and batch.timer is not asyncio.current_task():
+            batch.timer.cancel()
+        batch.timer = None
+
+    async def _flush_later(self, url, batch):
+        await asyncio.sleep(self.max_latency)
+        self._take(url, batch)
+        # 전송 중에 종료(stop)가 타이머를 취소해도 보내던 배치는 끝까지 보내도록 별도 태스크로 분리
+        task = asyncio.create_task(self._send(batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch):
+        if not batch.records:
+            return
+        waited = time.monotonic() - batch.started
+        self.requests += 1
+        self.records += len(batch.records)
+        logger.debug("[%s] 배치 전송: 레코드 %d개 (%.3f초 동안 모음)", batch.sensor_type, len(batch.records), waited)
+        try:
+            if self.retrier is not None:
+                await self.retrier.deliver_batch(batch.sensor_type, batch.records)
+            else:
+                await send_batch_to_data_backend(batch.sensor_type, batch.records, client=self.client)
+        except Exception as e:
+            logger.error("[%s] 배치 전송 중 오류 발생 (레코드 %d개): %s", batch.sensor_type, len(batch.records), e)
+
+    async def stop(self):
+        """모으고 있던 배치를 모두 보내고 종료 (업로드 워커를 멈춘 뒤 호출)"""
+        batches = list(self._pending.items())
+        for url, batch in batches:
+            self._take(url, batch)
+        await asyncio.gather(*(self._send(batch) for _, batch in batches), *list(self._sending))
+        logger.info("업로드 배치 종료 (요청 %s번, 레코드 %s개)", self.requests, self.records)
+
+    def stats(self):
+        """배치 지표를 dict로 반환"""
+        return {
+            "requests": self.requests,
+            "records": self.records,
+            "pending": sum(len(batch.records) for batch in self._pending.values()),
+            "max_records": self.max_records,
+            "max_latency": self.max_latency,
+        }
@@ -0,0 +1,380 @@
+# 업로드 실패 배치 보관(스풀) 및 재전송
+import asyncio
+# - asyncio: 재전송 백그라운드 태스크와 동시 재전송 수 제한(Semaphore)을 위함.
+
+import os
+# - os: 스풀 파일이 들어갈 디렉터리가 있는지 시작할 때 확인하기 위함.
+
+import random
+# - random: 재시도 간격에 지터(jitter)를 넣어 여러 배치가 같은 순간에 몰리지 않도록 하기 위함.
+
+import sqlite3
+# - sqlite3: 실패한 배치를 프로세스가 재시작되어도 남도록 로컬 파일에 보관하기 위함 (표준 라이브러리, WAL 모드).
+
+import time
+# - time: 다음 재시도 시각과 회로 차단기 열림 시간을 재기 위함.
+
+from concurrent.futures import ThreadPoolExecutor
+# - ThreadPoolExecutor: 블로킹인 SQLite 호출을 이벤트 루프 밖의 전용 스레드 하나에서 순서대로 실행하기 위함.
+
+from urllib.parse import urlsplit
+# - urlsplit: 백엔드 주소의 호스트별로 회로 차단기를 두기 위함.
+
+# 사용자 정의 로깅 설정 가져오기
+from logger import get_logger
+
+# 데이터 전송 함수 / 센서별 URL
+from send_to_data_back import send_to_data_backend, send_batch_to_data_backend, SENSOR_URL_MAPPING
+
+# 바이너리 포맷 (업로드 페이로드와 같은 형식으로 보관)
+from payload_encoder import encode_binary, decode_binary
+
+# 센서별 샘플레이트 (바이너리 헤더에 사용)
+from sensor_codec import SENSOR_CODECS
+
+# 지표
+from metrics import SPOOLED_BATCHES, SPOOL_REPLAYS, CIRCUIT_OPEN
+
+# 설정 값 가져오기
+from config import (
+    UPLOAD_SPOOL_PATH, UPLOAD_RETRY_CONCURRENCY, UPLOAD_RETRY_BASE_DELAY, UPLOAD_RETRY_MAX_DELAY,
+    UPLOAD_RETRY_INTERVAL, BREAKER_FAILURES, BREAKER_RESET_TIMEOUT,
+)
+
+
+logger = get_logger("upload_spool")
+
+# 재전송 중인 배치를 다른 재전송(다른 워커 프로세스 포함)이 다시 가져가지 않도록 미뤄두는 시간(초)
+# 재전송 도중 프로세스가 죽으면 이 시간 뒤에 다시 재전송 대상이 됨
+_CLAIM_LEASE = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    body BLOB NOT NULL
+)
+"""
+
+
+class UploadSpool:
+    """
+    업로드에 실패한 배치를 SQLite 파일에 추가만 하는(append-only) 스풀.
+    배치 하나 = 행 하나, 본문은 payload_encoder 의 바이너리 포맷(헤더 + little endian 샘플 배열).
+    SQLite 호출은 전용 스레드 하나에서 실행되므로 이벤트 루프를 막지 않음.
+    """
+
+    def __init__(self, path=UPLOAD_SPOOL_PATH):
+        """
+        :param path: SQLite 파일 경로
+        """
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="upload-spool")
+        self._db = None
+        self.pending = 0  # 스풀에 남아 있는 배치 수 (지표용, 열 때와 claim 할 때 다시 셈. 다른 워커가 넣은 배치 포함)
+
+    def _open(self):
+        # SQLite 는 디렉터리가 없으면 "unable to open database file" 만 남기므로, 설정 오류를 알 수 있게 먼저 확인
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            raise ValueError(f"UPLOAD_SPOOL_PATH 의 디렉터리가 없습니다: {directory}")
+        db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        # WAL: 쓰는 중에도 다른 워커 프로세스가 읽을 수 있고, 추가(INSERT)마다 전체 파일을 다시 쓰지 않음
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("PRAGMA busy_timeout=5000")
+        db.execute(_SCHEMA)
+        self._db = db
+        return db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def _insert(self, body, now):
+        self._db.execute("INSERT INTO spool (created_at, next_attempt, body) VALUES (?, ?, ?)", (now, now, body))
+
+    def _claim(self, limit, now):
+        # BEGIN IMMEDIATE 로 쓰기 잠금을 먼저 잡아서, 여러 워커 프로세스가 같은 행을 동시에 가져가지 않도록 함
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute("SELECT id, attempts, body FROM spool WHERE next_attempt <= ? ORDER BY id LIMIT ?",
+                              (now, limit)).fetchall()
+            if rows:
+                db.executemany("UPDATE spool SET next_attempt = ? WHERE id = ?",
+                               [(now + _CLAIM_LEASE, row[0]) for row in rows])
+            count = db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return rows, count
+
+    def _delete(self, entry_id):
+        self._db.execute("DELETE FROM spool WHERE id = ?", (entry_id,))
+
+    def _reschedule(self, entry_id, attempts, next_attempt):
+        self._db.execute("UPDATE spool SET attempts = ?, next_attempt = ? WHERE id = ?",
+                         (attempts, next_attempt, entry_id))
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def open(self):
+        self.pending = await self._run(self._open)
+        logger.info("업로드 스풀 열림: %s (남은 배치 %s개)", self.path, self.pending)
+
+    async def store(self, device_id, username, sensor_type, values):
+        """
+        실패한 배치를 스풀에 추가.
+
+        :param device_id: 장비 식별자
+        :param username: 사용자 이름
+        :param sensor_type: 센서 종류
+        :param values: 샘플 값 리스트
+        """
+        codec = SENSOR_CODECS.get(sensor_type)
+        body = encode_binary(device_id, username, sensor_type, values, codec.sample_rate if codec else 0)
+        await self._run(self._insert, body, time.time())
+        self.pending += 1
+        SPOOLED_BATCHES.labels(sensor_type).inc()
+        logger.warning("[%s] 업로드 실패 배치를 스풀에 보관 (사용자: %s, 샘플 %d개, 남은 배치 %d개)",
+                       sensor_type, username, len(values), self.pending)
+
+    async def claim(self, limit):
+        """
+        재시도 시각이 된 배치를 최대 limit개 가져옴 (가져간 배치는 _CLAIM_LEASE 동안 다른 재전송 대상에서 빠짐).
+
+        :return: [(id, 시도 횟수, 바이너리 본문), ...]
+        """
+        rows, self.pending = await self._run(self._claim, limit, time.time())
+        return rows
+
+    async def remove(self, entry_id):
+        await self._run(self._delete, entry_id)
+        self.pending = max(0, self.pending - 1)
+
+    async def reschedule(self, entry_id, attempts, delay):
+        await self._run(self._reschedule, entry_id, attempts, time.time() + delay)
+
+    async def close(self):
+        if self._db is not None:
+            await self._run(self._db.close)
+            self._db = None
+        self._executor.shutdown(wait=True)
+
+
+class CircuitBreaker:
+    """
+    백엔드가 연속으로 실패하면 일정 시간 요청을 보내지 않는 회로 차단기.
+    - closed: 정상, 실패가 failure_threshold 번 연속되면 open
+    - open: reset_timeout 초 동안 요청하지 않음 (바로 스풀로)
+    - half_open: reset_timeout 이 지나면 요청 하나만 시험 삼아 보내고, 성공하면 closed / 실패하면 다시 open
+    """
+
+    __slots__ = ("name", "failure_threshold", "reset_timeout", "failures", "opened_at", "probing", "_gauge")
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._gauge = CIRCUIT_OPEN.labels(name)
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """지금 요청을 보내도 되는지 (half_open 에서는 동시에 하나만 허용)"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("회로 차단기 닫힘: %s", self.name)
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._gauge.set(0)
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.error("회로 차단기 열림: %s (연속 실패 %d번, %.0f초 동안 전송 중단)",
+                             self.name, self.failures, self.reset_timeout)
+            self.opened_at = time.monotonic()
+            self._gauge.set(1)
+
+
+class UploadRetrier:
+    """
+    업로드 경로의 실패 처리 담당.
+    - deliver(): 회로 차단기가 닫혀 있으면 전송하고, 실패하거나 차단기가 열려 있으면 스풀에 보관
+    - 백그라운드 태스크: 스풀의 배치를 지수 백오프 + 지터 간격으로, 최대 concurrency 개씩 동시에 재전송
+    """
+
+    def __init__(self, spool, client=None, concurrency=UPLOAD_RETRY_CONCURRENCY, base_delay=UPLOAD_RETRY_BASE_DELAY,
+                 max_delay=UPLOAD_RETRY_MAX_DELAY, interval=UPLOAD_RETRY_INTERVAL):
+        """
+        :param spool: UploadSpool
+        :param client: 공유 httpx.AsyncClient
+        :param concurrency: 동시에 재전송할 최대 배치 수
+        :param base_delay: 첫 재시도 간격(초), 실패할 때마다 두 배
+        :param max_delay: 재시도 간격 상한(초)
+        :param interval: 스풀을 확인하는 주기(초)
+        """
+        self.spool = spool
+        self.client = client
+        self.concurrency = max(1, concurrency)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.interval = interval
+        self.breakers = {}  # 백엔드 호스트 → CircuitBreaker
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+        self.replayed = 0        # 재전송에 성공한 배치 수
+        self.replay_failures = 0  # 재전송에 실패한 횟수
+
+    def breaker_for(self, sensor_type):
+        target = SENSOR_URL_MAPPING.get(sensor_type)
+        host = urlsplit(target["url"]).netloc if target else ""
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(host)
+        return breaker
+
+    def backoff(self, attempts):
+        """
+        attempts 번 실패한 뒤의 재시도 간격 (지수 백오프, 상한 max_delay, 절반~전체 사이의 지터).
+
+        :param attempts: 지금까지 실패한 횟수 (1 이상)
+        :return: 초
+        """
+        delay = min(self.max_delay, self.base_delay * (2 ** min(attempts - 1, 30)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def deliver(self, device_id, username, sensor_type, values):
+        """
+        배치 하나를 전송하고, 실패하면 스풀에 보관 (업로드 워커가 호출).
+
+        :return: 바로 전송했으면 True, 스풀에 보관했으면 False
+        """
+        breaker = self.breaker_for(sensor_type)
+        if breaker.allow():
+            if await send_to_data_backend(device_id, username, sensor_type, values, client=self.client):
+                breaker.record_success()
+                # 백엔드가 살아났으면 주기를 기다리지 않고 스풀 재전송을 깨움
+                if self.spool.pending:
+                    self._wakeup.set()
+                return True
+            breaker.record_failure()
+        await self.spool.store(device_id, username, sensor_type, values)
+        return False
+
+    async def deliver_batch(self, sensor_type, records):
+        """
+        여러 사용자의 레코드를 요청 하나로 전송하고, 실패하면 레코드마다 스풀에 보관 (upload_coalescer 가 호출).
+        스풀에서 재전송할 때는 레코드 하나씩 기존 단건 형식으로 보냄.
+
+        :param sensor_type: 센서 종류
+        :param records: [(device_id, username, values), ...]
+        :return: 바로 전송했으면 True, 스풀에 보관했으면 False
+        """
+        breaker = self.breaker_for(sensor_type)
+        if breaker.allow():
+            if await send_batch_to_data_backend(sensor_type, records, client=self.client):
+                breaker.record_success()
+                if self.spool.pending:
+                    self._wakeup.set()
+                return True
+            breaker.record_failure()
+        for device_id, username, values in records:
+            await self.spool.store(device_id, username, sensor_type, values)
+        return False
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        logger.info("스풀 재전송 시작 (동시 %s개, 백오프 %.1f~%.0f초)", self.concurrency, self.base_delay, self.max_delay)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        """재전송 지표를 dict로 반환"""
+        return {
+            "spooled": self.spool.pending,
+            "replayed": self.replayed,
+            "replay_failures": self.replay_failures,
+            "breakers": {host: breaker.state for host, breaker in self.breakers.items()},
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._replay_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("스풀 재전송 중 오류 발생: %s", e)
+
+    async def _replay_due(self):
+        """재시도 시각이 된 배치를 동시 concurrency 개까지 재전송"""
+        while True:
+            entries = await self.spool.claim(self.concurrency)
+            if not entries:
+                return
+            results = await asyncio.gather(*(self._replay(*entry) for entry in entries))
+            # 차단기가 열려 있거나 이번에 모두 실패했으면 다음 주기까지 기다림
+            if not any(results):
+                return
+
+    async def _replay(self, entry_id, attempts, body):
+        batch = decode_binary(body)
+        sensor_type = batch["sensor_type"]
+        breaker = self.breaker_for(sensor_type)
+        if not breaker.allow():
+            # 차단기가 열려 있으면 시도 횟수는 늘리지 않고 차단기가 다시 열릴 무렵으로 미룸
+            await self.spool.reschedule(entry_id, attempts, breaker.reset_timeout)
+            return False
+        async with self._semaphore:
+            delivered = await send_to_data_backend(batch["device_id"], batch["userid"], sensor_type, batch["data"],
+                                                   client=self.client)
+        if delivered:
+            breaker.record_success()
+            await self.spool.remove(entry_id)
+            self.replayed += 1
+            SPOOL_REPLAYS.labels("delivered").inc()
+            logger.info("[%s] 스풀 배치 재전송 성공 (사용자: %s, %d번째 시도)", sensor_type, batch["userid"], attempts + 1)
+            return True
+        breaker.record_failure()
+        attempts += 1
+        delay = self.backoff(attempts)
+        await self.spool.reschedule(entry_id, attempts, delay)
+        self.replay_failures += 1
+        SPOOL_REPLAYS.labels("failed").inc()
+        logger.warning("[%s] 스풀 배치 재전송 실패 (사용자: %s, %d번째 시도), %.1f초 뒤 재시도",
+                       sensor_type, batch["userid"], attempts, delay)
+        return False
@@ -0,0 +1,164 @@
+# 비동기 작업 큐와 워커를 위한 asyncio
+import asyncio
+# - asyncio: 백그라운드 워커 태스크와 제한된 크기의 작업 큐(asyncio.Queue)를 만들기 위함.
+#   목적: 백엔드 업로드를 WebSocket 수신 루프 밖으로 빼서 수신이 멈추지 않도록 하기 위함.
+
+import time
+# - time: 이벤트가 큐에 들어간 뒤 처리되기까지의 지연(lag)을 재기 위함.
+
+# 사용자 정의 로깅 설정 가져오기
+from logger import get_logger
+
+# 데이터 전송 함수
+from send_to_data_back import send_to_data_backend
+
+# 설정 값 가져오기
+from config import UPLOAD_WORKERS, UPLOAD_QUEUE_SIZE, UPLOAD_LAG_WARNING, REDIS_STORAGE_FORMAT
+
+
+logger = get_logger("upload_worker")
+
+
+class FlushJob:
+    """
+    큐 가득 참 이벤트 하나. 업로드할 스냅샷 키(또는 스트리밍 모드에서 이미 읽어온 값)와 전송에 필요한 정보를 담음.
+    """
+
+    __slots__ = ("device_id", "username", "sensor_type", "snapshot_key", "values", "output_type", "storage",
+                 "enqueued_at")
+
+    def __init__(self, device_id, username, sensor_type, snapshot_key=None, output_type=int,
+                 storage=REDIS_STORAGE_FORMAT, values=None):
+        self.device_id = device_id
+        self.username = username
+        self.sensor_type = sensor_type
+        self.snapshot_key = snapshot_key
+        self.values = values
+        self.output_type = output_type
+        self.storage = storage
+        self.enqueued_at = time.monotonic()
+
+
+class UploadFlusher:
+    """
+    main.py의 startup에서 시작되는 백그라운드 업로더.
+    handle_websocket 이 넣은 FlushJob 을 제한된 크기의 큐에서 꺼내, 워커 여러 개가 동시에 업로드함.
+    큐가 가득 차면 submit 이 빈자리가 날 때까지 기다리며(backpressure), 그 횟수와 대기 시간을 기록함.
+    """
+
+    def __init__(self, queue_backend, client=None, workers=UPLOAD_WORKERS, max_pending=UPLOAD_QUEUE_SIZE,
+                 retrier=None, coalescer=None):
+        """
+        :param queue_backend: 세션 큐 백엔드 (queue_backend.py, 스냅샷을 읽고 지우는 pop_snapshot 제공)
+        :param client: 공유 httpx.AsyncClient
+        :param workers: 업로드 워커 수
+        :param max_pending: 작업 큐의 최대 크기
+        :param retrier: upload_spool.UploadRetrier (있으면 전송에 실패한 배치를 스풀에 보관, 없으면 로그만 남김)
+        :param coalescer: upload_coalescer.UploadCoalescer (있으면 batch 로 지정한 센서는 여러 사용자를 묶어서 전송)
+        """
+        self.queue_backend = queue_backend
+        self.client = client
+        self.retrier = retrier
+        self.coalescer = coalescer
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self._tasks = []
+
+        # backpressure 지표
+        self.submitted = 0       # 큐에 들어온 작업 수
+        self.completed = 0       # 업로드까지 끝난 작업 수
+        self.failed = 0          # 처리 중 예외가 난 작업 수
+        self.blocked = 0         # 큐가 가득 차서 수신 쪽이 기다려야 했던 횟수
+        self.blocked_seconds = 0.0
+        self.last_lag = 0.0      # 마지막 작업이 큐에서 기다린 시간
+        self.max_lag = 0.0
+        self.in_flight = 0       # 지금 업로드 중인 작업 수
+
+    def start(self):
+        """워커 태스크 시작"""
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(i)))
+        logger.info("업로드 워커 %s개 시작 (작업 큐 최대 %s)", self.workers, self.queue.maxsize)
+
+    async def stop(self, drain_timeout=10.0):
+        """
+        남은 작업을 최대 drain_timeout 초까지 처리한 뒤 워커 종료.
+
+        :param drain_timeout: 남은 작업을 기다릴 최대 시간(초)
+        """
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("업로드 워커 종료: 처리하지 못한 작업 %s개", self.queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        logger.info("업로드 워커 종료.")
+
+    async def submit(self, job):
+        """
+        작업을 큐에 넣음. 큐가 가득 찼으면 빈자리가 생길 때까지 기다림(backpressure).
+
+        :param job: FlushJob
+        """
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.blocked += 1
+            started = time.monotonic()
+            logger.warning("업로드 작업 큐가 가득 찼습니다 (%s). 업로드가 수신을 따라가지 못하고 있습니다.",
+                           self.queue.maxsize)
+            await self.queue.put(job)
+            self.blocked_seconds += time.monotonic() - started
+        self.submitted += 1
+
+    def stats(self):
+        """backpressure 지표를 dict로 반환"""
+        return {
+            "workers": self.workers,
+            "pending": self.queue.qsize(),
+            "max_pending": self.queue.maxsize,
+            "in_flight": self.in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "blocked": self.blocked,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "last_lag_seconds": round(self.last_lag, 3),
+            "max_lag_seconds": round(self.max_lag, 3),
+        }
+
+    async def _worker(self, index):
+        """작업 큐에서 하나씩 꺼내 스냅샷을 읽고 백엔드로 전송"""
+        while True:
+            job = await self.queue.get()
+            self.in_flight += 1
+            try:
+                lag = time.monotonic() - job.enqueued_at
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                if lag >= UPLOAD_LAG_WARNING:
+                    logger.warning("[%s] 업로드 지연 %.1f초 (대기 작업 %s개)", job.sensor_type, lag, self.queue.qsize())
+
+                if job.values is not None:
+                    data_list = job.values
+                else:
+                    data_list = await self.queue_backend.pop_snapshot(job.snapshot_key, job.output_type, job.storage)
+                # 스냅샷은 이미 큐에서 지워졌으므로, 전송에 실패하면 스풀에 보관해서 나중에 다시 보냄
+                if self.coalescer is not None and self.coalescer.accepts(job.sensor_type):
+                    await self.coalescer.add(job.device_id, job.username, job.sensor_type, data_list)
+                elif self.retrier is not None:
+                    await self.retrier.deliver(job.device_id, job.username, job.sensor_type, data_list)
+                else:
+                    await send_to_data_backend(job.device_id, job.username, job.sensor_type, data_list,
+                                               client=self.client)
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error("[%s] 업로드 워커 %s 처리 중 오류 발생: %s", job.sensor_type, index, e)
+            finally:
+                self.in_flight -= 1
+                self.queue.task_done()